@@ -1,28 +1,7 @@
-import re
+from backend.utils.address import clean_address, match_streets
 
-COMMON_REPLACEMENTS = {
-    r"\bst\b": "street",
-    r"\brd\b": "road",
-    r"\bave\b": "avenue",
-    r"\bblvd\b": "drive",
-    }
-
-def normalize_address(address: str) -> str:
-    if not isinstance(address, str):
-        return ""
-
-    address = address.lower().strip()
-
-    # remove double spaces
-    address = re.sub(r"\s+", " ", address)
-
-    # expand common abbreviations
-    for pattern, replacement in COMMON_REPLACEMENTS.items():
-        address = re.sub(pattern, replacement, address)
-
-    return address
-
-from rapidfuzz import process, fuzz
+# Column-at-a-time versions live in backend.utils.address; these are the
+# per-row wrappers.
 
 KNOWN_STREETS = [
     "routledge avenue",
@@ -33,34 +12,27 @@ KNOWN_STREETS = [
     "josiah tongogara avenue",
     ]
 
+def normalize_address(address: str) -> str:
+    return clean_address(address)
+
+
 def correct_street_name(address: str) -> str:
     if not address:
         return address
+    return match_streets([address], KNOWN_STREETS, threshold=85)[0]
 
-    match, score, _ = process.extractOne(
-        address,
-        KNOWN_STREETS,
-        scorer=fuzz.partial_ratio
-    )
-
-    if score >= 85:
-        return match
-
-    return address
-
-
-    def build_geocodable_address(row):
-        parts = []
 
-        if row.get("physical address"):
-            addr = normalize_address(row["physical address"])
-            addr = correct_street_name(addr)
-            parts.append(addr)
+def build_geocodable_address(row):
+    parts = []
 
-        if row.get("city"):
-            parts.append(row["city"])
+    if row.get("physical address"):
+        addr = normalize_address(row["physical address"])
+        addr = correct_street_name(addr)
+        parts.append(addr)
 
-        parts.append("Zimbabwe")
+    if row.get("city"):
+        parts.append(row["city"])
 
-        return ", ".join(parts)
+    parts.append("Zimbabwe")
 
+    return ", ".join(parts)
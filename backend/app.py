@@ -2,14 +2,33 @@
 import pandas as pd
 import numpy as np
 import os
-import subprocess
-from datetime import datetime
-import hashlib
+import sys
+import time
+from datetime import datetime, timezone
+import gzip
 import json
 import logging
 import smtplib
+import threading
 from email.mime.text import MIMEText
-from backend.utils.facility_type import detect_facility_type
+from backend.change_monitor import ChangeMonitor
+from backend.columnar import ensure_snapshot, write_snapshot
+from backend.facility_store import FacilityStore, normalize_facilities
+from backend.history_store import HistoryStore
+from backend.map_clusters import ClusterHierarchy
+from backend.nearest import NearestFacilities
+from backend.refresh_jobs import (
+    ACTIVE_STATUSES, GEOCODE_PROGRESS, SCRAPE_PROGRESS, JobStore, RefreshQueue, run_script
+)
+from backend.route_engine import corridor_search, route_records, route_search
+from backend.snapshot_diff import (
+    describe_diff, diff_snapshots, has_changes, load_baseline, save_baseline
+)
+from backend.stock_plan import PRODUCT_MAP_FILE, ProductJoin, load_product_map
+from backend.utils.geo import decode_polyline
+from backend.territory_planner import filter_facilities, plan_territories
+from backend.tile_builder import build_tiles, read_tile, tile_in_range
+from backend.visit_optimizer import optimize_visit_order
 
 logging.basicConfig(level=logging.INFO)
 
@@ -35,98 +54,240 @@ CLEANED_FILE = os.path.join(BASE_DIR, "facilities_cleaned.csv")
 GEOCODED_FILE = os.path.join(BASE_DIR, "facilities_geocoded.csv")
 
 HASH_FILE = os.path.join(BASE_DIR, "last_hash.txt")
+# Change log and summary history (the JSON files are imported once, then left as is)
+HISTORY_FILE = os.path.join(BASE_DIR, "history.sqlite")
 LOG_FILE = os.path.join(BASE_DIR, "change_log.json")
+SUMMARY_HISTORY_FILE = os.path.join(BASE_DIR, "summary_history.json")
+# Rows of the last logged snapshot, for row-level diffs
+DIFF_BASELINE_FILE = os.path.join(BASE_DIR, "diff_baseline.csv.gz")
+TILES_FILE = os.path.join(BASE_DIR, "facility_tiles.mbtiles")
+# Columnar snapshots the workers memory-map (see backend.columnar)
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "snapshots")
+JOBS_FILE = os.path.join(BASE_DIR, "refresh_jobs.sqlite")
+SCRAPER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scraper"))
+
+# Cached JSON bodies smaller than this are not worth gzipping
+GZIP_MIN_BYTES = 1024
+
+# How often a refresh progress stream checks its job
+SSE_POLL_SECONDS = 1
+
+# Caps on /api/facilities/nearest: neighbours per point, points per batch
+MAX_NEAREST_K = 100
+MAX_NEAREST_POINTS = 10_000
+
+# Caps on /api/planning/territories, so one request can't ask the planner
+# for thousands of territories or one-day routes thousands of stops long
+MAX_TERRITORY_REPS = 200
+MAX_DAILY_CAP = 100
+
+# Loaded once per process, reloaded only when the files change on disk
+facility_store = FacilityStore([GEOCODED_FILE, CLEANED_FILE, RAW_FILE], snapshot_dir=SNAPSHOT_DIR)
+
+history_store = HistoryStore(HISTORY_FILE)
+history_store.import_legacy(LOG_FILE, SUMMARY_HISTORY_FILE)
+
+# Serializes change detection between this process's threads; between
+# processes (gunicorn workers) history_store.exclusive() does
+change_lock = threading.Lock()
 
 # =========================
 # HELPERS
 # =========================
 def load_best_data():
-    """Load the best available CSV"""
-    for path in [GEOCODED_FILE, CLEANED_FILE, RAW_FILE]:
-        if os.path.exists(path):
-            df = pd.read_csv(path)
-            if df.empty:
-                continue
-
-            df.columns = df.columns.str.strip().str.lower()
-
-            # Normalize facility name
-            if "facility_name" in df.columns and "facility name" not in df.columns:
-                df.rename(columns={"facility_name": "facility name"}, inplace=True)
+    """Return the current facility snapshot's frame (shared - do not mutate)"""
+    return facility_store.current().df
 
-            # Normalize lat/lng
-            for col in ["latitude", "longitude"]:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors="coerce")
 
-            # Add facility type if missing
-            if "facility_type" not in df.columns:
-                df["facility_type"] = df["facility name"].apply(detect_facility_type)
-
-            return df
+def preload_snapshot():
+    """
+    Load the facility snapshot before gunicorn forks its workers.
 
-    logging.warning("No data files found")
-    return pd.DataFrame()
+    Builds the columnar snapshot if the pipeline has not written one for
+    the current CSV, then maps it, so forked workers start from the
+    master's pages instead of each parsing and indexing the data.
+    """
+    ensure_snapshot(SNAPSHOT_DIR, [GEOCODED_FILE, CLEANED_FILE, RAW_FILE])
+    return facility_store.current()
 
 
 def safe_col(df, col):
     return col in df.columns
 
 
-def file_hash(path):
-    with open(path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
+def facility_records(df):
+    """Basic JSON records (id, name, city, type, coordinates) for facilities"""
+    columns = {
+        "facility_id": "facility_id",
+        "facility name": "facility_name",
+        "city": "city",
+        "facility_type": "facility_type",
+        "latitude": "latitude",
+        "longitude": "longitude",
+    }
+    records = df[[c for c in columns if safe_col(df, c)]].rename(columns=columns)
+    return records.astype("object").where(records.notna(), None).to_dict(orient="records")
 
 
-def detect_changes():
-    """Detect if geocoded CSV changed, log and send email alerts if new facility type"""
-    if not os.path.exists(GEOCODED_FILE):
-        return False
+def snapshot_timestamp(snapshot):
+    """When the snapshot's data file was last written (load time if none)"""
+    if snapshot.mtime is None:
+        return snapshot.loaded_at.replace(microsecond=0)
+    return datetime.fromtimestamp(int(snapshot.mtime))
 
-    new_hash = file_hash(GEOCODED_FILE)
-    old_hash = None
 
-    if os.path.exists(HASH_FILE):
-        with open(HASH_FILE) as f:
-            old_hash = f.read().strip()
+def cached_json(key, builder):
+    """
+    Serve ``builder(snapshot)`` as JSON, serialized once per data snapshot.
 
-    if new_hash == old_hash:
-        return False
+    Both the plain and gzipped bodies are kept, so a request never
+    serializes or compresses anything. The ETag is the snapshot version,
+    so clients that send If-None-Match / If-Modified-Since get a 304.
+    """
+    snapshot = facility_store.current()
 
-    # Update hash
-    with open(HASH_FILE, "w") as f:
-        f.write(new_hash)
+    def serialize(snap):
+        body = app.json.dumps(builder(snap), separators=(",", ":")).encode("utf-8")
+        return body, gzip.compress(body, compresslevel=9, mtime=0)
 
-    # Load data
-    df = load_best_data()
-    if df.empty:
-        return False
-
-    # Detect new facility types
-    known_types = set()
-    if os.path.exists(LOG_FILE):
-        history = json.load(open(LOG_FILE))
-        for h in history:
-            known_types.update(h.get("facility_types", []))
+    body, gzipped = snapshot.derive(key, serialize)
+    etag = f"{snapshot.version}-{key}"
+
+    if "gzip" in request.accept_encodings and len(body) > GZIP_MIN_BYTES:
+        response = app.response_class(gzipped, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+        etag += "-gz"
     else:
-        history = []
+        response = app.response_class(body, mimetype="application/json")
 
-    current_types = set(df["facility_type"].dropna().unique())
-    new_types = current_types - known_types
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.last_modified = snapshot_timestamp(snapshot).astimezone(timezone.utc)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
-    # Log change
-    history.append({
-        "timestamp": datetime.now().isoformat(),
-        "message": "HPA facilities data changed",
-        "facility_types": list(current_types)
-    })
-    json.dump(history, open(LOG_FILE, "w"), indent=2)
+
+def history_summary(df):
+    """Counts recorded in the summary history after each change"""
+    geocoded = int(df["latitude"].notna().sum()) if safe_col(df, "latitude") else 0
+    by_city = df["city"].value_counts() if safe_col(df, "city") else pd.Series(dtype="int64")
+    return {
+        "total_facilities": len(df),
+        "geocoded_facilities": geocoded,
+        "missing_gps": len(df) - geocoded,
+        "total_cities": int(len(by_city)),
+        "by_city": {str(city): int(n) for city, n in by_city.items()},
+    }
+
+
+def diff_current_snapshot():
+    """
+    Diff the served snapshot against the last logged one, row by row.
+
+    Appends a change-log entry with the structured diff (added, removed,
+    moved and edited facilities) and returns it, or returns None when no
+    facility changed. The snapshot's content hash only short-circuits the
+    "same file" case; a rewritten or reordered file with the same rows is
+    not a change. Emails an alert if a new facility type appears.
+
+    Every worker's monitor runs this, so it holds the history file's
+    write lock from the hash check to the append: the first worker to see
+    a new snapshot logs it, and the rest find its hash already recorded.
+    """
+    with change_lock, history_store.exclusive() as conn:
+        # Taken under the lock, so a worker that lost the race sees the
+        # same (or newer) data as the one that logged it
+        snapshot = facility_store.current()
+        if snapshot.empty:
+            return None
+
+        old_hash = None
+        if os.path.exists(HASH_FILE):
+            with open(HASH_FILE) as f:
+                old_hash = f.read().strip()
+        if snapshot.version == old_hash:
+            return None
+
+        df = snapshot.df
+        baseline = load_baseline(DIFF_BASELINE_FILE)
+        diff = diff_snapshots(baseline, df) if baseline is not None else None
+        if diff is not None and not has_changes(diff):
+            history_store.set_meta("data_changed", False, conn)
+            with open(HASH_FILE, "w") as f:
+                f.write(snapshot.version)
+            return None
+
+        current_types = set(df["facility_type"].dropna().unique())
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "message": "HPA facilities data changed" if diff else "Initial snapshot created",
+            "facility_types": sorted(current_types),
+            "diff": diff,
+        }
+        # Facility types never logged before come back as new
+        new_types = history_store.append_change(entry, conn)
+        history_store.append_summary(history_summary(df), entry["timestamp"], conn)
+        history_store.set_meta("data_changed", True, conn)
+
+        # The baseline moves only once the change is logged
+        save_baseline(df, DIFF_BASELINE_FILE)
+        with open(HASH_FILE, "w") as f:
+            f.write(snapshot.version)
 
     # Send email if new facility type appears
     if new_types:
         send_email_alert(new_types, change_type="new_facility_types")
 
-    return True
+    return entry
+
+
+def detect_changes():
+    """True if facilities changed since the last check (see ``diff_current_snapshot``)"""
+    return diff_current_snapshot() is not None
+
+
+def publish_monitor_state(state):
+    """Share a monitor's latest check with every worker (see ``monitor_state``)"""
+    history_store.set_meta("monitor_state", {
+        key: state[key] for key in ("status", "error", "last_checked")
+    })
+
+
+def monitor_state():
+    """
+    The change monitor's state as any worker would report it.
+
+    The last check, by whichever worker ran it, is read from the history
+    store, as is the latest logged change. ``data_changed`` is whether the
+    newest data differed from the data before it.
+    """
+    state = history_store.get_meta("monitor_state") or change_monitor.state()
+    latest = history_store.changes(limit=1, with_diff=False)
+    last_change = None
+    if latest:
+        diff = latest[0].get("diff")
+        last_change = {
+            "timestamp": latest[0].get("timestamp"),
+            "message": latest[0].get("message"),
+            "counts": diff["counts"] if diff else None,
+        }
+    return {
+        "status": state["status"],
+        "error": state.get("error"),
+        "last_checked": state["last_checked"],
+        "data_changed": history_store.get_meta("data_changed", False),
+        "last_change": last_change,
+    }
+
+
+# Checks for changes off the request path whenever a data file is written
+change_monitor = ChangeMonitor(diff_current_snapshot, [GEOCODED_FILE, CLEANED_FILE, RAW_FILE],
+                               publish=publish_monitor_state)
+
+
+@app.before_request
+def start_change_monitor():
+    change_monitor.start()
 
 
 def send_email_alert(new_types, change_type="new_facility_types"):
@@ -207,19 +368,19 @@ def map_view():
 # =========================
 # API – DASHBOARD SUMMARY
 # =========================
-@app.route("/api/summary")
-def summary():
-    df = load_best_data()
+def build_summary(snapshot):
+    df = snapshot.df
+    last_updated = snapshot_timestamp(snapshot).strftime("%Y-%m-%d %H:%M:%S")
     if df.empty:
-        return jsonify({
+        return {
             "total": 0,
             "geocoded": 0,
             "missing": 0,
             "geocode_rate": 0,
             "cities": 0,
             "top_cities": [],
-            "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
+            "last_updated": last_updated
+        }
 
     total = len(df)
     geocoded = df["latitude"].notna().sum() if safe_col(df, "latitude") else 0
@@ -238,30 +399,40 @@ def summary():
             .to_dict(orient="records")
         )
 
-    return jsonify({
+    return {
         "total": int(total),
         "geocoded": int(geocoded),
         "missing": int(missing),
         "geocode_rate": geocode_rate,
         "cities": int(cities),
         "top_cities": top_cities,
-        "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
+        "last_updated": last_updated
+    }
+
+
+@app.route("/api/summary")
+def summary():
+    return cached_json("summary", build_summary)
 
 
 # =========================
 # API – MAP FACILITIES
 # =========================
-@app.route("/api/map/facilities")
-def map_facilities():
-    df = load_best_data()
+def map_frame(snapshot):
+    """Geocoded facilities with the columns the map needs"""
+    df = snapshot.df
     if df.empty or not (safe_col(df, "latitude") and safe_col(df, "longitude")):
-        return jsonify([])
+        return None
 
     df = df[df["latitude"].notna() & df["longitude"].notna()]
-    df["facility_type"] = df["facility_type"].fillna("unknown")
+    return df.assign(facility_type=df["facility_type"].astype("object").fillna("unknown"))
+
+
+def build_map_facilities(snapshot):
+    df = map_frame(snapshot)
+    if df is None:
+        return []
 
-    df = df.fillna(None)
     data = df[["facility name", "city", "latitude", "longitude", "facility_type"]].rename(
         columns={
             "facility name": "Facility Name",
@@ -270,63 +441,295 @@ def map_facilities():
             "longitude": "Longitude",
             "facility_type": "Facility Type"
         }
-    ).to_dict(orient="records")
+    )
+    # No NaN may reach the JSON
+    data = data.astype("object").where(data.notna(), None)
+    return data.to_dict(orient="records")
+
+
+def build_map_facilities_compact(snapshot):
+    """
+    Columnar map payload: parallel arrays, one entry per facility.
+
+    ``type`` and ``city`` are codes into the ``types`` and ``cities``
+    lookup lists; ``name`` is row-aligned with ``lat``/``lon``.
+    """
+    df = map_frame(snapshot)
+    if df is None:
+        return {"version": snapshot.version, "count": 0, "types": [], "cities": [],
+                "name": [], "lat": [], "lon": [], "type": [], "city": []}
+
+    type_codes, types = pd.factorize(df["facility_type"])
+    city_codes, cities = pd.factorize(df["city"]) if safe_col(df, "city") else (np.full(len(df), -1), [])
+    names = df["facility name"].astype("object")
+
+    return {
+        "version": snapshot.version,
+        "count": len(df),
+        "types": list(types),
+        "cities": list(cities),
+        "name": names.where(names.notna(), None).tolist(),
+        "lat": df["latitude"].round(6).tolist(),
+        "lon": df["longitude"].round(6).tolist(),
+        "type": type_codes.tolist(),
+        "city": city_codes.tolist()
+    }
+
+
+@app.route("/api/map/facilities")
+def map_facilities():
+    """
+    All geocoded facilities for the map.
+    ?format=compact returns parallel arrays instead of one object per facility.
+    """
+    if request.args.get("format") == "compact":
+        return cached_json("map_facilities_compact", build_map_facilities_compact)
+    return cached_json("map_facilities", build_map_facilities)
 
-    # Ensure no NaN values remain in the data
-    for item in data:
-        for k in item:
-            if pd.isna(item[k]):
-                item[k] = None
 
-    return jsonify(data)
+@app.route("/api/map/clusters")
+def map_clusters():
+    """
+    Clustered facilities for the visible map area.
+    ?bbox=west,south,east,north (Leaflet's toBBoxString) &zoom=<map zoom>.
+    Low zooms return clusters with per-type counts; high zooms and lone
+    facilities come back as individual facilities. The zoom is clamped to
+    0 .. one past the last clustered zoom, and echoed back clamped.
+    """
+    try:
+        west, south, east, north = (float(v) for v in request.args["bbox"].split(","))
+        zoom = int(float(request.args.get("zoom", 0)))
+    except (KeyError, ValueError, OverflowError):
+        return jsonify({"error": "bbox=west,south,east,north and zoom required"}), 400
+    if not np.isfinite([west, south, east, north]).all():
+        return jsonify({"error": "Invalid bbox"}), 400
+
+    snapshot = facility_store.current()
+    hierarchy = snapshot.derive("clusters", lambda snap: ClusterHierarchy.from_frame(snap.df))
+    # Every zoom past the clustering range means individual facilities
+    zoom = min(max(zoom, 0), hierarchy.max_zoom + 1)
+    clusters, positions = hierarchy.query(south, west, north, east, zoom)
+    if clusters is None:
+        clusters, positions = [], snapshot.spatial_index.bbox(south, west, north, east)
+
+    return jsonify({
+        "zoom": zoom,
+        "clusters": clusters,
+        "facilities": facility_records(snapshot.df.iloc[positions]),
+        "version": snapshot.version
+    })
+
+
+@app.route("/tiles/facilities/<int:z>/<int:x>/<int:y>.geojson")
+def facility_tile(z, x, y):
+    """Pre-rendered GeoJSON tile from the MBTiles file (see backend/tile_builder.py)"""
+    if not tile_in_range(TILES_FILE, z, x, y):
+        return "", 404
+    data, signature = read_tile(TILES_FILE, z, x, y)
+    if data is None:
+        return "", 204
+
+    if "gzip" in request.accept_encodings:
+        response = app.response_class(data, mimetype="application/geo+json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = app.response_class(gzip.decompress(data), mimetype="application/geo+json")
+
+    response.vary.add("Accept-Encoding")
+    response.set_etag(signature)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 # =========================
 # API – REFRESH PIPELINE
 # =========================
+def run_refresh(progress):
+    """The refresh pipeline, run by ``refresh_queue`` off the request path"""
+    run_script([sys.executable, "scraper.py"], SCRAPER_DIR, "scrape", progress, SCRAPE_PROGRESS)
+    run_script([sys.executable, "geocode_enhanced.py"], SCRAPER_DIR, "geocode", progress,
+               GEOCODE_PROGRESS)
+
+    # The geocoder's CSV is left as it wrote it (its next run carries
+    # coordinates over from it); the snapshot is built from it once here
+    # and every worker maps that instead of parsing the CSV
+    progress("rebuild")
+    df = normalize_facilities(pd.read_csv(GEOCODED_FILE))
+    version = write_snapshot(df, SNAPSHOT_DIR, source=GEOCODED_FILE)
+    progress("rebuild", rows=len(df), snapshot=version[:8])
+
+    progress("detect_changes")
+    change = change_monitor.check_now()
+    counts = change["diff"]["counts"] if change and change["diff"] else None
+    progress("detect_changes", **(counts or {}))
+
+    # Re-render only the map tiles whose facilities changed
+    progress("tiles")
+    build_tiles(facility_store.current().df, TILES_FILE)
+
+    progress("notify")
+    if change and change["diff"]:
+        send_email_alert(describe_diff(change["diff"]), change_type="data_refresh")
+    else:
+        send_email_alert("No facilities were added, removed, moved or edited",
+                         change_type="data_refresh")
+
+    return {"total_facilities": len(facility_store.current()), "changes": counts}
+
+
+refresh_queue = RefreshQueue(JobStore(JOBS_FILE), run_refresh)
+
+
+def refresh_job_response(job, status=200):
+    response = jsonify(job)
+    response.status_code = status
+    response.cache_control.no_cache = True
+    return response
+
+
 @app.route("/api/refresh", methods=["POST"])
 def refresh_pipeline():
-    try:
-        subprocess.run(["python", "scraper.py"], check=True)
-        subprocess.run(["python", "geocode.py"], check=True)
+    """
+    Queue a refresh and return its job ID straight away (202).
 
-        # Optionally, rebuild final CSV
-        df = load_best_data()
-        df.to_csv(GEOCODED_FILE, index=False)
+    If a refresh is already queued or running, its job is returned
+    instead of starting another. Poll ``/api/refresh/<job_id>`` or stream
+    ``/api/refresh/<job_id>/events`` for stage progress.
+    """
+    job, created = refresh_queue.submit()
+    response = refresh_job_response({**job, "job_id": job["id"], "deduplicated": not created}, 202)
+    response.headers["Location"] = f"/api/refresh/{job['id']}"
+    return response
 
-        detect_changes()
 
-        send_email_alert("Data refreshed", change_type="data_refresh")
+@app.route("/api/refresh/latest")
+def latest_refresh_job():
+    job = refresh_queue.store.latest()
+    if job is None:
+        return jsonify({"error": "No refresh has run yet"}), 404
+    return refresh_job_response(job)
 
-        return jsonify({
-            "status": "success",
-            "message": "Dashboard refreshed successfully",
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
-    except Exception as e:
-        logging.exception("Refresh failed")
-        return jsonify({
-            "status": "failed",
-            "error": str(e)
-        }), 500
+
+@app.route("/api/refresh/<job_id>")
+def refresh_job(job_id):
+    job = refresh_queue.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return refresh_job_response(job)
+
+
+@app.route("/api/refresh/<job_id>/events")
+def refresh_job_events(job_id):
+    """
+    Server-Sent Events: one ``data:`` message per job update until the
+    job finishes. Each open stream holds a worker, so prefer polling
+    behind sync gunicorn workers.
+    """
+    if refresh_queue.store.get(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def events():
+        last = None
+        while True:
+            job = refresh_queue.store.get(job_id)
+            snapshot = (job["status"], job["stage"], job["progress"], job["updated_at"])
+            if snapshot != last:
+                last = snapshot
+                yield f"data: {json.dumps(job)}\n\n"
+            if job["status"] not in ACTIVE_STATUSES:
+                return
+            time.sleep(SSE_POLL_SECONDS)
+
+    response = app.response_class(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 # =========================
 # API – FACILITY TYPE SUMMARY
 # =========================
-@app.route("/api/facility-types")
-def facility_types():
-    """Get facilities grouped by type with counts"""
-    df = load_best_data()
+def build_facility_types(snapshot):
+    df = snapshot.df
     if df.empty:
-        return jsonify({"types": [], "counts": {}})
+        return {"types": [], "counts": {}}
     
-    type_counts = df["facility_type"].value_counts().to_dict()
+    type_counts = {k: int(v) for k, v in df["facility_type"].value_counts().items()}
     
-    return jsonify({
+    return {
         "types": list(type_counts.keys()),
         "counts": type_counts
-    })
+    }
+
+
+@app.route("/api/facility-types")
+def facility_types():
+    """Get facilities grouped by type with counts"""
+    return cached_json("facility_types", build_facility_types)
+
+
+# =========================
+# API – NEAREST FACILITIES
+# =========================
+@app.route("/api/facilities/nearest", methods=["GET", "POST"])
+def nearest_facilities():
+    """
+    The ``k`` closest facilities to a point (default 10), optionally only
+    of some ``types`` (comma-separated, any case). Types that match no
+    facility are listed in ``unknown_types``; if none match, it is a 400
+    listing the valid ones.
+
+    GET ?lat=&lon=&k=&types= answers one point. POST
+    ``{"points": [[lat, lon], ...], "k": ..., "types": [...]}`` answers a
+    whole batch in one vectorized query.
+    """
+    if request.method == "POST":
+        data = request.get_json() or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected a JSON object"}), 400
+        try:
+            points = np.asarray(data.get("points", []), dtype="float64").reshape(-1, 2)
+        except (TypeError, ValueError):
+            return jsonify({"error": "points must be [[lat, lon], ...]"}), 400
+        k = data.get("k", 10)
+        types = data.get("types") or []
+        if isinstance(types, str):
+            types = types.split(",")
+        types = [str(t).strip() for t in types if str(t).strip()]
+    else:
+        lat = request.args.get("lat", type=float)
+        lon = request.args.get("lon", type=float)
+        if lat is None or lon is None:
+            return jsonify({"error": "lat and lon required"}), 400
+        points = np.array([[lat, lon]])
+        k = request.args.get("k", 10, type=int)
+        types = [t.strip() for t in request.args.get("types", "").split(",") if t.strip()]
+
+    if not isinstance(k, int) or not 1 <= k <= MAX_NEAREST_K:
+        return jsonify({"error": f"k must be between 1 and {MAX_NEAREST_K}"}), 400
+    if len(points) > MAX_NEAREST_POINTS:
+        return jsonify({"error": f"At most {MAX_NEAREST_POINTS} points per request"}), 400
+    if not np.isfinite(points).all():
+        return jsonify({"error": "Invalid coordinates"}), 400
+
+    snapshot = facility_store.current()
+    knn = snapshot.derive("nearest", lambda snap: NearestFacilities(snap.df))
+    types, unknown = knn.match_types(types)
+    if unknown and not types:
+        return jsonify({
+            "error": f"Unknown facility types: {', '.join(unknown)}",
+            "valid_types": sorted(knn.by_type),
+        }), 400
+    positions, distances = knn.nearest(points[:, 0], points[:, 1], k, types=types)
+    results = [
+        {"lat": float(lat), "lon": float(lon), "facilities": knn.records(pos, dist)}
+        for (lat, lon), pos, dist in zip(points, positions, distances)
+    ]
+
+    if request.method == "GET":
+        return jsonify({"k": k, "types": types, "unknown_types": unknown,
+                        "total": len(results[0]["facilities"]), **results[0]})
+    return jsonify({"k": k, "types": types, "unknown_types": unknown, "results": results})
 
 
 # =========================
@@ -334,131 +737,308 @@ def facility_types():
 # =========================
 @app.route("/api/auto-refresh", methods=["POST"])
 def auto_refresh():
-    """Trigger data refresh when user logs in"""
+    """
+    Report the last known data state when a user logs in.
+
+    Change detection runs on the monitor threads; this only reads the
+    latest result, which every worker shares.
+    """
+    state = monitor_state()
+    return jsonify({
+        "status": "success",
+        "data_changed": state["data_changed"],
+        "last_change": state["last_change"],
+        "last_checked": state["last_checked"],
+        "monitor_status": state["status"],
+        "total_facilities": len(facility_store.current()),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+
+
+# =========================
+# API – CHANGE LOG
+# =========================
+@app.route("/api/changes")
+def recent_changes():
+    """Latest row-level diffs, newest first (?limit=, default 10)"""
+    limit = max(1, min(request.args.get("limit", 10, type=int), 100))
+    return jsonify({"changes": history_store.changes(limit=limit, only_diffs=True)})
+
+
+def history_range():
+    """``start``/``end`` query args as ISO strings; a bare end date covers that whole day"""
+    start, end = request.args.get("start"), request.args.get("end")
+    if end and len(end) == 10:
+        end += "T23:59:59"
+    return start, end
+
+
+@app.route("/api/history")
+def history():
+    """
+    Summary trend between ``start`` and ``end`` (ISO dates or times).
+
+    ``points`` downsamples to that many evenly spaced summaries;
+    ``cities`` adds per-city counts (``all`` or a comma-separated list).
+    """
     try:
-        changed = detect_changes()
-        df = load_best_data()
-        
-        return jsonify({
-            "status": "success",
-            "data_changed": changed,
-            "total_facilities": len(df),
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
-    except Exception as e:
-        logging.exception("Auto-refresh failed")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        start, end = history_range()
+        points = request.args.get("points", type=int)
+        cities = request.args.get("cities")
+        if cities:
+            cities = True if cities == "all" else [c.strip() for c in cities.split(",") if c.strip()]
+        summaries = history_store.summaries(
+            start, end, points=max(1, min(points, 1000)) if points else None, cities=cities
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date: {e}"}), 400
+    return jsonify({"start": start, "end": end, "summaries": summaries})
+
+
+@app.route("/api/history/changes")
+def history_changes():
+    """Change-log entries between ``start`` and ``end``, newest first (diff counts only unless ``diff=1``)"""
+    try:
+        start, end = history_range()
+        changes = history_store.changes(
+            start, end,
+            limit=max(1, min(request.args.get("limit", 100, type=int), 1000)),
+            with_diff=request.args.get("diff") == "1",
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date: {e}"}), 400
+    return jsonify({"start": start, "end": end, "changes": changes})
 
 
 # =========================
 # API – ROUTE PLANNER
 # =========================
+def route_hits(snapshot, data):
+    """
+    Corridor search for a route planner request body.
+
+    Returns ``(hits, route)``: the matching rows in route order (None if
+    there is no data) and the origin, destination and corridor width.
+    Raises ValueError for a body that describes no route.
+    """
+    origin_lat = data.get("origin_lat")
+    origin_lon = data.get("origin_lon")
+    dest_lat = data.get("dest_lat")
+    dest_lon = data.get("dest_lon")
+    polyline = data.get("polyline")
+    corridor_km = data.get("corridor_km", 10)  # Default 10km corridor
+    facility_types_filter = data.get("facility_types", [])  # Optional filter
+    
+    if polyline:
+        try:
+            points = decode_polyline(polyline) if isinstance(polyline, str) else polyline
+            lats = [float(p[0]) for p in points]
+            lons = [float(p[1]) for p in points]
+        except (TypeError, ValueError, IndexError):
+            raise ValueError("Invalid polyline")
+        if len(lats) < 2:
+            raise ValueError("Polyline needs at least two points")
+    elif not all([origin_lat, origin_lon, dest_lat, dest_lon]):
+        raise ValueError("Missing coordinates")
+    
+    if snapshot.empty:
+        return None, None
+    
+    # The spatial index only covers geocoded facilities
+    if polyline:
+        hits = route_search(
+            snapshot.df, lats, lons, corridor_km,
+            index=snapshot.spatial_index, facility_types=facility_types_filter
+        )
+        origin_lat, origin_lon, dest_lat, dest_lon = lats[0], lons[0], lats[-1], lons[-1]
+    else:
+        hits = corridor_search(
+            snapshot.df, origin_lat, origin_lon, dest_lat, dest_lon, corridor_km,
+            index=snapshot.spatial_index, facility_types=facility_types_filter
+        )
+    return hits, {
+        "corridor_km": corridor_km,
+        "origin": {"lat": origin_lat, "lon": origin_lon},
+        "destination": {"lat": dest_lat, "lon": dest_lon}
+    }
+
+
 @app.route("/api/route/facilities-on-route", methods=["POST"])
 def facilities_on_route():
     """
     Find facilities along a route between origin and destination.
     Uses a corridor approach - finds facilities within a certain distance of the route.
+
+    Multi-stop routes can send ``polyline`` instead of origin/destination:
+    either an encoded polyline string or a list of [lat, lon] pairs. Those
+    results are ordered by distance along the route.
+    """
+    try:
+        hits, route = route_hits(facility_store.current(), request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if hits is None:
+        return jsonify({"facilities": [], "total": 0})
+    facilities_on_route = route_records(hits)
+    
+    return jsonify({
+        "facilities": facilities_on_route,
+        "total": len(facilities_on_route),
+        **route
+    })
+
+
+def is_id_list(value):
+    """True if ``value`` is a JSON list of facility ID strings"""
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+@app.route("/api/route/optimize", methods=["POST"])
+def optimize_route():
+    """
+    Order selected facilities into a short visit sequence.
+    Takes facility_ids from a route search plus origin and optional destination.
     """
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
     
+    facility_ids = data.get("facility_ids", [])
     origin_lat = data.get("origin_lat")
     origin_lon = data.get("origin_lon")
     dest_lat = data.get("dest_lat")
     dest_lon = data.get("dest_lon")
-    corridor_km = data.get("corridor_km", 10)  # Default 10km corridor
-    facility_types_filter = data.get("facility_types", [])  # Optional filter
     
-    if not all([origin_lat, origin_lon, dest_lat, dest_lon]):
+    if not all([origin_lat, origin_lon]):
         return jsonify({"error": "Missing coordinates"}), 400
+    if not is_id_list(facility_ids):
+        return jsonify({"error": "facility_ids must be a list of facility IDs"}), 400
+    if not facility_ids:
+        return jsonify({"error": "No facilities selected"}), 400
+    try:
+        coords = [float(v) for v in (origin_lat, origin_lon, dest_lat or 0, dest_lon or 0)]
+        time_budget_ms = float(data.get("time_budget_ms", 500))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Coordinates and time_budget_ms must be numbers"}), 400
+    if not np.isfinite(coords).all():
+        return jsonify({"error": "Invalid coordinates"}), 400
+    origin_lat, origin_lon = coords[:2]
+    if dest_lat and dest_lon:
+        dest_lat, dest_lon = coords[2:]
+    if not time_budget_ms >= 0:
+        return jsonify({"error": "time_budget_ms must be a non-negative number"}), 400
+    # Search time budget, capped so a request can't pin a worker
+    time_budget_ms = min(time_budget_ms, 5000)
     
-    df = load_best_data()
-    if df.empty:
-        return jsonify({"facilities": [], "total": 0})
-    
-    # Filter to geocoded facilities only
-    df = df[df["latitude"].notna() & df["longitude"].notna()]
+    snapshot = facility_store.current()
+    positions = snapshot.positions(facility_ids)
+    missing = [fid for fid, pos in zip(facility_ids, positions) if pos < 0]
+    stops = snapshot.df.iloc[positions[positions >= 0]]
+    stops = stops[stops["latitude"].notna() & stops["longitude"].notna()]
+    stops = stops.drop_duplicates("facility_id")
     
-    # Apply facility type filter if provided
-    if facility_types_filter:
-        df = df[df["facility_type"].isin(facility_types_filter)]
+    destination = (dest_lat, dest_lon) if dest_lat and dest_lon else None
+    order, legs = optimize_visit_order(
+        stops["latitude"].to_numpy(), stops["longitude"].to_numpy(),
+        (origin_lat, origin_lon), destination, time_budget=time_budget_ms / 1000
+    )
     
-    # Calculate distance from route line for each facility
-    from math import radians, sin, cos, sqrt, atan2
+    ordered = stops.iloc[order].copy()
+    ordered["leg_km"] = legs[:len(order)].round(2)
+    ordered["cumulative_km"] = legs[:len(order)].cumsum().round(2)
+    records = [
+        {"facility_id": r["facility_id"],
+         "facility_name": r.get("facility name", "Unknown"),
+         "city": r.get("city", ""),
+         "facility_type": r.get("facility_type", "Unknown"),
+         "latitude": r["latitude"],
+         "longitude": r["longitude"],
+         "leg_km": r["leg_km"],
+         "cumulative_km": r["cumulative_km"]}
+        for r in ordered.astype("object").where(ordered.notna(), None).to_dict(orient="records")
+    ]
     
-    def haversine(lat1, lon1, lat2, lon2):
-        """Calculate distance in km between two points"""
-        R = 6371  # Earth's radius in km
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        return R * c
+    return jsonify({
+        "stops": records,
+        "total": len(records),
+        "total_distance_km": round(float(legs.sum()), 2),
+        "missing_ids": missing,
+        "origin": {"lat": origin_lat, "lon": origin_lon},
+        "destination": {"lat": dest_lat, "lon": dest_lon} if destination else None
+    })
+
+
+def product_join(snapshot):
+    """The snapshot's facility -> product line join, rebuilt when product_map.json changes"""
+    mtime = os.path.getmtime(PRODUCT_MAP_FILE) if os.path.exists(PRODUCT_MAP_FILE) else None
+    return snapshot.derive(
+        ("product_join", mtime),
+        lambda snap: ProductJoin.from_frame(snap.df, load_product_map(PRODUCT_MAP_FILE))
+    )
+
+
+@app.route("/api/route/stock-plan", methods=["POST"])
+def stock_plan():
+    """
+    Product lines to load the van with for a trip.
+
+    Send ``facility_ids`` (e.g. the stops from /api/route/optimize, in
+    visit order), or the same corridor body as
+    /api/route/facilities-on-route to plan for every facility along it.
+    Returns each stop's product lines plus, for the whole trip, how many
+    stops need each line. Types missing from data/product_map.json get the
+    "Unknown" type's lines and are listed in ``unmapped_types``.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    if data.get("facility_ids") is not None and not is_id_list(data["facility_ids"]):
+        return jsonify({"error": "facility_ids must be a list of facility IDs"}), 400
+    snapshot = facility_store.current()
     
-    def point_to_line_distance(px, py, x1, y1, x2, y2):
-        """Calculate perpendicular distance from point to line segment using haversine"""
-        # Total route length
-        route_len = haversine(y1, x1, y2, x2)
-        
-        if route_len < 0.001:
-            # Origin and destination are the same point
-            return haversine(py, px, y1, x1)
-        
-        # Use dot product in scaled coordinate space to find t
-        # Scale lon differences by cos(lat) to approximate equal-area
-        import math
-        cos_lat = math.cos(math.radians((y1 + y2) / 2))
-        dx = (x2 - x1) * cos_lat
-        dy = y2 - y1
-        dpx = (px - x1) * cos_lat
-        dpy = py - y1
-        
-        t = (dpx * dx + dpy * dy) / (dx * dx + dy * dy)
-        t = max(0.0, min(1.0, t))
-        
-        # Closest point on line segment
-        closest_lon = x1 + t * (x2 - x1)
-        closest_lat = y1 + t * (y2 - y1)
-        
-        return haversine(py, px, closest_lat, closest_lon)
+    missing = []
+    if data.get("facility_ids"):
+        facility_ids = list(dict.fromkeys(data["facility_ids"]))
+        positions = snapshot.positions(facility_ids)
+        missing = [fid for fid, pos in zip(facility_ids, positions) if pos < 0]
+        positions = positions[positions >= 0]
+        route = None
+    else:
+        try:
+            hits, route = route_hits(snapshot, data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        ids = hits["facility_id"] if hits is not None else []
+        positions = pd.unique(snapshot.positions(ids))
     
-    facilities_on_route = []
+    join = product_join(snapshot)
+    stop_types, stop_lines, totals, by_type = join.plan(positions)
+    rows = snapshot.df.iloc[positions]
+    names = rows["facility name"] if safe_col(rows, "facility name") else pd.Series("Unknown", index=rows.index)
+    cities = rows["city"] if safe_col(rows, "city") else pd.Series("", index=rows.index)
     
-    for _, row in df.iterrows():
-        facility_lat = row["latitude"]
-        facility_lon = row["longitude"]
-        
-        # Calculate distance from route
-        distance = point_to_line_distance(
-            facility_lon, facility_lat,
-            origin_lon, origin_lat,
-            dest_lon, dest_lat
+    stops = [
+        {"facility_id": fid,
+         "facility_name": name,
+         "city": city,
+         "facility_type": facility_type,
+         "products": lines}
+        for fid, name, city, facility_type, lines in zip(
+            rows["facility_id"].tolist(),
+            names.astype("object").where(names.notna(), None).tolist(),
+            cities.astype("object").where(cities.notna(), None).tolist(),
+            stop_types, stop_lines
         )
-        
-        # Also calculate distance from origin (for sorting)
-        dist_from_origin = haversine(origin_lat, origin_lon, facility_lat, facility_lon)
-        
-        if distance <= corridor_km:
-            facilities_on_route.append({
-                "facility_name": row.get("facility name", "Unknown"),
-                "city": row.get("city", ""),
-                "address": row.get("physical address", "") or row.get("address", ""),
-                "facility_type": row.get("facility_type", "Unknown"),
-                "latitude": facility_lat,
-                "longitude": facility_lon,
-                "distance_from_route_km": round(distance, 2),
-                "distance_from_origin_km": round(dist_from_origin, 2)
-            })
-    
-    # Sort by distance from origin
-    facilities_on_route.sort(key=lambda x: x["distance_from_origin_km"])
+    ]
     
     return jsonify({
-        "facilities": facilities_on_route,
-        "total": len(facilities_on_route),
-        "corridor_km": corridor_km,
-        "origin": {"lat": origin_lat, "lon": origin_lon},
-        "destination": {"lat": dest_lat, "lon": dest_lon}
+        "stops": stops,
+        "total_stops": len(stops),
+        "products": [{"product": p, "stops": n} for p, n in totals.items()],
+        "by_type": by_type,
+        "unmapped_types": [t for t in by_type if t in join.unmapped],
+        "missing_ids": missing,
+        "route": route
     })
 
 
@@ -494,6 +1074,46 @@ def geocode_address():
         return jsonify({"success": False, "error": str(e)})
 
 
+# =========================
+# API – TERRITORY PLANNING
+# =========================
+@app.route("/api/planning/territories", methods=["POST"])
+def plan_rep_territories():
+    """
+    Split facilities among reps and plan each rep's daily visits.
+    Same planner as `python -m backend.territory_planner`, without the process pool.
+    """
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    
+    try:
+        reps = int(data.get("reps", 0))
+        daily_cap = int(data.get("daily_cap", 15))
+        time_budget_ms = float(data.get("time_budget_ms", 200))
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "reps, daily_cap and time_budget_ms must be numbers"}), 400
+    cities = data.get("cities", [])
+    facility_types_filter = data.get("facility_types", [])
+    
+    if reps < 1 or daily_cap < 1:
+        return jsonify({"error": "reps and daily_cap must be positive"}), 400
+    if not time_budget_ms >= 0:
+        return jsonify({"error": "time_budget_ms must be a non-negative number"}), 400
+    daily_cap = min(daily_cap, MAX_DAILY_CAP)
+    time_budget_ms = min(time_budget_ms, 2000)
+    
+    df = filter_facilities(facility_store.current().df, cities, facility_types_filter)
+    located = int((df["latitude"].notna() & df["longitude"].notna()).sum()) if not df.empty else 0
+    # More reps than facilities would only leave territories empty
+    reps = min(reps, located, MAX_TERRITORY_REPS)
+    if reps < 1:
+        return jsonify({"reps": 0, "daily_cap": daily_cap, "total_facilities": 0, "territories": []})
+    
+    plan = plan_territories(df, reps, daily_cap, time_budget=time_budget_ms / 1000)
+    return jsonify(plan)
+
+
 @app.route("/route-planner")
 def route_planner():
     """Route planner page for sales reps"""
@@ -504,6 +1124,6 @@ def route_planner():
 # RUN
 # =========================
 if __name__ == "__main__":
-    # Auto-refresh on startup
-    detect_changes()
+    # Check for changes on startup, in the background
+    change_monitor.start()
     app.run(host='0.0.0.0', debug=True, use_reloader=False)
\ No newline at end of file
@@ -1,15 +1,22 @@
-﻿import hashlib
-import pandas as pd
+﻿import pandas as pd
 import smtplib
 from email.message import EmailMessage
 import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.facility_store import normalize_facilities  # noqa: E402
+from backend.snapshot_diff import (  # noqa: E402
+    describe_diff, diff_snapshots, has_changes, load_baseline, save_baseline
+)
+
 # =========================
 # CONFIG
 # =========================
 DATA_FILE = "data/facilities_raw.csv"
-HASH_FILE = "data/last_hash.txt"
+# Rows of the last alerted snapshot
+BASELINE_FILE = "data/raw_diff_baseline.csv.gz"
 
 SENDER_EMAIL = "mkanganwigrace4@gmail.com"
 RECEIVER_EMAIL = "nmkanganwi@pulse-pharmaceuticals.co.zw"
@@ -20,13 +27,6 @@ SMTP_PORT = 587
 # Use Gmail App Password (NOT your normal Gmail password)
 EMAIL_PASSWORD = "PUT_YOUR_GMAIL_APP_PASSWORD_HERE"
 
-# =========================
-# HELPERS
-# =========================
-def file_hash(path):
-    with open(path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
-
 # =========================
 # MAIN LOGIC
 # =========================
@@ -34,14 +34,17 @@ if not os.path.exists(DATA_FILE):
     print("❌ Data file not found.")
     exit()
 
-new_hash = file_hash(DATA_FILE)
-old_hash = ""
+current = normalize_facilities(pd.read_csv(DATA_FILE))
+baseline = load_baseline(BASELINE_FILE)
 
-if os.path.exists(HASH_FILE):
-    with open(HASH_FILE, "r") as f:
-        old_hash = f.read().strip()
+if baseline is None:
+    save_baseline(current, BASELINE_FILE)
+    print("ℹ️ Baseline snapshot saved; changes are reported from the next run")
+    exit()
+
+diff = diff_snapshots(baseline, current)
 
-if new_hash != old_hash:
+if has_changes(diff):
     print("🔔 Change detected — sending email alert")
 
     msg = EmailMessage()
@@ -57,6 +60,8 @@ A change has been detected in the HPA facilities dataset.
 📅 Date: {datetime.now().strftime('%d %b %Y')}
 ⏰ Time: {datetime.now().strftime('%H:%M:%S')}
 
+{describe_diff(diff, examples=20)}
+
 The dashboard has been refreshed with the latest data.
 
 Regards,
@@ -69,8 +74,7 @@ HPA Intelligence Dashboard
             server.login(SENDER_EMAIL, EMAIL_PASSWORD)
             server.send_message(msg)
 
-        with open(HASH_FILE, "w") as f:
-            f.write(new_hash)
+        save_baseline(current, BASELINE_FILE)
 
         print("✅ Email alert sent successfully")
 
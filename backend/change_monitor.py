@@ -0,0 +1,131 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+# Seconds between checks of the data files
+POLL_SECONDS = 5
+
+# Seconds between full checks even if no file was touched
+RECHECK_SECONDS = 15 * 60
+
+
+class ChangeMonitor:
+    """Runs change detection on a background thread.
+
+    The thread stats ``paths`` every ``poll_seconds`` and calls ``check()``
+    when one of them is written (or every ``recheck_seconds`` regardless).
+    Requests only ever read ``state()``, which is the result of the last
+    check, so a page load never hashes, diffs or emails anything.
+
+    ``check`` returns the change-log entry of a new change, or None. Each
+    process runs its own monitor; ``publish`` (if given) is called with
+    the new state after every check, e.g. to share it between processes.
+    """
+
+    def __init__(self, check, paths, poll_seconds=POLL_SECONDS, recheck_seconds=RECHECK_SECONDS,
+                 publish=None):
+        self.check = check
+        self.publish = publish
+        self.paths = list(paths)
+        self.poll_seconds = poll_seconds
+        self.recheck_seconds = recheck_seconds
+        self._state = {
+            "status": "starting",
+            "data_changed": False,
+            "last_checked": None,
+            "last_change": None,
+            "error": None,
+        }
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the monitor thread once per process; later calls are no-ops"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="change-monitor", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Ask for a check now instead of waiting for the next poll"""
+        self._wake.set()
+
+    def state(self):
+        return dict(self._state)
+
+    def check_now(self):
+        """Check in the calling thread (e.g. right after a refresh) and return the entry"""
+        return self._check_once()
+
+    def _signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return signature
+
+    def _run(self):
+        signature = None
+        last_check = float("-inf")
+        while not self._stop.is_set():
+            now = time.monotonic()
+            current = self._signature()
+            forced = self._wake.is_set()
+            self._wake.clear()
+
+            if forced or current != signature or now - last_check >= self.recheck_seconds:
+                signature, last_check = current, now
+                self._check_once()
+
+            self._wake.wait(self.poll_seconds)
+
+    def _check_once(self):
+        try:
+            entry = self.check()
+        except Exception as e:
+            logging.exception("Change check failed")
+            self._set_state(dict(self._state, status="error", error=str(e),
+                                 last_checked=datetime.now().isoformat(timespec="seconds")))
+            return None
+
+        state = dict(
+            self._state,
+            status="ok",
+            error=None,
+            data_changed=entry is not None,
+            last_checked=datetime.now().isoformat(timespec="seconds"),
+        )
+        if entry is not None:
+            diff = entry.get("diff")
+            state["last_change"] = {
+                "timestamp": entry.get("timestamp"),
+                "message": entry.get("message"),
+                "counts": diff["counts"] if diff else None,
+            }
+        self._set_state(state)
+        return entry
+
+    def _set_state(self, state):
+        self._state = state
+        if self.publish is not None:
+            try:
+                self.publish(state)
+            except Exception:
+                logging.exception("Publishing the change monitor state failed")
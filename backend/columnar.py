@@ -0,0 +1,332 @@
+"""
+Columnar binary facility snapshots.
+
+A snapshot is a directory of plain ``.npy`` arrays plus ``manifest.json``:
+
+- float and integer columns (latitude, longitude) as typed arrays
+- categorical columns (city, facility_type, ...) as int32 codes, with the
+  categories in the manifest
+- free text (names, addresses, facility_id) as one UTF-8 buffer plus
+  int64 offsets, Arrow-style
+
+The snapshot also carries the ``GridIndex`` cell table. Every array is
+memory-mapped on load, so numeric columns and the index are never copied
+or rebuilt, and all processes reading a snapshot share their pages. Snapshots
+live in ``<root>/<version>/`` and ``<root>/CURRENT`` names the live one;
+a new one is published by replacing that file, so readers never see a
+half-written snapshot.
+
+Build one from the best CSV:  python -m backend.columnar [--source CSV]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backend.spatial_index import GridIndex
+from backend.utils.facility_type import RULES_FILE
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_ROOT = os.path.join(DATA_DIR, "snapshots")
+# The CSVs a snapshot is built from, best first (as the app reads them)
+DEFAULT_SOURCES = [
+    os.path.join(DATA_DIR, name)
+    for name in ("facilities_geocoded.csv", "facilities_cleaned.csv", "facilities_raw.csv")
+]
+
+FORMAT = "hpa-facilities"
+FORMAT_VERSION = 1
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# Always stored as categories, whatever their cardinality
+CATEGORICAL_COLUMNS = ["city", "facility_type"]
+
+# Other text columns with at most this share of distinct values are categorical
+CATEGORY_MAX_RATIO = 0.5
+
+# Snapshot directories kept besides the live one
+KEEP_PREVIOUS = 2
+
+
+# =========================
+# ENCODING
+# =========================
+def _column_kind(series, name):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if name in CATEGORICAL_COLUMNS or isinstance(series.dtype, pd.CategoricalDtype):
+        return "category"
+    if series.nunique(dropna=True) <= CATEGORY_MAX_RATIO * max(len(series), 1):
+        return "category"
+    return "string"
+
+
+def _encode_strings(series):
+    """UTF-8 buffer, int64 offsets and a missing-value mask (None if none missing)"""
+    missing = series.isna().to_numpy()
+    encoded = [b"" if m else str(v).encode("utf-8") for v, m in zip(series.to_numpy(dtype=object), missing)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets, (missing if missing.any() else None)
+
+
+def _decode_strings(data, offsets, missing):
+    buffer = data.tobytes()
+    values = [
+        buffer[start:end].decode("utf-8")
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+    column = np.array(values, dtype=object)
+    if missing is not None:
+        column[missing] = None
+    return column
+
+
+def _save(directory, name, array, digest):
+    array = np.ascontiguousarray(array)
+    np.save(os.path.join(directory, name), array, allow_pickle=False)
+    digest.update(name.encode("utf-8"))
+    digest.update(array.tobytes())
+    return name
+
+
+# =========================
+# WRITE
+# =========================
+def write_snapshot(df, root, source=None):
+    """
+    Write a normalized facilities frame (see ``normalize_facilities``) as
+    a new snapshot under ``root`` and make it current.
+
+    ``source`` is the CSV it came from; its size and mtime are recorded so
+    readers can tell when the CSV has moved on. Returns the version (a
+    content hash; writing the same data again publishes nothing new).
+    """
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".staging-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    digest = hashlib.md5()
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        kind = _column_kind(series, name)
+        column = {"name": name, "kind": kind}
+        stem = f"c{i}"
+        if kind == "numeric":
+            column["data"] = _save(staging, f"{stem}.npy", series.to_numpy(), digest)
+        elif kind == "category":
+            codes, categories = pd.factorize(series, sort=True, use_na_sentinel=True)
+            column["categories"] = [str(c) for c in categories]
+            column["codes"] = _save(staging, f"{stem}.codes.npy", codes.astype(np.int32), digest)
+            digest.update(json.dumps(column["categories"]).encode("utf-8"))
+        else:
+            data, offsets, missing = _encode_strings(series)
+            column["data"] = _save(staging, f"{stem}.data.npy", data, digest)
+            column["offsets"] = _save(staging, f"{stem}.offsets.npy", offsets, digest)
+            if missing is not None:
+                column["missing"] = _save(staging, f"{stem}.missing.npy", missing, digest)
+        columns.append(column)
+
+    # The spatial index is built here once, not in every process that maps it
+    params, arrays = GridIndex.from_frame(df).to_arrays()
+    spatial_index = dict(params)
+    for name, values in arrays.items():
+        spatial_index[name] = _save(staging, f"index.{name}.npy", values, digest)
+
+    version = digest.hexdigest()
+    manifest = {
+        "format": FORMAT,
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "rows": int(len(df)),
+        "columns": columns,
+        "spatial_index": spatial_index,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "source": _source_stat(source) if source else None,
+        # facility_type is derived with these rules; editing them reclassifies
+        "type_rules": _source_stat(RULES_FILE) if os.path.exists(RULES_FILE) else None,
+    }
+    _write_manifest(staging, manifest)
+
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        shutil.rmtree(staging)
+        # Same data; only the recorded source may have changed
+        _write_manifest(target, manifest)
+    else:
+        os.replace(staging, target)
+
+    _set_current(root, version)
+    _prune(root, keep={version})
+    return version
+
+
+def _write_manifest(directory, manifest):
+    tmp = os.path.join(directory, f"{MANIFEST_FILE}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST_FILE))
+
+
+def _source_stat(path):
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _set_current(root, version):
+    tmp = os.path.join(root, f"{CURRENT_FILE}.tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+
+def _prune(root, keep):
+    """Drop all but the newest ``KEEP_PREVIOUS`` old snapshots (readers may still map them)"""
+    old = [
+        entry for entry in os.scandir(root)
+        if entry.is_dir() and not entry.name.startswith(".") and entry.name not in keep
+    ]
+    old.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in old[KEEP_PREVIOUS:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# =========================
+# READ
+# =========================
+def current_version(root):
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(root, version=None):
+    version = version or current_version(root)
+    if version is None:
+        return None
+    with open(os.path.join(root, version, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT or manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format in {root}/{version}")
+    return manifest
+
+
+def is_stale(manifest):
+    """True if the CSV (or type rules) the snapshot was built from have been rewritten since"""
+    for key in ("source", "type_rules"):
+        recorded = manifest.get(key)
+        if not recorded:
+            continue
+        try:
+            st = os.stat(recorded["path"])
+        except FileNotFoundError:
+            continue
+        if (st.st_mtime_ns, st.st_size) != (recorded["mtime_ns"], recorded["size"]):
+            return True
+    return False
+
+
+def load_snapshot(root, version=None, mmap=True):
+    """
+    The snapshot as a DataFrame plus its manifest.
+
+    Numeric columns and categorical codes stay memory-mapped (read-only);
+    text columns are decoded into Python strings.
+    """
+    manifest = read_manifest(root, version)
+    directory = os.path.join(root, manifest["version"])
+    mmap_mode = "r" if mmap else None
+
+    def array(name):
+        return np.load(os.path.join(directory, name), mmap_mode=mmap_mode, allow_pickle=False)
+
+    data = {}
+    for column in manifest["columns"]:
+        if column["kind"] == "numeric":
+            data[column["name"]] = array(column["data"])
+        elif column["kind"] == "category":
+            data[column["name"]] = pd.Categorical.from_codes(
+                array(column["codes"]), categories=column["categories"]
+            )
+        else:
+            missing = array(column["missing"]) if "missing" in column else None
+            data[column["name"]] = _decode_strings(array(column["data"]), array(column["offsets"]), missing)
+
+    df = pd.DataFrame(data, copy=False)
+    return df, manifest
+
+
+def load_spatial_index(root, manifest, df, mmap=True):
+    """The snapshot's prebuilt ``GridIndex`` over ``df`` (None for older snapshots)"""
+    spec = manifest.get("spatial_index")
+    if not spec or "latitude" not in df.columns or "longitude" not in df.columns:
+        return None
+    directory = os.path.join(root, manifest["version"])
+    mmap_mode = "r" if mmap else None
+    positions, offsets = (
+        np.load(os.path.join(directory, spec[name]), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in ("positions", "offsets")
+    )
+    return GridIndex.from_arrays(
+        df["latitude"].to_numpy(), df["longitude"].to_numpy(), spec, positions, offsets
+    )
+
+
+def ensure_snapshot(root=DEFAULT_ROOT, sources=DEFAULT_SOURCES):
+    """
+    Make sure ``root`` has a current snapshot of the best CSV in ``sources``,
+    building one if there is none or it is stale. Returns its version, or
+    None if there is no data at all.
+    """
+    try:
+        manifest = read_manifest(root)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is not None and not is_stale(manifest):
+        return manifest["version"]
+
+    source = next((p for p in sources if os.path.exists(p) and os.path.getsize(p)), None)
+    if source is None:
+        return None
+    # Imported here: facility_store imports this module
+    from backend.facility_store import normalize_facilities
+
+    return write_snapshot(normalize_facilities(pd.read_csv(source)), root, source=source)
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    from backend.facility_store import normalize_facilities
+
+    parser = argparse.ArgumentParser(description="Build the columnar facility snapshot")
+    parser.add_argument("--source", default=None, help="CSV to convert (default: best available)")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    args = parser.parse_args(argv)
+
+    source = args.source or next(
+        (p for p in DEFAULT_SOURCES if os.path.exists(p) and os.path.getsize(p)), None
+    )
+    if source is None:
+        parser.error("no facilities CSV found")
+
+    df = normalize_facilities(pd.read_csv(source))
+    version = write_snapshot(df, args.root, source=source)
+    print(f"✅ Snapshot {version[:8]}: {len(df)} rows from {source} -> {args.root}")
+
+
+if __name__ == "__main__":
+    main()
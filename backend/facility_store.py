@@ -0,0 +1,242 @@
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import (
+    current_version, is_stale, load_snapshot, load_spatial_index, read_manifest
+)
+from backend.spatial_index import GridIndex
+from backend.utils.facility_type import detect_facility_types
+from backend.utils.fingerprint import fingerprint_frame
+
+
+# =========================
+# SNAPSHOT
+# =========================
+class FacilitySnapshot:
+    """An immutable, fully-loaded view of the facility data.
+
+    Readers hold a reference to one snapshot for the whole request, so a
+    reload happening in parallel can never hand them a half-loaded frame.
+    """
+
+    def __init__(self, df, path=None, version="empty", mtime=None):
+        self.df = df
+        self.path = path
+        self.version = version
+        self.mtime = mtime
+        self.loaded_at = datetime.now()
+        self._derived = {}
+        # Reentrant: a builder may derive from another derived value
+        self._derived_lock = threading.RLock()
+
+    def derive(self, key, builder):
+        """Build a value from this snapshot once and memoize it.
+
+        Anything derived from the frame (indexes, aggregates, serialized
+        payloads) lives and dies with the snapshot, so it can never be
+        served against a different version of the data.
+        """
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = builder(self)
+            return self._derived[key]
+
+    @property
+    def spatial_index(self):
+        return self.derive("spatial_index", lambda snap: GridIndex.from_frame(snap.df))
+
+    @property
+    def id_index(self):
+        """pd.Index of facility IDs (may repeat in a CSV that brings its own)"""
+        return self.derive("id_index", lambda snap: pd.Index(
+            snap.df["facility_id"] if "facility_id" in snap.df.columns else []
+        ))
+
+    def positions(self, facility_ids):
+        """Row positions of ``facility_ids`` (-1 where unknown).
+
+        IDs are unique in data normalized here, but a CSV that brings its
+        own facility_id column may repeat one; that ID resolves to its
+        first row rather than failing the lookup.
+        """
+        def build(snap):
+            ids = snap.id_index
+            first = ~ids.duplicated()
+            # Trailing -1 so an unknown ID (get_indexer's -1) maps to -1
+            return ids[first], np.append(np.flatnonzero(first), -1)
+
+        ids, rows = self.derive("id_positions", build)
+        found = ids.get_indexer(pd.Index(facility_ids, dtype="object"))
+        return rows[found]
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def __len__(self):
+        return len(self.df)
+
+
+def normalize_facilities(df):
+    """Normalize column names and types of a raw facilities frame"""
+    df.columns = df.columns.str.strip().str.lower()
+
+    # Normalize facility name
+    if "facility_name" in df.columns and "facility name" not in df.columns:
+        df.rename(columns={"facility_name": "facility name"}, inplace=True)
+
+    # Normalize lat/lng
+    for col in ["latitude", "longitude"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+
+    # Add facility type if missing
+    if "facility_type" not in df.columns:
+        df["facility_type"] = detect_facility_types(df["facility name"])
+
+    # Stable ID that survives row reordering between scrapes
+    if "facility_id" not in df.columns:
+        df["facility_id"] = fingerprint_frame(df)
+
+    return df
+
+
+def _file_md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# =========================
+# STORE
+# =========================
+class FacilityStore:
+    """Process-wide cache of the best available facilities CSV.
+
+    The first file in ``paths`` that exists and is non-empty wins, matching
+    the old ``load_best_data`` fallback order. Each call to ``current()``
+    only stats the files; the CSV is re-read when a file's mtime or size
+    changes, and the new snapshot is swapped in only if its content hash
+    differs from the one being served.
+
+    With a ``snapshot_dir``, its current columnar snapshot (see
+    ``backend.columnar``) is memory-mapped instead of parsing any CSV,
+    unless the CSV it was built from has been rewritten since.
+    """
+
+    def __init__(self, paths, snapshot_dir=None):
+        self.paths = list(paths)
+        self.snapshot_dir = snapshot_dir
+        self._snapshot = FacilitySnapshot(pd.DataFrame())
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        signature = []
+        paths = self.paths
+        if self.snapshot_dir:
+            paths = [os.path.join(self.snapshot_dir, "CURRENT"), *paths]
+        for path in paths:
+            try:
+                st = os.stat(path)
+                signature.append((path, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def current(self):
+        """Return the latest snapshot, reloading only if the files changed"""
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return self._snapshot
+
+        with self._lock:
+            # Another thread may have reloaded while we waited
+            if signature != self._signature:
+                self._reload(signature)
+            return self._snapshot
+
+    def reload(self):
+        """Force a reload on the next ``current()`` call"""
+        with self._lock:
+            self._signature = None
+
+    def _reload_columnar(self, signature):
+        """Serve the current columnar snapshot; False if there is none or it is stale"""
+        version = current_version(self.snapshot_dir)
+        if version is None:
+            return False
+        try:
+            manifest = read_manifest(self.snapshot_dir, version)
+            if is_stale(manifest):
+                return False
+            if version == self._snapshot.version:
+                self._signature = signature
+                return True
+            df, manifest = load_snapshot(self.snapshot_dir, version)
+            index = load_spatial_index(self.snapshot_dir, manifest, df)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Columnar snapshot {version[:8]} unusable ({e}); reading CSV")
+            return False
+        if df.empty:
+            return False
+
+        path = os.path.join(self.snapshot_dir, version)
+        source = manifest.get("source")
+        # "Last updated" is when the data was written, not when it was converted
+        mtime = source["mtime_ns"] / 1e9 if source else os.path.getmtime(os.path.join(path, "manifest.json"))
+        snapshot = FacilitySnapshot(df, path=path, version=version, mtime=mtime)
+        if index is not None:
+            snapshot.derive("spatial_index", lambda snap: index)
+        snapshot.spatial_index
+        self._snapshot = snapshot
+        self._signature = signature
+        logging.info(f"Mapped columnar snapshot {version[:8]} ({len(df)} rows)")
+        return True
+
+    def _reload(self, signature):
+        if self.snapshot_dir and self._reload_columnar(signature):
+            return
+
+        for path in self.paths:
+            if not os.path.exists(path):
+                continue
+
+            version = _file_md5(path)
+            if path == self._snapshot.path and version == self._snapshot.version:
+                # Touched but unchanged - keep serving the same snapshot
+                self._signature = signature
+                return
+
+            df = pd.read_csv(path)
+            if df.empty:
+                continue
+
+            df = normalize_facilities(df)
+            snapshot = FacilitySnapshot(
+                df, path=path, version=version, mtime=os.path.getmtime(path)
+            )
+            # Build the index before publishing so no request pays for it
+            snapshot.spatial_index
+            self._snapshot = snapshot
+            self._signature = signature
+            logging.info(
+                f"Loaded facility snapshot {version[:8]} from {path} ({len(df)} rows)"
+            )
+            return
+
+        logging.warning("No data files found")
+        self._snapshot = FacilitySnapshot(pd.DataFrame())
+        self._signature = signature
@@ -0,0 +1,321 @@
+"""
+Append-only change log and summary history.
+
+Both live in one SQLite file, indexed by time, so a date range or a
+downsampled trend reads only the rows it returns. Per-city counts are
+delta-encoded: each summary stores only the cities whose count changed,
+plus a full keyframe every ``KEYFRAME_EVERY`` summaries, so rebuilding
+``by_city`` never reads further back than the last keyframe.
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+# Summaries between full by_city keyframes
+KEYFRAME_EVERY = 32
+
+SUMMARY_FIELDS = ["total_facilities", "geocoded_facilities", "missing_gps", "total_cities"]
+
+
+def _timestamp(value):
+    """ISO ``YYYY-MM-DDTHH:MM:SS`` from a datetime or any legacy date string"""
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="seconds")
+    return datetime.fromisoformat(str(value).strip()).isoformat(timespec="seconds")
+
+
+class HistoryStore:
+    """Change-log entries and facility summaries, append-only"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS changes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    message TEXT,
+                    entry TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS changes_timestamp ON changes (timestamp);
+
+                CREATE TABLE IF NOT EXISTS facility_types (
+                    name TEXT PRIMARY KEY,
+                    first_seen TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS summaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    taken_at TEXT NOT NULL,
+                    total_facilities INTEGER,
+                    geocoded_facilities INTEGER,
+                    missing_gps INTEGER,
+                    total_cities INTEGER,
+                    keyframe INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS summaries_taken_at ON summaries (taken_at);
+
+                -- Change in a city's count since the previous summary
+                -- (its full count on keyframes)
+                CREATE TABLE IF NOT EXISTS city_deltas (
+                    summary_id INTEGER NOT NULL,
+                    city TEXT NOT NULL,
+                    delta INTEGER NOT NULL,
+                    PRIMARY KEY (summary_id, city)
+                );
+
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """A connection for one transaction, closed afterwards (``with conn`` only commits)"""
+        with closing(self._connect()) as conn, conn:
+            yield conn
+
+    @contextmanager
+    def exclusive(self):
+        """
+        A connection holding the file's write lock for the whole block,
+        committed at the end (rolled back on error).
+
+        Every process shares the file, so a read-check-append run inside
+        the block (e.g. "is this snapshot logged yet? if not, log it")
+        happens in one process at a time.
+        """
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    # =========================
+    # META
+    # =========================
+    def get_meta(self, key, default=None, conn=None):
+        """A JSON value stored under ``key`` (``default`` if there is none)"""
+        if conn is None:
+            with self._connection() as conn:
+                return self.get_meta(key, default, conn)
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, key, value, conn=None):
+        if conn is None:
+            with self._connection() as conn:
+                return self.set_meta(key, value, conn)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    # =========================
+    # CHANGES
+    # =========================
+    def append_change(self, entry, conn=None):
+        """Log one change entry; returns the facility types seen for the first time"""
+        if conn is None:
+            with self._connection() as conn:
+                return self.append_change(entry, conn)
+
+        timestamp = _timestamp(entry.get("timestamp") or entry.get("time"))
+        conn.execute(
+            "INSERT INTO changes (timestamp, message, entry) VALUES (?, ?, ?)",
+            (timestamp, entry.get("message") or entry.get("event"), json.dumps(entry)),
+        )
+        new_types = []
+        for name in entry.get("facility_types", []):
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO facility_types (name, first_seen) VALUES (?, ?)",
+                (name, timestamp),
+            ).rowcount
+            if inserted:
+                new_types.append(name)
+        return new_types
+
+    def changes(self, start=None, end=None, limit=None, with_diff=True, only_diffs=False):
+        """
+        Change entries between ``start`` and ``end`` (inclusive), newest
+        first. Without ``with_diff`` each diff keeps only its counts.
+        """
+        query, params = "SELECT entry FROM changes WHERE 1 = 1", []
+        if start:
+            query += " AND timestamp >= ?"
+            params.append(_timestamp(start))
+        if end:
+            query += " AND timestamp <= ?"
+            params.append(_timestamp(end))
+        if only_diffs:
+            query += " AND json_extract(entry, '$.diff') IS NOT NULL"
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._connection() as conn:
+            entries = [json.loads(row["entry"]) for row in conn.execute(query, params)]
+        if not with_diff:
+            for entry in entries:
+                if entry.get("diff"):
+                    entry["diff"] = {"counts": entry["diff"]["counts"]}
+        return entries
+
+    # =========================
+    # SUMMARIES
+    # =========================
+    def append_summary(self, summary, taken_at=None, conn=None):
+        """
+        Record ``{total_facilities, geocoded_facilities, missing_gps,
+        total_cities, by_city}`` as of ``taken_at`` (default now).
+        """
+        if conn is None:
+            with self._connection() as conn:
+                return self.append_summary(summary, taken_at, conn)
+
+        last = conn.execute("SELECT MAX(id) AS id, COUNT(*) AS n FROM summaries").fetchone()
+        keyframe = last["n"] % KEYFRAME_EVERY == 0
+        by_city = {city: int(n) for city, n in (summary.get("by_city") or {}).items()}
+
+        if keyframe:
+            deltas = by_city
+        else:
+            previous = self._by_city(conn, [last["id"]])[last["id"]]
+            deltas = {
+                city: by_city.get(city, 0) - previous.get(city, 0)
+                for city in set(by_city) | set(previous)
+            }
+            deltas = {city: d for city, d in deltas.items() if d}
+
+        summary_id = conn.execute(
+            "INSERT INTO summaries (taken_at, total_facilities, geocoded_facilities, "
+            "missing_gps, total_cities, keyframe) VALUES (?, ?, ?, ?, ?, ?)",
+            (_timestamp(taken_at or datetime.now()),
+             *(summary.get(f) for f in SUMMARY_FIELDS), int(keyframe)),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO city_deltas (summary_id, city, delta) VALUES (?, ?, ?)",
+            [(summary_id, city, d) for city, d in deltas.items()],
+        )
+        return summary_id
+
+    def _by_city(self, conn, ids):
+        """Rebuild by_city for the summary ``ids``, reading from the keyframe before the first"""
+        wanted = set(ids)
+        keyframe = conn.execute(
+            "SELECT MAX(id) FROM summaries WHERE keyframe = 1 AND id <= ?", (min(ids),)
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT s.id, s.keyframe, d.city, d.delta FROM summaries s "
+            "LEFT JOIN city_deltas d ON d.summary_id = s.id "
+            "WHERE s.id BETWEEN ? AND ? ORDER BY s.id",
+            (keyframe or 0, max(ids)),
+        )
+
+        counts, result = {}, {}
+        current = None
+        for summary_id, is_keyframe, city, delta in rows:
+            if summary_id != current:
+                if current in wanted:
+                    result[current] = {c: n for c, n in counts.items() if n}
+                current = summary_id
+                if is_keyframe:
+                    counts = {}
+            if city is not None:
+                counts[city] = counts.get(city, 0) + delta
+        if current in wanted:
+            result[current] = {c: n for c, n in counts.items() if n}
+        return result
+
+    def summaries(self, start=None, end=None, points=None, cities=None):
+        """
+        Summaries between ``start`` and ``end``, oldest first.
+
+        ``points`` downsamples to at most that many evenly spaced time
+        buckets (the last summary in each). ``cities`` adds ``by_city``:
+        ``True`` for every city, or a list of city names.
+        """
+        where, params = "WHERE 1 = 1", []
+        if start:
+            where += " AND taken_at >= ?"
+            params.append(_timestamp(start))
+        if end:
+            where += " AND taken_at <= ?"
+            params.append(_timestamp(end))
+
+        columns = "id, taken_at, " + ", ".join(SUMMARY_FIELDS)
+        with self._connection() as conn:
+            if points:
+                bounds = conn.execute(
+                    f"SELECT MIN(julianday(taken_at)), MAX(julianday(taken_at)) FROM summaries {where}",
+                    params,
+                ).fetchone()
+                lo, hi = bounds
+                width = ((hi - lo) / int(points)) if lo is not None and hi > lo else 1
+                query = (
+                    f"SELECT {columns} FROM summaries WHERE id IN ("
+                    f" SELECT MAX(id) FROM summaries {where}"
+                    f" GROUP BY MIN(CAST((julianday(taken_at) - ?) / ? AS INTEGER), ?)"
+                    f") ORDER BY taken_at, id"
+                )
+                rows = conn.execute(query, [*params, lo or 0, width, int(points) - 1]).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {columns} FROM summaries {where} ORDER BY taken_at, id", params
+                ).fetchall()
+
+            result = [dict(row) for row in rows]
+            if cities and result:
+                by_city = self._by_city(conn, [r["id"] for r in result])
+                for r in result:
+                    counts = by_city[r["id"]]
+                    if cities is not True:
+                        counts = {c: counts.get(c, 0) for c in cities}
+                    r["by_city"] = counts
+        for r in result:
+            del r["id"]
+        return result
+
+    # =========================
+    # LEGACY JSON
+    # =========================
+    def import_legacy(self, change_log_file, summary_history_file):
+        """
+        One-time import of the old JSON array files, oldest first.
+
+        Returns the number of entries imported; 0 once done.
+        """
+        with self._connection() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                return 0
+            imported = 0
+            if os.path.exists(change_log_file):
+                with open(change_log_file) as f:
+                    entries = json.load(f)
+                for entry in sorted(entries, key=lambda e: _timestamp(e.get("timestamp") or e.get("time"))):
+                    self.append_change(entry, conn)
+                    imported += 1
+            if os.path.exists(summary_history_file):
+                with open(summary_history_file) as f:
+                    summaries = json.load(f)
+                # Undated summaries cannot be placed on the timeline
+                dated = [s for s in summaries if s.get("date")]
+                for summary in sorted(dated, key=lambda s: _timestamp(s["date"])):
+                    self.append_summary(summary, summary["date"], conn)
+                    imported += 1
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                         (_timestamp(datetime.now()),))
+        return imported
@@ -0,0 +1,127 @@
+import numpy as np
+
+from backend.spatial_index import GridIndex
+
+# Clusters are cells about this many screen pixels wide (256 px tiles)
+CLUSTER_RADIUS_PX = 60
+TILE_SIZE_PX = 256
+
+# Above this zoom the map gets individual facilities
+MAX_CLUSTER_ZOOM = 14
+
+
+def mercator_xy(lats, lons):
+    """Web Mercator world coordinates in [0, 1]"""
+    lats = np.clip(np.asarray(lats, dtype="float64"), -85.05112878, 85.05112878)
+    x = (np.asarray(lons, dtype="float64") + 180.0) / 360.0
+    sin = np.sin(np.radians(lats))
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * np.pi)
+    return x, y
+
+
+# =========================
+# CLUSTER LEVEL
+# =========================
+class ClusterLevel:
+    """Clusters for one zoom level plus a grid index over their centroids"""
+
+    def __init__(self, lat, lon, count, type_counts, single):
+        self.lat = lat
+        self.lon = lon
+        self.count = count
+        self.type_counts = type_counts
+        # Facility position for one-member clusters, -1 otherwise
+        self.single = single
+        self.index = GridIndex(lat, lon, cell_deg=0.25)
+
+    def __len__(self):
+        return len(self.count)
+
+
+# =========================
+# HIERARCHY
+# =========================
+class ClusterHierarchy:
+    """
+    Screen-space grid clusters for every zoom level up to MAX_CLUSTER_ZOOM.
+
+    Built once per facility snapshot: each level buckets facilities into
+    cells CLUSTER_RADIUS_PX wide at that zoom and keeps the centroid, the
+    member count and per-type counts. A pan or zoom is then a bounding box
+    lookup on the precomputed level.
+    """
+
+    def __init__(self, lat, lon, facility_types, max_zoom=MAX_CLUSTER_ZOOM):
+        lat = np.asarray(lat, dtype="float64")
+        lon = np.asarray(lon, dtype="float64")
+        positions = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+
+        codes, self.types = _factorize(np.asarray(facility_types, dtype="object")[positions])
+        self.max_zoom = max_zoom
+        self.levels = []
+
+        lat, lon = lat[positions], lon[positions]
+        x, y = mercator_xy(lat, lon)
+        n_types = len(self.types)
+
+        for zoom in range(max_zoom + 1):
+            cells = (2 ** zoom) * TILE_SIZE_PX / CLUSTER_RADIUS_PX
+            key = np.floor(x * cells).astype("int64") * (1 << 24) + np.floor(y * cells).astype("int64")
+            _, first, inverse, count = np.unique(
+                key, return_index=True, return_inverse=True, return_counts=True
+            )
+            k = len(count)
+            type_counts = np.bincount(
+                inverse * n_types + codes, minlength=k * n_types
+            ).reshape(k, n_types)
+            self.levels.append(ClusterLevel(
+                np.bincount(inverse, weights=lat, minlength=k) / count,
+                np.bincount(inverse, weights=lon, minlength=k) / count,
+                count,
+                type_counts,
+                np.where(count == 1, positions[first], -1),
+            ))
+
+    @classmethod
+    def from_frame(cls, df):
+        if df.empty or "latitude" not in df.columns:
+            return cls([], [], [])
+        return cls(
+            df["latitude"].to_numpy(),
+            df["longitude"].to_numpy(),
+            df["facility_type"].astype("object").fillna("Unknown").to_numpy(),
+        )
+
+    def query(self, south, west, north, east, zoom):
+        """
+        Clusters in the box at ``zoom``.
+
+        Returns ``(clusters, facility_positions)``: clusters are dicts with
+        centroid, count and per-type counts; one-member clusters come back
+        as facility positions instead. Returns ``None`` for clusters when
+        the zoom is past the clustering range and raw facilities are due.
+        """
+        zoom = max(int(zoom), 0)
+        if zoom > self.max_zoom:
+            return None, None
+
+        level = self.levels[zoom]
+        hits = level.index.bbox(south, west, north, east)
+        single = level.single[hits]
+        multi = hits[single < 0]
+
+        clusters = []
+        for i in multi:
+            nonzero = np.flatnonzero(level.type_counts[i])
+            clusters.append({
+                "lat": round(float(level.lat[i]), 6),
+                "lon": round(float(level.lon[i]), 6),
+                "count": int(level.count[i]),
+                "types": {self.types[t]: int(level.type_counts[i, t]) for t in nonzero},
+            })
+        return clusters, single[single >= 0]
+
+
+def _factorize(values):
+    uniques, codes = np.unique(values.astype(str), return_inverse=True)
+    return codes.astype("int64"), [str(u) for u in uniques]
@@ -0,0 +1,138 @@
+"""
+Nearest-facility (k-NN) queries with facility type filters.
+
+``NearestFacilities`` keeps one ``GridIndex`` over every facility plus
+one per facility type, so "the 10 nearest pharmacies" searches only
+pharmacies rather than widening a ring over every facility until enough
+of them happen to be pharmacies.
+
+The corridor index's fixed 0.1 degree cells hold thousands of facilities
+in a city centre, which a k-NN query would have to measure one by one;
+these grids are instead sized so a typical facility's cell holds about
+``POINTS_PER_CELL`` of them (rarer types get coarser cells).
+"""
+import numpy as np
+import pandas as pd
+
+from backend.spatial_index import GridIndex
+
+# Target facilities per cell, as seen from a typical facility
+POINTS_PER_CELL = 16
+
+# Cells are never coarser than this, nor finer than keeps the cell table
+# within CELLS_PER_POINT entries per facility (or MIN_CELLS)
+MAX_CELL_DEG = 2.0
+CELLS_PER_POINT = 64
+MIN_CELLS = 65536
+
+# Cell size used to measure how clustered the facilities are
+PROBE_CELL_DEG = 0.1
+
+
+def knn_grid(lat, lon):
+    """A ``GridIndex`` over the points with cells sized for k-NN queries"""
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    if not valid.any():
+        return GridIndex(lat, lon)
+
+    v_lat, v_lon = lat[valid], lon[valid]
+    rows = np.floor(v_lat / PROBE_CELL_DEG).astype("int64")
+    cols = np.floor(v_lon / PROBE_CELL_DEG).astype("int64")
+    _, counts = np.unique(rows * 1_000_000 + cols, return_counts=True)
+    # Occupancy of the cell a random facility sits in
+    typical = (counts.astype("float64") ** 2).sum() / len(v_lat)
+    cell_deg = PROBE_CELL_DEG * np.sqrt(POINTS_PER_CELL / typical)
+
+    area = (np.ptp(v_lat) + PROBE_CELL_DEG) * (np.ptp(v_lon) + PROBE_CELL_DEG)
+    min_cell = np.sqrt(area / max(CELLS_PER_POINT * len(v_lat), MIN_CELLS))
+    return GridIndex(lat, lon, cell_deg=float(np.clip(cell_deg, min_cell, MAX_CELL_DEG)))
+
+
+class NearestFacilities:
+    """k-NN over a facilities frame, overall or restricted to some types"""
+
+    def __init__(self, df):
+        if "latitude" in df.columns and "longitude" in df.columns:
+            lat, lon = df["latitude"].to_numpy(), df["longitude"].to_numpy()
+        else:
+            lat = lon = np.full(len(df), np.nan)
+        self.index = knn_grid(lat, lon)
+
+        self.by_type = {}
+        if self.index.size:
+            types = df["facility_type"] if "facility_type" in df.columns else pd.Series(index=df.index)
+            codes, names = pd.factorize(types.astype("object").fillna("Unknown"))
+            valid = np.isfinite(self.index.lat) & np.isfinite(self.index.lon)
+            for code, name in enumerate(names):
+                rows = np.flatnonzero((codes == code) & valid)
+                if len(rows):
+                    self.by_type[name] = (knn_grid(self.index.lat[rows], self.index.lon[rows]), rows)
+        self._type_names = {name.strip().casefold(): name for name in self.by_type}
+
+        # Record fields as plain arrays, so building a response never touches pandas
+        def column(name):
+            if name not in df.columns:
+                return np.full(len(df), None, dtype=object)
+            values = df[name].astype("object")
+            return values.where(values.notna(), None).to_numpy()
+
+        self._fields = {
+            "facility_id": column("facility_id"),
+            "facility_name": column("facility name"),
+            "city": column("city"),
+            "facility_type": column("facility_type"),
+        }
+
+    def match_types(self, types):
+        """
+        ``(known, unknown)``: the indexed type names ``types`` refer to
+        (matched case-insensitively, in order, without repeats) and the
+        ones that match no geocoded facility's type.
+        """
+        known, unknown = [], []
+        for name in types:
+            match = self._type_names.get(str(name).strip().casefold())
+            if match is None:
+                unknown.append(name)
+            elif match not in known:
+                known.append(match)
+        return known, unknown
+
+    def nearest(self, lat, lon, k, types=None):
+        """
+        ``(positions, distances_km)`` of the ``k`` nearest facilities to
+        each query point, shaped ``(queries, k)``, nearest first. With
+        ``types`` (see ``match_types``), only facilities of those types
+        count; unknown types are ignored.
+        """
+        if not types:
+            return self.index.nearest(lat, lon, k)
+
+        parts = []
+        for name in self.match_types(types)[0]:
+            sub, rows = self.by_type[name]
+            positions, distances = sub.nearest(lat, lon, k)
+            parts.append((np.where(positions >= 0, rows[positions], -1), distances))
+        if not parts:
+            n = len(np.atleast_1d(lat))
+            return np.full((n, k), -1, dtype="int64"), np.full((n, k), np.inf)
+        if len(parts) == 1:
+            return parts[0]
+
+        # The k nearest of the union are among each type's k nearest
+        positions = np.hstack([p for p, _ in parts])
+        distances = np.hstack([d for _, d in parts])
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(positions, order, 1), np.take_along_axis(distances, order, 1)
+
+    def records(self, positions, distances):
+        """JSON records for one query's row of ``nearest`` output (padding dropped)"""
+        found = positions >= 0
+        positions, distances = positions[found], distances[found]
+        fields = {name: values[positions].tolist() for name, values in self._fields.items()}
+        fields["latitude"] = self.index.lat[positions].tolist()
+        fields["longitude"] = self.index.lon[positions].tolist()
+        fields["distance_km"] = distances.round(3).tolist()
+        return [dict(zip(fields, values)) for values in zip(*fields.values())]
@@ -0,0 +1,222 @@
+"""
+Background refresh jobs.
+
+A refresh (scrape, geocode, rebuild, diff, tiles, email) runs on a worker
+thread in the process that accepted it. Job state lives in SQLite, so any
+gunicorn worker can report progress and a second refresh request, from
+any worker, joins the job that is already queued or running.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Progress lines printed by the pipeline scripts
+SCRAPE_PROGRESS = [
+    (re.compile(r"Scraped page (\d+)"), ("pages",)),
+    (re.compile(r"Resuming after page (\d+)"), ("pages",)),
+]
+GEOCODE_PROGRESS = [
+    (re.compile(r"(\d+) of (\d+) rows need geocoding"), ("pending", "rows")),
+    (re.compile(r"Gazetteer placed (\d+) rows"), ("offline",)),
+    (re.compile(r"\[(\d+)/(\d+)\] looked up"), ("looked_up", "queries")),
+]
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# =========================
+# JOB STORE
+# =========================
+class JobStore:
+    """SQLite table of refresh jobs; safe to share between processes"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS refresh_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    error TEXT,
+                    result TEXT,
+                    pid INTEGER,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS refresh_jobs_status ON refresh_jobs (status);
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _connection(self):
+        """An autocommit connection that is closed when the ``with`` block ends"""
+        return closing(self._connect())
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        del job["pid"]
+        return job
+
+    def submit(self):
+        """
+        Queue a job unless one is already queued or running.
+
+        Returns ``(job, created)``. A job whose process has died is marked
+        failed first, so it can never block new refreshes.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for row in conn.execute(
+                "SELECT id, pid FROM refresh_jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+            ).fetchall():
+                if row["pid"] and not _pid_alive(row["pid"]):
+                    conn.execute(
+                        "UPDATE refresh_jobs SET status = 'failed', error = ?, "
+                        "finished_at = ?, updated_at = ? WHERE id = ?",
+                        ("worker process exited", _now(), _now(), row["id"]),
+                    )
+                else:
+                    conn.execute("COMMIT")
+                    return self.get(row["id"]), False
+
+            job_id = uuid.uuid4().hex[:12]
+            now = _now()
+            conn.execute(
+                "INSERT INTO refresh_jobs (id, status, pid, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, os.getpid(), now, now),
+            )
+            conn.execute("COMMIT")
+            return self.get(job_id), True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM refresh_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row)
+
+    def latest(self):
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT * FROM refresh_jobs ORDER BY created_at DESC, rowid DESC LIMIT 1"
+            ).fetchone()
+        return self._job(row)
+
+    def update(self, job_id, **fields):
+        for key in ("progress", "result"):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key])
+        fields["updated_at"] = _now()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connection() as conn:
+            conn.execute(
+                f"UPDATE refresh_jobs SET {assignments} WHERE id = ?",
+                [*fields.values(), job_id],
+            )
+
+
+# =========================
+# QUEUE
+# =========================
+class RefreshQueue:
+    """Runs ``pipeline(progress)`` for each submitted job, one at a time.
+
+    ``pipeline`` calls ``progress(stage, **counts)`` as it goes and returns
+    a JSON-able result. Progress counts reset at each new stage.
+    """
+
+    def __init__(self, store, pipeline):
+        self.store = store
+        self.pipeline = pipeline
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refresh")
+
+    def submit(self):
+        """Return ``(job, created)``; ``created`` is False if a refresh was already active"""
+        job, created = self.store.submit()
+        if created:
+            self._executor.submit(self._run, job["id"])
+        return job, created
+
+    def _run(self, job_id):
+        state = {"stage": None, "progress": {}}
+        lock = threading.Lock()
+
+        def progress(stage, **counts):
+            with lock:
+                if stage != state["stage"]:
+                    state["stage"], state["progress"] = stage, {}
+                state["progress"].update(counts)
+                self.store.update(job_id, stage=stage, progress=state["progress"])
+
+        self.store.update(job_id, status="running", started_at=_now())
+        try:
+            result = self.pipeline(progress)
+        except Exception as e:
+            logging.exception(f"Refresh job {job_id} failed")
+            self.store.update(job_id, status="failed", error=str(e), finished_at=_now())
+        else:
+            self.store.update(job_id, status="succeeded", result=result, finished_at=_now())
+
+
+def run_script(args, cwd, stage, progress, patterns=()):
+    """
+    Run one pipeline script, echoing its output to the log and turning
+    lines that match ``patterns`` (``[(regex, field names)]``) into
+    ``progress(stage, field=int(group), ...)`` calls.
+    """
+    progress(stage)
+    process = subprocess.Popen(
+        args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding="utf-8", errors="replace", bufsize=1,
+        env=dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8"),
+    )
+    with process.stdout:
+        for line in process.stdout:
+            line = line.rstrip()
+            logging.info(f"[{stage}] {line}")
+            for regex, fields in patterns:
+                match = regex.search(line)
+                if match:
+                    progress(stage, **{f: int(v) for f, v in zip(fields, match.groups())})
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, args)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from backend.spatial_index import GridIndex
+from backend.utils.geo import haversine_km
+
+
+# =========================
+# CORRIDOR SEARCH
+# =========================
+def polyline_corridor(index, lats, lons, corridor_km):
+    """
+    Points of ``index`` within ``corridor_km`` of any segment of a polyline.
+
+    All segments are answered by the grid index in one vectorized query,
+    so only cells along the route are scanned. A point near several
+    segments is attributed to the closest one. Returns ``(positions,
+    distance_from_route_km, distance_along_route_km)``, positions ascending.
+    """
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+    seg_km = haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    seg_start_km = np.concatenate([[0.0], np.cumsum(seg_km)[:-1]])
+    if len(seg_km) == 0:
+        return np.empty(0, dtype="int64"), np.empty(0), np.empty(0)
+
+    positions, seg, dist, t = index.segments(
+        lats[:-1], lons[:-1], lats[1:], lons[1:], corridor_km
+    )
+    along = seg_start_km[seg] + t * seg_km[seg]
+
+    # Keep the closest segment for each point
+    order = np.lexsort((dist, positions))
+    positions, dist, along = positions[order], dist[order], along[order]
+    first = np.ones(len(positions), dtype=bool)
+    first[1:] = positions[1:] != positions[:-1]
+    return positions[first], dist[first], along[first]
+
+
+def route_search(df, lats, lons, corridor_km=10, index=None, facility_types=None,
+                 order_by="distance_along_route_km"):
+    """
+    Find facilities within ``corridor_km`` of a route given as vertices.
+
+    ``index`` is a GridIndex over ``df``'s rows; pass the snapshot's index so
+    only the cells along the route are scanned (one is built if omitted).
+    Returns the matching rows, sorted by ``order_by``, with
+    ``distance_from_route_km``, ``distance_along_route_km`` and
+    ``distance_from_origin_km`` columns added.
+    """
+    if index is None:
+        index = GridIndex.from_frame(df)
+
+    positions, dist_route, along = polyline_corridor(index, lats, lons, corridor_km)
+    hits = df.iloc[positions].copy()
+    hits["distance_from_route_km"] = dist_route
+    hits["distance_along_route_km"] = along
+
+    if facility_types:
+        hits = hits[hits["facility_type"].isin(facility_types)]
+
+    hits["distance_from_origin_km"] = haversine_km(
+        lats[0], lons[0],
+        hits["latitude"].to_numpy(), hits["longitude"].to_numpy()
+    )
+    # Ties at the reported 2-decimal precision keep their file order
+    order = np.argsort(hits[order_by].round(2).to_numpy(), kind="stable")
+    return hits.iloc[order]
+
+
+def corridor_search(df, origin_lat, origin_lon, dest_lat, dest_lon, corridor_km=10,
+                    index=None, facility_types=None):
+    """Straight origin -> destination corridor, sorted by distance from origin"""
+    return route_search(
+        df, [origin_lat, dest_lat], [origin_lon, dest_lon], corridor_km,
+        index=index, facility_types=facility_types,
+        order_by="distance_from_origin_km"
+    )
+
+
+def route_records(hits):
+    """Shape corridor hits into the route planner's JSON records"""
+    if hits.empty:
+        return []
+
+    def text(col, default=""):
+        if col not in hits.columns:
+            return pd.Series(default, index=hits.index, dtype="object")
+        return hits[col].astype("object")
+
+    address = text("physical address")
+    if "address" in hits.columns:
+        address = address.where(address.notna() & (address != ""), text("address"))
+
+    out = pd.DataFrame({
+        "facility_id": text("facility_id", None),
+        "facility_name": text("facility name", "Unknown"),
+        "city": text("city"),
+        "address": address,
+        "facility_type": text("facility_type", "Unknown"),
+        "latitude": hits["latitude"],
+        "longitude": hits["longitude"],
+        "distance_from_route_km": hits["distance_from_route_km"].round(2),
+        "distance_from_origin_km": hits["distance_from_origin_km"].round(2),
+        "distance_along_route_km": hits["distance_along_route_km"].round(2),
+    })
+    out = out.astype("object").where(out.notna(), None)
+    return out.to_dict(orient="records")
@@ -0,0 +1,245 @@
+"""
+Row-level diff between two facility snapshots.
+
+Rows are matched on ``facility_id`` (the name/address/city fingerprint),
+so reordering a CSV is not a change. Keys and row contents are hashed to
+uint64 and matched with a sort-based intersection; only rows whose hashes
+differ are ever compared column by column.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend.utils.geo import haversine_km
+
+# Coordinate changes smaller than this are geocoder jitter, not a move
+MOVE_THRESHOLD_M = 100
+
+# Rows listed per category in a diff (counts are always exact)
+DIFF_ROW_LIMIT = 500
+
+COORDINATE_COLUMNS = ["latitude", "longitude"]
+
+# Output name for each column carried into added/removed/moved rows
+RECORD_COLUMNS = {
+    "facility_id": "facility_id",
+    "facility name": "facility_name",
+    "city": "city",
+    "facility_type": "facility_type",
+    "latitude": "latitude",
+    "longitude": "longitude",
+}
+
+
+# =========================
+# HASHING
+# =========================
+def _row_keys(df):
+    """uint64 key per row; repeats of one facility_id get ``#1``, ``#2``..."""
+    ids = df["facility_id"].astype(str).to_numpy(dtype=object)
+    keys = pd.util.hash_array(ids, categorize=False)
+    ordered = np.sort(keys)
+    if not (ordered[1:] == ordered[:-1]).any():
+        return keys
+
+    ids = pd.Series(ids)
+    repeat = ids.groupby(ids, sort=False).cumcount()
+    ids = ids.where(repeat == 0, ids + "#" + repeat.astype(str))
+    return pd.util.hash_array(ids.to_numpy(dtype=object), categorize=False)
+
+
+def _content_hashes(df, columns):
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[columns], index=False, categorize=False).to_numpy()
+
+
+# =========================
+# RECORDS
+# =========================
+def _json_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _records(df, positions, limit):
+    columns = [c for c in RECORD_COLUMNS if c in df.columns]
+    rows = df.iloc[positions[:limit]][columns].rename(columns=RECORD_COLUMNS)
+    return rows.astype("object").where(rows.notna(), None).to_dict(orient="records")
+
+
+def _column(df, name, positions):
+    if name not in df.columns:
+        return [None] * len(positions)
+    return [_json_value(v) for v in df[name].to_numpy(dtype=object)[positions]]
+
+
+def _moves(old, new, old_pos, new_pos, distance_m, limit):
+    old_pos, new_pos, distance_m = old_pos[:limit], new_pos[:limit], distance_m[:limit]
+    rows = zip(
+        _column(new, "facility_id", new_pos),
+        _column(new, "facility name", new_pos),
+        _column(new, "city", new_pos),
+        _column(old, "latitude", old_pos), _column(old, "longitude", old_pos),
+        _column(new, "latitude", new_pos), _column(new, "longitude", new_pos),
+        distance_m,
+    )
+    return [
+        {"facility_id": fid, "facility_name": name, "city": city,
+         "from": [lat0, lon0], "to": [lat1, lon1], "distance_m": round(float(d), 1)}
+        for fid, name, city, lat0, lon0, lat1, lon1, d in rows
+    ]
+
+
+def _edits(old, new, old_pos, new_pos, columns, coordinate_rows, limit):
+    """
+    Column-level changes for the given matched rows. Coordinates count
+    only on ``coordinate_rows`` (gained or lost); other coordinate
+    changes are moves or jitter. Returns the number of edited rows and
+    the first ``limit`` of them.
+    """
+    if not len(old_pos):
+        return 0, []
+    coordinates = [c for c in COORDINATE_COLUMNS if c in old.columns and c in new.columns]
+    columns = columns + coordinates
+    before = old.iloc[old_pos][columns].reset_index(drop=True).astype(object)
+    after = new.iloc[new_pos][columns].reset_index(drop=True).astype(object)
+    differs = ~((before == after) | (before.isna() & after.isna())).to_numpy()
+    differs[:, len(columns) - len(coordinates):] &= coordinate_rows[:, None]
+
+    rows = np.flatnonzero(differs.any(axis=1))
+    edited = rows[:limit]
+    before, after = before.to_numpy(dtype=object), after.to_numpy(dtype=object)
+    ids = _column(new, "facility_id", new_pos[edited])
+    names = _column(new, "facility name", new_pos[edited])
+    return len(rows), [
+        {
+            "facility_id": fid,
+            "facility_name": name,
+            "changes": {
+                columns[j]: [_json_value(before[i, j]), _json_value(after[i, j])]
+                for j in np.flatnonzero(differs[i])
+            },
+        }
+        for i, fid, name in zip(edited, ids, names)
+    ]
+
+
+# =========================
+# DIFF
+# =========================
+def diff_snapshots(old, new, move_threshold_m=MOVE_THRESHOLD_M, limit=DIFF_ROW_LIMIT):
+    """
+    Compare two normalized facility frames (see ``normalize_facilities``).
+
+    Returns ``{"counts", "added", "removed", "moved", "edited"}``:
+
+    - ``added`` / ``removed``: facilities only in ``new`` / ``old``
+    - ``moved``: both geocoded, coordinates more than ``move_threshold_m`` apart
+    - ``edited``: any other column changed, including gaining or losing
+      coordinates; each row lists ``{column: [before, after]}``
+
+    Row lists stop at ``limit`` entries (``None`` for all); ``counts``
+    always covers every row.
+    """
+    old_keys, new_keys = _row_keys(old), _row_keys(new)
+    _, old_pos, new_pos = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+
+    removed = np.setdiff1d(np.arange(len(old)), old_pos, assume_unique=True)
+    added = np.setdiff1d(np.arange(len(new)), new_pos, assume_unique=True)
+    # Report in file order rather than hash order
+    order = np.argsort(new_pos, kind="stable")
+    old_pos, new_pos = old_pos[order], new_pos[order]
+
+    shared = [c for c in new.columns if c in old.columns and c != "facility_id"]
+    values = [c for c in shared if c not in COORDINATE_COLUMNS]
+
+    # Moves: matched rows with valid coordinates on both sides
+    moved_old = moved_new = np.array([], dtype=np.int64)
+    distance_m = np.array([])
+    gained_or_lost = np.zeros(len(new_pos), dtype=bool)
+    if all(c in shared for c in COORDINATE_COLUMNS):
+        lat0 = old["latitude"].to_numpy(dtype="float64")[old_pos]
+        lon0 = old["longitude"].to_numpy(dtype="float64")[old_pos]
+        lat1 = new["latitude"].to_numpy(dtype="float64")[new_pos]
+        lon1 = new["longitude"].to_numpy(dtype="float64")[new_pos]
+        had = ~(np.isnan(lat0) | np.isnan(lon0))
+        has = ~(np.isnan(lat1) | np.isnan(lon1))
+        gained_or_lost = had != has
+
+        both = had & has
+        distance = np.zeros(len(new_pos))
+        distance[both] = haversine_km(lat0[both], lon0[both], lat1[both], lon1[both]) * 1000
+        is_moved = both & (distance > move_threshold_m)
+        moved_old, moved_new, distance_m = old_pos[is_moved], new_pos[is_moved], distance[is_moved]
+
+    # Edits: only rows whose value hash differs or that gained/lost coordinates
+    candidates = (
+        _content_hashes(old, values)[old_pos] != _content_hashes(new, values)[new_pos]
+    ) | gained_or_lost
+    limit = None if limit is None else int(limit)
+    edited, edits = _edits(
+        old, new, old_pos[candidates], new_pos[candidates], values,
+        gained_or_lost[candidates], limit,
+    )
+
+    return {
+        "counts": {
+            "before": int(len(old)),
+            "after": int(len(new)),
+            "added": int(len(added)),
+            "removed": int(len(removed)),
+            "moved": int(len(moved_new)),
+            "edited": edited,
+        },
+        "added": _records(new, added, limit),
+        "removed": _records(old, removed, limit),
+        "moved": _moves(old, new, moved_old, moved_new, distance_m, limit),
+        "edited": edits,
+    }
+
+
+def has_changes(diff):
+    counts = diff["counts"]
+    return any(counts[k] for k in ("added", "removed", "moved", "edited"))
+
+
+def describe_diff(diff, examples=5):
+    """Plain-text summary of a diff for alert emails"""
+    counts = diff["counts"]
+    lines = [
+        f"Facilities: {counts['before']} -> {counts['after']}",
+        f"Added: {counts['added']}, removed: {counts['removed']}, "
+        f"moved: {counts['moved']}, edited: {counts['edited']}",
+    ]
+    for label, key in (("Added", "added"), ("Removed", "removed")):
+        for row in diff[key][:examples]:
+            lines.append(f"  {label}: {row.get('facility_name')} ({row.get('city')})")
+    for row in diff["moved"][:examples]:
+        lines.append(f"  Moved {row['distance_m'] / 1000:.1f} km: {row['facility_name']} ({row['city']})")
+    for row in diff["edited"][:examples]:
+        lines.append(f"  Edited {', '.join(row['changes'])}: {row['facility_name']}")
+    return "\n".join(lines)
+
+
+# =========================
+# BASELINE
+# =========================
+def save_baseline(df, path):
+    """Keep ``df`` as the snapshot the next diff compares against"""
+    tmp = f"{path}.tmp"
+    df.to_csv(tmp, index=False, compression="gzip")
+    os.replace(tmp, path)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    # Imported here: facility_store pulls in the spatial index
+    from backend.facility_store import normalize_facilities
+
+    return normalize_facilities(pd.read_csv(path, compression="gzip"))
@@ -0,0 +1,355 @@
+import math
+
+import numpy as np
+
+from backend.utils.geo import EARTH_RADIUS_KM, haversine_km, point_segment_distance_km
+
+KM_PER_DEG_LAT = EARTH_RADIUS_KM * np.pi / 180
+
+# Keep the cell table bounded even if a bad geocode lands on another continent
+MAX_CELLS = 4_000_000
+
+
+# =========================
+# GRID INDEX
+# =========================
+class GridIndex:
+    """
+    Fixed-size lat/lon grid over facility coordinates.
+
+    Points are bucketed into ``cell_deg`` cells and stored sorted by cell
+    key (row-major), so every row of cells inside a query window is one
+    contiguous slice. Queries gather those slices and then filter exactly,
+    so their cost scales with the area searched rather than the dataset.
+
+    Results are positions into the arrays the index was built from (for
+    ``from_frame``, row positions into the frame, usable with ``iloc``).
+    """
+
+    def __init__(self, lat, lon, cell_deg=0.1):
+        lat = np.asarray(lat, dtype="float64")
+        lon = np.asarray(lon, dtype="float64")
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+
+        self.lat = lat
+        self.lon = lon
+        self.size = len(valid)
+
+        if self.size == 0:
+            self.cell_deg = cell_deg
+            self.lat0 = self.lon0 = 0.0
+            self.nrows = self.ncols = 0
+            self.positions = valid
+            self.offsets = np.zeros(1, dtype="int64")
+            return
+
+        self.lat0 = lat[valid].min()
+        self.lon0 = lon[valid].min()
+        span = max(lat[valid].max() - self.lat0, lon[valid].max() - self.lon0)
+        while (span / cell_deg + 1) ** 2 > MAX_CELLS:
+            cell_deg *= 2
+        self.cell_deg = cell_deg
+        self.nrows = int((lat[valid].max() - self.lat0) // cell_deg) + 1
+        self.ncols = int((lon[valid].max() - self.lon0) // cell_deg) + 1
+
+        keys = self._row(lat[valid]) * self.ncols + self._col(lon[valid])
+        order = np.argsort(keys, kind="stable")
+        self.positions = valid[order]
+        # offsets[k]:offsets[k + 1] is the slice of positions in cell k
+        self.offsets = np.searchsorted(
+            keys[order], np.arange(self.nrows * self.ncols + 1)
+        )
+
+    # Saved with a columnar snapshot so worker processes map it, not rebuild it
+    PARAMS = ["cell_deg", "lat0", "lon0", "nrows", "ncols", "size"]
+
+    def to_arrays(self):
+        """``(params, arrays)``: JSON-able scalars and the cell table"""
+        params = {name: getattr(self, name) for name in self.PARAMS}
+        params = {k: v.item() if isinstance(v, np.generic) else v for k, v in params.items()}
+        return params, {"positions": self.positions, "offsets": self.offsets}
+
+    @classmethod
+    def from_arrays(cls, lat, lon, params, positions, offsets):
+        """Rebuild an index from ``to_arrays`` output without re-sorting anything"""
+        index = cls.__new__(cls)
+        index.lat = np.asarray(lat, dtype="float64")
+        index.lon = np.asarray(lon, dtype="float64")
+        for name in cls.PARAMS:
+            setattr(index, name, params[name])
+        index.positions = positions
+        index.offsets = offsets
+        return index
+
+    @classmethod
+    def from_frame(cls, df, cell_deg=0.1):
+        if "latitude" not in df.columns or "longitude" not in df.columns:
+            return cls([], [], cell_deg)
+        return cls(df["latitude"].to_numpy(), df["longitude"].to_numpy(), cell_deg)
+
+    def __len__(self):
+        return self.size
+
+    # -------------------------
+    # Cell helpers
+    # -------------------------
+    def _row(self, lat):
+        return ((np.asarray(lat) - self.lat0) // self.cell_deg).astype("int64")
+
+    def _col(self, lon):
+        return ((np.asarray(lon) - self.lon0) // self.cell_deg).astype("int64")
+
+    def _gather(self, row_lo, row_hi, col_lo, col_hi):
+        """Positions in cell rows [row_lo, row_hi] with per-row column ranges"""
+        rows = np.arange(row_lo, row_hi + 1)
+        col_lo = np.broadcast_to(col_lo, rows.shape)
+        col_hi = np.broadcast_to(col_hi, rows.shape)
+
+        keep = (rows >= 0) & (rows < self.nrows) & (col_hi >= 0) & (col_lo < self.ncols) & (col_lo <= col_hi)
+        rows = rows[keep]
+        starts = self.offsets[rows * self.ncols + np.clip(col_lo[keep], 0, self.ncols - 1)]
+        stops = self.offsets[rows * self.ncols + np.clip(col_hi[keep], 0, self.ncols - 1) + 1]
+
+        slices = [self.positions[a:b] for a, b in zip(starts, stops) if b > a]
+        if not slices:
+            return np.empty(0, dtype="int64")
+        return np.concatenate(slices)
+
+    @staticmethod
+    def _km_to_deg(km, max_abs_lat):
+        """Degree buffers that are guaranteed to cover ``km`` in each axis"""
+        dlat = km / KM_PER_DEG_LAT * 1.01
+        cos_lat = max(np.cos(np.radians(min(max_abs_lat + dlat, 89.0))), 1e-6)
+        return dlat, dlat / cos_lat
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Positions of points inside the bounding box (inclusive)"""
+        if self.size == 0:
+            return np.empty(0, dtype="int64")
+        cand = self._gather(
+            self._row(min_lat), self._row(max_lat), self._col(min_lon), self._col(max_lon)
+        )
+        lat, lon = self.lat[cand], self.lon[cand]
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return np.sort(cand[inside])
+
+    def radius(self, lat, lon, km):
+        """``(positions, distances_km)`` of points within ``km``, nearest first"""
+        dlat, dlon = self._km_to_deg(km, abs(lat))
+        cand = self.bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+        hit = dist <= km
+        cand, dist = cand[hit], dist[hit]
+        order = np.argsort(dist, kind="stable")
+        return cand[order], dist[order]
+
+    def corridor(self, lat1, lon1, lat2, lon2, km):
+        """
+        ``(positions, distances_km, t)`` of points within ``km`` of a segment.
+
+        ``t`` is each point's projection (0..1) along the segment. Positions
+        are returned in ascending order.
+        """
+        positions, _, dist, t = self.segments(
+            [lat1], [lon1], [lat2], [lon2], km
+        )
+        order = np.argsort(positions, kind="stable")
+        return positions[order], dist[order], t[order]
+
+    def segments(self, lat1, lon1, lat2, lon2, km):
+        """
+        All (point, segment) pairs within ``km`` for many segments at once.
+
+        For every segment only the band of cells its buffer passes through
+        is scanned: each cell row it crosses maps back to the slice of the
+        segment (in t) that can reach that row, which bounds a contiguous
+        run of columns. All bands are expanded into candidate pairs and
+        filtered in one vectorized pass.
+
+        Returns ``(positions, segment_ids, distances_km, t)``.
+        """
+        lat1, lon1, lat2, lon2 = (
+            np.atleast_1d(np.asarray(a, dtype="float64")) for a in (lat1, lon1, lat2, lon2)
+        )
+        empty = (np.empty(0, dtype="int64"), np.empty(0, dtype="int64"),
+                 np.empty(0), np.empty(0))
+        if self.size == 0 or len(lat1) == 0:
+            return empty
+
+        dlat = km / KM_PER_DEG_LAT * 1.01
+        max_abs = np.minimum(np.maximum(np.abs(lat1), np.abs(lat2)) + dlat, 89.0)
+        dlon = dlat / np.maximum(np.cos(np.radians(max_abs)), 1e-6)
+
+        # One entry per (segment, cell row) the buffered segment touches
+        row_lo = np.maximum(self._row(np.minimum(lat1, lat2) - dlat), 0)
+        row_hi = np.minimum(self._row(np.maximum(lat1, lat2) + dlat), self.nrows - 1)
+        counts = np.maximum(row_hi - row_lo + 1, 0)
+        seg = np.repeat(np.arange(len(lat1)), counts)
+        rows = row_lo[seg] + _ranges(counts)
+
+        s_lat1, s_lon1, s_lat2, s_lon2 = lat1[seg], lon1[seg], lat2[seg], lon2[seg]
+        band_lo = self.lat0 + rows * self.cell_deg - dlat
+        band_hi = band_lo + self.cell_deg + 2 * dlat
+
+        flat = s_lat1 == s_lat2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ta = (band_lo - s_lat1) / (s_lat2 - s_lat1)
+            tb = (band_hi - s_lat1) / (s_lat2 - s_lat1)
+        reach = (band_lo <= s_lat1) & (s_lat1 <= band_hi)
+        t_lo = np.where(flat, np.where(reach, 0.0, 1.0), np.clip(np.minimum(ta, tb), 0.0, 1.0))
+        t_hi = np.where(flat, np.where(reach, 1.0, 0.0), np.clip(np.maximum(ta, tb), 0.0, 1.0))
+
+        lon_a = s_lon1 + t_lo * (s_lon2 - s_lon1)
+        lon_b = s_lon1 + t_hi * (s_lon2 - s_lon1)
+        col_lo = self._col(np.minimum(lon_a, lon_b) - dlon[seg])
+        col_hi = self._col(np.maximum(lon_a, lon_b) + dlon[seg])
+
+        keep = (t_lo <= t_hi) & (col_hi >= 0) & (col_lo < self.ncols)
+        seg, rows = seg[keep], rows[keep]
+        col_lo = np.clip(col_lo[keep], 0, self.ncols - 1)
+        col_hi = np.clip(col_hi[keep], 0, self.ncols - 1)
+
+        # Expand each band's contiguous slice into candidate pairs
+        starts = self.offsets[rows * self.ncols + col_lo]
+        stops = self.offsets[rows * self.ncols + col_hi + 1]
+        lengths = stops - starts
+        pair_seg = np.repeat(seg, lengths)
+        cand = self.positions[np.repeat(starts, lengths) + _ranges(lengths)]
+        if len(cand) == 0:
+            return empty
+
+        dist, t = point_segment_distance_km(
+            self.lat[cand], self.lon[cand],
+            lat1[pair_seg], lon1[pair_seg], lat2[pair_seg], lon2[pair_seg]
+        )
+        hit = dist <= km
+        return cand[hit], pair_seg[hit], dist[hit], t[hit]
+
+    def _start_km(self, k):
+        """Radius expected to hold about ``k`` points, from the mean occupied-cell density"""
+        occupied = getattr(self, "_occupied", None)
+        if occupied is None:
+            occupied = self._occupied = max(int(np.count_nonzero(np.diff(self.offsets))), 1)
+        cell_km = self.cell_deg * KM_PER_DEG_LAT
+        per_cell = self.size / occupied
+        return max(cell_km * np.sqrt(k / (np.pi * per_cell)), cell_km / 4)
+
+    def nearest(self, lat, lon, k):
+        """
+        The ``k`` nearest points to each query point, for many at once.
+
+        Each query searches a square of cells sized to hold about ``k``
+        points; the hits within the circle that square is guaranteed to
+        cover are exact, so a query is done once it has ``k`` of them.
+        Queries still short widen their radius (to the k-th candidate's
+        distance if the square had ``k``) and go again, together, until
+        their square covers the whole grid.
+
+        Returns ``(positions, distances_km)``, both shaped ``(queries, k)``
+        and nearest first; missing neighbours are -1 / inf.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype="float64"))
+        lon = np.atleast_1d(np.asarray(lon, dtype="float64"))
+        out_pos = np.full((len(lat), k), -1, dtype="int64")
+        out_dist = np.full((len(lat), k), np.inf)
+        if self.size == 0 or k < 1:
+            return out_pos, out_dist
+
+        if len(lat) == 1:
+            if np.isfinite(lat[0]) and np.isfinite(lon[0]):
+                positions, distances = self._nearest_one(float(lat[0]), float(lon[0]), k)
+                out_pos[0, :len(positions)] = positions
+                out_dist[0, :len(positions)] = distances
+            return out_pos, out_dist
+
+        radius = np.full(len(lat), self._start_km(k))
+        pending = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        while len(pending):
+            q_lat, q_lon, r = lat[pending], lon[pending], radius[pending]
+            dlat = r / KM_PER_DEG_LAT * 1.01
+            dlon = dlat / np.maximum(np.cos(np.radians(np.minimum(np.abs(q_lat) + dlat, 89.0))), 1e-6)
+            row_lo, row_hi = self._row(q_lat - dlat), self._row(q_lat + dlat)
+            col_lo, col_hi = self._col(q_lon - dlon), self._col(q_lon + dlon)
+            covers_all = (row_lo <= 0) & (row_hi >= self.nrows - 1) & (col_lo <= 0) & (col_hi >= self.ncols - 1)
+
+            # One contiguous slice of positions per (query, cell row)
+            row_lo = np.maximum(row_lo, 0)
+            row_hi = np.minimum(row_hi, self.nrows - 1)
+            inside = (col_hi >= 0) & (col_lo < self.ncols)
+            counts = np.where(inside, np.maximum(row_hi - row_lo + 1, 0), 0)
+            query = np.repeat(np.arange(len(pending)), counts)
+            rows = row_lo[query] + _ranges(counts)
+            starts = self.offsets[rows * self.ncols + np.clip(col_lo[query], 0, self.ncols - 1)]
+            stops = self.offsets[rows * self.ncols + np.clip(col_hi[query], 0, self.ncols - 1) + 1]
+            lengths = stops - starts
+            query = np.repeat(query, lengths)
+            cand = self.positions[np.repeat(starts, lengths) + _ranges(lengths)]
+
+            dist = haversine_km(q_lat[query], q_lon[query], self.lat[cand], self.lon[cand])
+            order = np.lexsort((cand, dist, query))
+            query, cand, dist = query[order], cand[order], dist[order]
+            first = np.searchsorted(query, np.arange(len(pending) + 1))
+            rank = np.arange(len(query)) - first[query]
+            hit = (dist <= r[query]) | covers_all[query]
+            done = (np.bincount(query[hit], minlength=len(pending)) >= k) | covers_all
+
+            top = hit & done[query] & (rank < k)
+            out_pos[pending[query[top]], rank[top]] = cand[top]
+            out_dist[pending[query[top]], rank[top]] = dist[top]
+
+            # With k candidates in the square, the k-th of them bounds the
+            # answer and one more round settles it; otherwise grow the
+            # radius by what the square's density suggests
+            found = np.diff(first)
+            kth = np.full(len(pending), np.inf)
+            kth[found >= k] = dist[first[:-1][found >= k] + k - 1]
+            grow = np.clip(np.sqrt(k / np.maximum(found, 1)) * 1.5, 2, 8)
+            radius[pending] = np.where(found >= k, np.maximum(kth, r) * (1 + 1e-9), r * grow)
+            pending = pending[~done]
+        return out_pos, out_dist
+
+    def _nearest_one(self, lat, lon, k):
+        """``nearest`` for a single point, in scalar steps to keep per-call overhead low"""
+        r = self._start_km(k)
+        while True:
+            dlat = r / KM_PER_DEG_LAT * 1.01
+            dlon = dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 89.0))), 1e-6)
+            row_lo = int((lat - dlat - self.lat0) // self.cell_deg)
+            row_hi = int((lat + dlat - self.lat0) // self.cell_deg)
+            col_lo = int((lon - dlon - self.lon0) // self.cell_deg)
+            col_hi = int((lon + dlon - self.lon0) // self.cell_deg)
+            covers_all = row_lo <= 0 and row_hi >= self.nrows - 1 and col_lo <= 0 and col_hi >= self.ncols - 1
+
+            cand = np.empty(0, dtype="int64")
+            row_lo, row_hi = max(row_lo, 0), min(row_hi, self.nrows - 1)
+            if row_lo <= row_hi and col_hi >= 0 and col_lo < self.ncols:
+                cells = np.arange(row_lo, row_hi + 1) * self.ncols
+                starts = self.offsets[cells + max(col_lo, 0)].tolist()
+                stops = self.offsets[cells + min(col_hi, self.ncols - 1) + 1].tolist()
+                slices = [self.positions[a:b] for a, b in zip(starts, stops) if b > a]
+                if slices:
+                    cand = np.concatenate(slices)
+
+            dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+            hit = np.ones(len(cand), dtype=bool) if covers_all else dist <= r
+            if covers_all or np.count_nonzero(hit) >= k:
+                cand, dist = cand[hit], dist[hit]
+                order = np.lexsort((cand, dist))[:k]
+                return cand[order], dist[order]
+            if len(cand) >= k:
+                r = max(float(np.partition(dist, k - 1)[k - 1]), r) * (1 + 1e-9)
+            else:
+                r *= min(max(math.sqrt(k / max(len(cand), 1)) * 1.5, 2), 8)
+
+
+def _ranges(counts):
+    """Concatenation of arange(c) for each c in counts"""
+    counts = np.asarray(counts, dtype="int64")
+    total = counts.sum()
+    if total == 0:
+        return np.empty(0, dtype="int64")
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total) - starts
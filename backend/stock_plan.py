@@ -0,0 +1,74 @@
+"""
+Van stock plans: the product lines a trip's stops need.
+
+``data/product_map.json`` maps facility types to product lines. The join
+is done once per facility snapshot (``ProductJoin``): every row gets a
+type code and every type a row of a type x product-line matrix, so a
+plan for any set of stops is integer indexing plus one bincount, not a
+map lookup per facility.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCT_MAP_FILE = os.path.join(BASE_DIR, "data", "product_map.json")
+
+# Types missing from the product map get this type's product lines
+FALLBACK_TYPE = "Unknown"
+
+
+def load_product_map(path=PRODUCT_MAP_FILE):
+    """``{facility type: [product line, ...]}``; empty if there is no map"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {str(t): [str(p) for p in lines] for t, lines in json.load(f).items()}
+
+
+class ProductJoin:
+    """Facility rows joined to product lines through their facility type"""
+
+    def __init__(self, facility_types, product_map):
+        types = pd.Series(facility_types, dtype="object").fillna(FALLBACK_TYPE).astype(str)
+        codes, uniques = pd.factorize(types, sort=True)
+        self.codes = codes.astype(np.int64)
+        self.types = uniques.tolist()
+        self._type_names = np.array(self.types, dtype=object)
+        self.unmapped = [t for t in self.types if t not in product_map]
+
+        # Product lines in the order the map lists them
+        self.products = list(dict.fromkeys(p for lines in product_map.values() for p in lines))
+        column = {p: i for i, p in enumerate(self.products)}
+        fallback = product_map.get(FALLBACK_TYPE, [])
+
+        self.matrix = np.zeros((len(self.types), len(self.products)), dtype=np.int64)
+        self.lines = np.empty(len(self.types), dtype=object)
+        for i, facility_type in enumerate(self.types):
+            lines = list(dict.fromkeys(product_map.get(facility_type, fallback)))
+            self.matrix[i, [column[p] for p in lines]] = 1
+            self.lines[i] = lines
+
+    @classmethod
+    def from_frame(cls, df, product_map):
+        types = df["facility_type"] if "facility_type" in df.columns else pd.Series(index=df.index)
+        return cls(types.astype("object"), product_map)
+
+    def plan(self, positions):
+        """
+        Product lines for the stops at row ``positions`` (in visit order).
+
+        Returns ``(stop_types, stop_lines, totals, by_type)``: each stop's
+        type and product lines, the number of stops needing each product
+        line (most needed first, zeros dropped) and the stop count per type.
+        """
+        codes = self.codes[np.asarray(positions, dtype=np.int64)]
+        per_type = np.bincount(codes, minlength=len(self.types))
+        per_product = per_type @ self.matrix
+
+        order = np.argsort(-per_product, kind="stable")
+        totals = {self.products[i]: int(per_product[i]) for i in order if per_product[i]}
+        by_type = {self.types[i]: int(n) for i, n in enumerate(per_type) if n}
+        return self._type_names[codes].tolist(), self.lines[codes].tolist(), totals, by_type
@@ -0,0 +1,281 @@
+"""
+Split facilities among reps and plan each rep's daily routes.
+
+CLI:  python -m backend.territory_planner --reps 12 --daily-cap 15 \
+          --city Harare --types Pharmacy Clinic --out plan.json
+"""
+import argparse
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backend.spatial_index import KM_PER_DEG_LAT
+from backend.visit_optimizer import optimize_visit_order
+
+# Nearest centers each point considers before scanning them all
+SHORTLIST = 8
+
+
+# =========================
+# BALANCED CLUSTERING
+# =========================
+def _project_km(lats, lons):
+    """Local equirectangular x/y in km, good enough for clustering"""
+    lat0 = np.radians(np.mean(lats))
+    return np.column_stack([lons * np.cos(lat0) * KM_PER_DEG_LAT, lats * KM_PER_DEG_LAT])
+
+
+def _bisect(xy, k):
+    """
+    Initial partition by recursive balanced bisection.
+
+    Splits along the wider axis at the point that gives each side a share
+    proportional to its number of clusters, so the start is already
+    balanced and compact.
+    """
+    labels = np.empty(len(xy), dtype="int64")
+    stack = [(np.arange(len(xy)), k, 0)]
+
+    while stack:
+        idx, parts, first = stack.pop()
+        if parts == 1:
+            labels[idx] = first
+            continue
+        spread = xy[idx].max(axis=0) - xy[idx].min(axis=0)
+        order = idx[np.argsort(xy[idx, int(np.argmax(spread))], kind="stable")]
+        left = parts // 2
+        cut = len(idx) * left // parts
+        stack.append((order[:cut], left, first))
+        stack.append((order[cut:], parts - left, first + left))
+
+    return labels
+
+
+def _capacitated_assign(xy, centers, capacity):
+    """
+    Nearest-center assignment that fills each center to exactly ``capacity``.
+
+    Each round every unassigned point proposes to its nearest center that
+    still has room, and each center accepts its closest proposers up to
+    capacity. Every round fills a center or finishes, so it takes at most
+    k rounds of vector ops.
+    """
+    n, k = len(xy), len(centers)
+    d2 = ((xy[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    labels = np.full(n, -1, dtype="int64")
+    room = np.asarray(capacity, dtype="int64").copy()
+
+    # Proposals only look at each point's few nearest centers; the full
+    # row is scanned only once all of those are full
+    shortlist = min(k, SHORTLIST)
+    nearest = np.argpartition(d2, shortlist - 1, axis=1)[:, :shortlist]
+    nearest = np.take_along_axis(
+        nearest, np.argsort(np.take_along_axis(d2, nearest, axis=1), axis=1), axis=1
+    )
+
+    while True:
+        pending = np.flatnonzero(labels < 0)
+        if len(pending) == 0:
+            break
+        open_ = room[nearest[pending]] > 0
+        has_open = open_.any(axis=1)
+        choice = nearest[pending, np.argmax(open_, axis=1)]
+        if not has_open.all():
+            spill = pending[~has_open]
+            choice[~has_open] = np.argmin(np.where(room > 0, d2[spill], np.inf), axis=1)
+        dist = d2[pending, choice]
+
+        order = np.lexsort((dist, choice))
+        choice_sorted = choice[order]
+        group_start = np.searchsorted(choice_sorted, choice_sorted)
+        rank = np.arange(len(order)) - group_start
+        accept = rank < room[choice_sorted]
+
+        labels[pending[order[accept]]] = choice_sorted[accept]
+        room -= np.bincount(choice_sorted[accept], minlength=k)
+
+    return labels
+
+
+def balanced_kmeans(lats, lons, k, max_iter=15):
+    """
+    Capacitated k-means: ``k`` compact clusters whose sizes differ by at most one.
+
+    Starts from a recursive bisection, then alternates recomputing
+    centroids and a capacity-respecting nearest assignment until stable.
+    Capacities add up to exactly n; the n % k spare slots go to the
+    clusters that were largest last round. Returns one label per point.
+    """
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+    n = len(lats)
+    k = max(1, min(k, n))
+    if n == 0:
+        return np.empty(0, dtype="int64")
+
+    xy = _project_km(lats, lons)
+    labels = _bisect(xy, k)
+
+    centers = np.zeros((k, 2))
+    for _ in range(max_iter):
+        counts = np.bincount(labels, minlength=k)
+        sums = np.column_stack([
+            np.bincount(labels, weights=xy[:, 0], minlength=k),
+            np.bincount(labels, weights=xy[:, 1], minlength=k),
+        ])
+        # A center that lost all its points stays where it was
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+
+        capacity = np.full(k, n // k, dtype="int64")
+        capacity[np.argsort(-counts, kind="stable")[:n % k]] += 1
+        new_labels = _capacitated_assign(xy, centers, capacity)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+    return labels
+
+
+# =========================
+# PER-REP ROUTING
+# =========================
+def plan_territory(lats, lons, daily_cap, time_budget=0.5):
+    """
+    Plan the days for one territory.
+
+    Facilities are grouped into compact days of at most ``daily_cap`` stops
+    by recursive bisection (k-means refinement costs far more at this k and
+    did not shorten routes), each day is routed as a round trip from the
+    territory centroid, and days are ordered nearest-first from that base.
+    Returns ``(base, days)`` where each day is ``(stop_positions, km)``.
+    """
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+    base = (float(lats.mean()), float(lons.mean()))
+
+    n_days = math.ceil(len(lats) / daily_cap)
+    day_labels = balanced_kmeans(lats, lons, n_days, max_iter=0)
+
+    days = []
+    for d in range(n_days):
+        members = np.flatnonzero(day_labels == d)
+        if len(members) == 0:
+            continue
+        order, legs = optimize_visit_order(
+            lats[members], lons[members], base, base, time_budget=time_budget
+        )
+        days.append((members[order], float(legs.sum())))
+
+    # Visit nearby days first (the base is the centroid of the projection)
+    xy = _project_km(lats, lons)
+    xy -= xy.mean(axis=0)
+    centroid_km = [np.hypot(*xy[stops].mean(axis=0)) for stops, _ in days]
+    days = [days[i] for i in np.argsort(centroid_km, kind="stable")]
+    return base, days
+
+
+def _plan_territory_job(args):
+    return plan_territory(*args)
+
+
+def plan_territories(df, reps, daily_cap, time_budget=0.5, workers=1):
+    """
+    Split geocoded facilities in ``df`` among ``reps`` and plan their days.
+
+    ``workers`` > 1 plans territories in a process pool. Returns the plan
+    as a JSON-ready dict.
+    """
+    df = df[df["latitude"].notna() & df["longitude"].notna()]
+    lats = df["latitude"].to_numpy(dtype="float64")
+    lons = df["longitude"].to_numpy(dtype="float64")
+
+    labels = balanced_kmeans(lats, lons, reps)
+    members = [np.flatnonzero(labels == r) for r in range(reps)]
+    members = [m for m in members if len(m)]
+    jobs = [(lats[m], lons[m], daily_cap, time_budget) for m in members]
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            plans = list(pool.map(_plan_territory_job, jobs))
+    else:
+        plans = [_plan_territory_job(job) for job in jobs]
+
+    columns = [c for c in ["facility_id", "facility name", "city", "facility_type",
+                           "latitude", "longitude"] if c in df.columns]
+    records = df[columns].rename(columns={"facility name": "facility_name"})
+    records = records.astype("object").where(records.notna(), None).to_dict(orient="records")
+
+    territories = []
+    for rep, (m, (base, days)) in enumerate(zip(members, plans), start=1):
+        territories.append({
+            "rep": rep,
+            "facility_count": len(m),
+            "base": {"lat": round(base[0], 6), "lon": round(base[1], 6)},
+            "total_distance_km": round(sum(km for _, km in days), 2),
+            "days": [
+                {"day": day,
+                 "distance_km": round(km, 2),
+                 "stops": [records[i] for i in m[stops]]}
+                for day, (stops, km) in enumerate(days, start=1)
+            ],
+        })
+
+    return {
+        "reps": len(territories),
+        "daily_cap": daily_cap,
+        "total_facilities": len(df),
+        "territories": territories,
+    }
+
+
+def filter_facilities(df, cities=None, facility_types=None):
+    """Case-insensitive city and exact facility type filters"""
+    if cities:
+        wanted = {c.strip().lower() for c in cities}
+        df = df[df["city"].astype("object").fillna("").str.strip().str.lower().isin(wanted)]
+    if facility_types:
+        df = df[df["facility_type"].isin(facility_types)]
+    return df
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan rep territories and daily routes")
+    parser.add_argument("--reps", type=int, required=True)
+    parser.add_argument("--daily-cap", type=int, default=15)
+    parser.add_argument("--city", nargs="*", default=None)
+    parser.add_argument("--types", nargs="*", default=None)
+    parser.add_argument("--time-budget-ms", type=float, default=500)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.reps < 1:
+        parser.error("--reps must be at least 1")
+    if args.daily_cap < 1:
+        parser.error("--daily-cap must be at least 1")
+    if not args.time_budget_ms >= 0:
+        parser.error("--time-budget-ms must not be negative")
+
+    from backend.app import facility_store
+
+    df = filter_facilities(facility_store.current().df, args.city, args.types)
+    plan = plan_territories(
+        df, args.reps, args.daily_cap,
+        time_budget=args.time_budget_ms / 1000, workers=args.workers
+    )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(plan, f, indent=2)
+        print(f"✅ Plan for {plan['total_facilities']} facilities saved to {args.out}")
+    else:
+        print(json.dumps(plan, indent=2))
+
+
+if __name__ == "__main__":
+    main()
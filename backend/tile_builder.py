@@ -0,0 +1,227 @@
+"""
+Pre-render facility points into z/x/y GeoJSON tiles stored in an MBTiles
+(SQLite) file, rewriting only the tiles whose facilities changed.
+
+CLI:  python -m backend.tile_builder [--min-zoom 6] [--max-zoom 14]
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from backend.map_clusters import mercator_xy
+
+MIN_ZOOM = 6
+MAX_ZOOM = 14
+
+# Columns that make up a tile's content; a change to any of them re-renders it
+TILE_COLUMNS = ["facility_id", "facility name", "city", "facility_type", "latitude", "longitude"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+CREATE TABLE IF NOT EXISTS tile_signatures (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, signature TEXT,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+);
+"""
+
+
+def tile_xy(lats, lons, zoom):
+    """XYZ (slippy map) tile column and row for each point"""
+    x, y = mercator_xy(lats, lons)
+    n = 2 ** zoom
+    return (
+        np.clip(np.floor(x * n), 0, n - 1).astype("int64"),
+        np.clip(np.floor(y * n), 0, n - 1).astype("int64"),
+    )
+
+
+def _tms_row(zoom, y):
+    # MBTiles stores rows bottom-up (TMS)
+    return (2 ** zoom) - 1 - y
+
+
+def _tile_frame(df):
+    df = df[df["latitude"].notna() & df["longitude"].notna()]
+    return df[[c for c in TILE_COLUMNS if c in df.columns]].reset_index(drop=True)
+
+
+def _features(df):
+    """One GeoJSON point feature per row, built once per build"""
+    return [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [round(r["longitude"], 6), round(r["latitude"], 6)],
+            },
+            "properties": {
+                "id": r.get("facility_id"),
+                "name": r.get("facility name"),
+                "city": r.get("city"),
+                "type": r.get("facility_type"),
+            },
+        }
+        for r in df.astype("object").where(df.notna(), None).to_dict(orient="records")
+    ]
+
+
+def _render(features):
+    body = json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":"))
+    return gzip.compress(body.encode("utf-8"), mtime=0)
+
+
+# =========================
+# BUILD
+# =========================
+def build_tiles(df, path, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """
+    Bring the tile file at ``path`` in line with the facilities in ``df``.
+
+    Every tile gets an order-independent signature (the wrapping sum of
+    its rows' content hashes). Only tiles whose signature differs from the
+    stored one are re-rendered; tiles that no longer hold any facility are
+    deleted. Returns counts of written, deleted and unchanged tiles.
+    """
+    df = _tile_frame(df)
+    row_hash = pd.util.hash_pandas_object(df, index=False).to_numpy(dtype="uint64")
+    lats = df["latitude"].to_numpy()
+    lons = df["longitude"].to_numpy()
+
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    stored = {
+        (z, x, row): sig
+        for z, x, row, sig in conn.execute(
+            "SELECT zoom_level, tile_column, tile_row, signature FROM tile_signatures"
+        )
+    }
+
+    features = None
+    written = unchanged = 0
+    current = set()
+    with conn:
+        for zoom in range(min_zoom, max_zoom + 1):
+            tx, ty = tile_xy(lats, lons, zoom)
+            key = tx * (2 ** zoom) + ty
+            order = np.argsort(key, kind="stable")
+            key_sorted = key[order]
+            starts = np.flatnonzero(np.r_[True, key_sorted[1:] != key_sorted[:-1]])
+            sums = np.add.reduceat(row_hash[order], starts) if len(order) else []
+
+            for start, stop, total in zip(starts, np.r_[starts[1:], len(order)], sums):
+                members = order[start:stop]
+                x, y = int(tx[members[0]]), int(ty[members[0]])
+                tile = (zoom, x, _tms_row(zoom, y))
+                signature = f"{int(total):016x}-{len(members)}"
+                current.add(tile)
+                if stored.get(tile) == signature:
+                    unchanged += 1
+                    continue
+
+                if features is None:
+                    features = _features(df)
+                conn.execute(
+                    "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                    (*tile, _render([features[i] for i in members])),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO tile_signatures VALUES (?, ?, ?, ?)",
+                    (*tile, signature),
+                )
+                written += 1
+
+        stale = [tile for tile in stored if tile not in current]
+        conn.executemany(
+            "DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?", stale
+        )
+        conn.executemany(
+            "DELETE FROM tile_signatures WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            stale,
+        )
+        conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)", [
+            ("name", "HPA facilities"),
+            ("format", "application/geo+json"),
+            ("minzoom", str(min_zoom)),
+            ("maxzoom", str(max_zoom)),
+        ])
+    conn.close()
+
+    return {"written": written, "deleted": len(stale), "unchanged": unchanged}
+
+
+# =========================
+# READ
+# =========================
+@lru_cache(maxsize=8)
+def _built_zoom_range(path, mtime):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        meta = dict(conn.execute(
+            "SELECT name, value FROM metadata WHERE name IN ('minzoom', 'maxzoom')"
+        ))
+    except sqlite3.Error:
+        meta = {}
+    finally:
+        conn.close()
+    return int(meta.get("minzoom", MIN_ZOOM)), int(meta.get("maxzoom", MAX_ZOOM))
+
+
+def zoom_range(path):
+    """``(min_zoom, max_zoom)`` the tile file was built with (the defaults if there is none)"""
+    if not os.path.exists(path):
+        return MIN_ZOOM, MAX_ZOOM
+    return _built_zoom_range(path, os.path.getmtime(path))
+
+
+def tile_in_range(path, zoom, x, y):
+    """Whether ``zoom/x/y`` is a tile the file at ``path`` could hold at all"""
+    min_zoom, max_zoom = zoom_range(path)
+    return min_zoom <= zoom <= max_zoom and 0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom
+
+
+def read_tile(path, zoom, x, y):
+    """``(gzipped_geojson, signature)`` for an XYZ tile, or ``(None, None)``"""
+    if not os.path.exists(path):
+        return None, None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute(
+            "SELECT t.tile_data, s.signature FROM tiles t "
+            "JOIN tile_signatures s USING (zoom_level, tile_column, tile_row) "
+            "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (zoom, x, _tms_row(zoom, y)),
+        ).fetchone()
+    finally:
+        conn.close()
+    return row if row else (None, None)
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    from backend.app import TILES_FILE, facility_store
+
+    parser = argparse.ArgumentParser(description="Render facility tiles into MBTiles")
+    parser.add_argument("--out", default=TILES_FILE)
+    parser.add_argument("--min-zoom", type=int, default=MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    args = parser.parse_args(argv)
+
+    stats = build_tiles(facility_store.current().df, args.out, args.min_zoom, args.max_zoom)
+    print(f"✅ Tiles: {stats['written']} written, {stats['deleted']} deleted, "
+          f"{stats['unchanged']} unchanged → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Column-at-a-time address normalization and fuzzy place matching.
+
+Every public function takes a whole column (any iterable or Series) and
+works on its unique values only; the per-row helpers in the scraper and
+backend are thin wrappers over the memoized single-value versions.
+"""
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import pandas as pd
+
+# Misspelt or abbreviated street names -> canonical spelling
+STREET_CORRECTIONS = {
+    "n.mandela": "Nelson Mandela",
+    "n mandela": "Nelson Mandela",
+    "n. mandela": "Nelson Mandela",
+    "nmandela": "Nelson Mandela",
+    "r mugabe": "Robert Mugabe",
+    "r.mugabe": "Robert Mugabe",
+    "rmugabe": "Robert Mugabe",
+    "s machel": "Samora Machel",
+    "j tongogara": "Josiah Tongogara",
+    "h chitepo": "Herbert Chitepo",
+    "j moyo": "Jason Moyo",
+    "l takawira": "Leopold Takawira",
+    "fife ave": "Fife Avenue",
+    "borrowdale rd": "Borrowdale Road",
+    "enterprise rd": "Enterprise Road",
+    "chiremba rd": "Chiremba Road",
+}
+
+# Street-type abbreviations used when building geocoder queries
+ABBREVIATIONS = {
+    "ave": "Avenue",
+    "rd": "Road",
+    "st": "Street",
+    "cnr": "Corner",
+    "blvd": "Boulevard",
+    "dr": "Drive",
+    "cres": "Crescent",
+    "ct": "Court",
+    "ext": "Extension",
+}
+
+# The backend cleaner's lower-case expansions
+CLEANER_ABBREVIATIONS = {
+    "st": "street",
+    "rd": "road",
+    "ave": "avenue",
+    "blvd": "drive",
+}
+
+MEMO_SIZE = 65536
+
+
+def _alternation(words, flags=re.IGNORECASE, prefix=r"\b", suffix=r"\b"):
+    # Longest first so a key never loses to a shorter key it starts with
+    ordered = sorted(words, key=len, reverse=True)
+    return re.compile(prefix + "(" + "|".join(map(re.escape, ordered)) + ")" + suffix, flags)
+
+
+# Canonical names map to themselves and, being longer, match first: that
+# stops "nelson mandela" (which contains "n mandela") or "fife avenue"
+# (which contains "fife ave") from being corrected a second time
+CORRECTION_LOOKUP = {v.lower(): v for v in STREET_CORRECTIONS.values()}
+CORRECTION_LOOKUP.update({k.lower(): v for k, v in STREET_CORRECTIONS.items()})
+# The first-letter lookahead lets the scan skip most positions cheaply
+CORRECTION_RE = _alternation(
+    CORRECTION_LOOKUP,
+    prefix="(?=[" + re.escape("".join(sorted({k[0] for k in CORRECTION_LOOKUP}))) + "])",
+    suffix="",
+)
+
+ABBREVIATION_RE = _alternation(ABBREVIATIONS)
+CLEANER_RE = _alternation(CLEANER_ABBREVIATIONS, flags=0)
+AMPERSAND_RE = re.compile(r"\b&\b")
+DIGIT_LETTER_RE = re.compile(r"(\d)([a-zA-Z])")
+LETTER_DIGIT_RE = re.compile(r"([a-zA-Z])(\d)")
+PUNCTUATION_RE = re.compile(r"[^\w\s,]")
+SPACES_RE = re.compile(r"\s+")
+
+
+def _unique_map(values, func):
+    """Apply ``func`` to each distinct value of ``values`` and broadcast back"""
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype="object")
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = [func(u) for u in uniques]
+    return pd.Series([mapped[c] for c in codes], index=series.index, dtype="object")
+
+
+# =========================
+# NORMALIZATION
+# =========================
+@lru_cache(maxsize=MEMO_SIZE)
+def correct_street_spelling(address):
+    """Expand known street misspellings in one pass of a combined regex"""
+    return CORRECTION_RE.sub(lambda m: CORRECTION_LOOKUP[m.group(1).lower()], address)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _geocodable(address):
+    address = correct_street_spelling(address)
+    address = DIGIT_LETTER_RE.sub(r"\1 \2", address)
+    address = LETTER_DIGIT_RE.sub(r"\1 \2", address)
+    address = ABBREVIATION_RE.sub(lambda m: ABBREVIATIONS[m.group(1).lower()], address)
+    address = AMPERSAND_RE.sub("and", address)
+    address = PUNCTUATION_RE.sub(" ", address)
+    return SPACES_RE.sub(" ", address).strip().title()
+
+
+def geocodable_address(address):
+    """Title-cased address with spelling fixed and abbreviations expanded"""
+    if pd.isna(address):
+        return ""
+    return _geocodable(str(address))
+
+
+def geocodable_addresses(values):
+    """``geocodable_address`` over a column"""
+    return _unique_map(values, geocodable_address)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _cleaned(address):
+    address = SPACES_RE.sub(" ", address.lower().strip())
+    return CLEANER_RE.sub(lambda m: CLEANER_ABBREVIATIONS[m.group(1)], address)
+
+
+def clean_address(address):
+    """Lower-cased address with single spaces and expanded abbreviations"""
+    if not isinstance(address, str):
+        return ""
+    return _cleaned(address)
+
+
+def clean_addresses(values):
+    """``clean_address`` over a column"""
+    return _unique_map(values, clean_address)
+
+
+# =========================
+# FUZZY MATCHING
+# =========================
+def _similarity_matrix(queries, choices, scorer):
+    """
+    Scores in [0, 100] for every query/choice pair.
+
+    Uses rapidfuzz's ``process.cdist`` when it is installed; otherwise
+    falls back to difflib (``ratio`` only), which is slower but only ever
+    sees unique values.
+    """
+    try:
+        from rapidfuzz import fuzz, process
+    except ImportError:
+        if scorer != "ratio":
+            raise
+        return [
+            [SequenceMatcher(None, q, c).ratio() * 100 for c in choices]
+            for q in queries
+        ]
+    return process.cdist(
+        queries, choices, scorer=getattr(fuzz, scorer), processor=None, workers=-1
+    ).tolist()
+
+
+def match_places(values, choices, threshold=70):
+    """
+    Map each value to its canonical spelling in ``choices``.
+
+    Case-insensitive exact matches win; otherwise the most similar choice
+    scoring at least ``threshold`` (0-100) is used, and values with no
+    good match are returned stripped but unchanged. Returns a Series of
+    matches and a dict of the fuzzy corrections that were made.
+    """
+    exact = {c.lower(): c for c in choices}
+    lowered = [c.lower() for c in choices]
+
+    series = pd.Series(list(values), dtype="object") if not isinstance(values, pd.Series) else values
+    uniques = pd.unique(series.dropna().astype(str).str.strip())
+    fuzzy = [u for u in uniques if u and u.lower() not in exact]
+    scores = _similarity_matrix([u.lower() for u in fuzzy], lowered, "ratio") if fuzzy else []
+
+    resolved, corrections = {}, {}
+    for u in uniques:
+        resolved[u] = exact.get(u.lower(), u)
+    for u, row in zip(fuzzy, scores):
+        best = max(range(len(row)), key=row.__getitem__)
+        if row[best] >= threshold:
+            resolved[u] = corrections[u] = choices[best]
+
+    matched = _unique_map(series, lambda v: resolved.get(str(v).strip(), v) if pd.notna(v) else None)
+    return matched, corrections
+
+
+def match_streets(values, streets, threshold=85):
+    """
+    Replace addresses that contain a known street (rapidfuzz
+    ``partial_ratio`` >= ``threshold``) with that street's name.
+    Needs rapidfuzz.
+    """
+    series = pd.Series(list(values), dtype="object") if not isinstance(values, pd.Series) else values
+    uniques = [u for u in pd.unique(series.dropna()) if u]
+    scores = _similarity_matrix(uniques, streets, "partial_ratio") if uniques else []
+
+    resolved = {}
+    for u, row in zip(uniques, scores):
+        best = max(range(len(row)), key=row.__getitem__)
+        resolved[u] = streets[best] if row[best] >= threshold else u
+    return _unique_map(series, lambda v: resolved.get(v, v))
@@ -1,18 +1,215 @@
+"""
+Facility type from the facility name.
+
+The rules live in ``data/facility_type_rules.json``: an ordered list of
+``{"type", "keywords"}``. A name gets the first type with a keyword
+anywhere in it (case-insensitive), or the default type if none match.
+
+Columns are classified a chunk of unique names at a time: the names are
+joined into one byte buffer, candidate keyword positions are found with
+numpy table lookups on their first bytes and then checked byte by byte
+(ASCII case folded on the fly), so the cost does not grow with the
+number of keywords the way a Python loop over names and rules would.
+Results are memoized by name. A long column whose values are nearly all
+distinct is classified as it stands, since deduplicating it would hash
+every name to save almost nothing.
+"""
+import json
+import os
+from functools import lru_cache
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RULES_FILE = os.path.join(BASE_DIR, "data", "facility_type_rules.json")
+
+DEFAULT_TYPE = "Unknown"
+MEMO_SIZE = 65536
+
+# Unique names classified per buffer; bounds the scratch arrays to a few
+# hundred MB however long the column is
+CHUNK_NAMES = 200_000
+
+# Values sampled to decide whether a long column is worth deduplicating
+DISTINCT_SAMPLE = 2048
+
+# Joins names in the buffer; cannot occur inside a keyword
+SEPARATOR = "\x00"
+PREFIX_BYTES = 3
+
+# bytes.lower() as a lookup table: only ASCII A-Z change
+_LOWER = np.arange(256, dtype=np.uint8)
+_LOWER[ord("A"):ord("Z") + 1] += 32
+
+
+def load_rules(path=RULES_FILE):
+    """``([(type, [keyword, ...]), ...], default type)`` from a rules file"""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    rules = [(rule["type"], list(rule["keywords"])) for rule in config["rules"]]
+    return rules, config.get("default", DEFAULT_TYPE)
+
+
+class FacilityTypeClassifier:
+    """Ordered keyword rules; the first rule with a keyword in the name wins"""
+
+    def __init__(self, rules, default=DEFAULT_TYPE):
+        self.types = [name for name, _ in rules] + [default]
+        self.default = default
+
+        priorities = {}
+        for priority, (_, keywords) in enumerate(rules):
+            for keyword in keywords:
+                keyword = keyword.lower().encode("utf-8")
+                if len(keyword) < PREFIX_BYTES or SEPARATOR.encode() in keyword:
+                    raise ValueError(f"Facility type keywords need {PREFIX_BYTES}+ characters: {keyword!r}")
+                priorities.setdefault(keyword, priority)
+        # A keyword containing another of the same or higher priority
+        # can never change the outcome
+        self.keywords = [
+            (keyword, priority) for keyword, priority in priorities.items()
+            if not any(other != keyword and other in keyword and p <= priority
+                       for other, p in priorities.items())
+        ]
+        self._types = np.array(self.types, dtype=object)
+
+        # Keyword prefixes as ids: a table from the (little-endian) code of
+        # the first two bytes, in any ASCII case, to a pair id, and a
+        # (pair id, lower-cased third byte) table to a prefix id
+        pairs = list(dict.fromkeys(k[:2] for k, _ in self.keywords))
+        prefixes = list(dict.fromkeys(k[:PREFIX_BYTES] for k, _ in self.keywords))
+        self._pair_ids = np.zeros(1 << 16, dtype=np.min_scalar_type(len(pairs)))
+        for pair_id, pair in enumerate(pairs, start=1):
+            for first in self._cases(pair[0]):
+                for second in self._cases(pair[1]):
+                    self._pair_ids[first | second << 8] = pair_id
+        self._prefix_ids = np.zeros((len(pairs) + 1, 256), dtype=np.min_scalar_type(len(prefixes)))
+        for prefix_id, prefix in enumerate(prefixes, start=1):
+            self._prefix_ids[pairs.index(prefix[:2]) + 1, prefix[2]] = prefix_id
+        self._keyword_prefix = [prefixes.index(k[:PREFIX_BYTES]) + 1 for k, _ in self.keywords]
+
+        longest = max((len(k) for k, _ in self.keywords), default=PREFIX_BYTES)
+        self._padding = SEPARATOR * longest
+        # Without non-ASCII keywords, ASCII case folding is all that's needed
+        self._ascii = all(k.isascii() for k, _ in self.keywords)
+        self._memo = {}
+
+    @staticmethod
+    def _cases(byte):
+        return {byte, ord(chr(byte).upper())} if 97 <= byte <= 122 else {byte}
+
+    def _priorities(self, names):
+        """Index into ``self.types`` for each name"""
+        best = np.full(len(names), len(self.types) - 1, dtype=np.int64)
+        if not names or not self.keywords:
+            return best
+
+        try:
+            # The padding keeps reads past a candidate inside the buffer
+            joined = SEPARATOR.join([*names, self._padding])
+        except TypeError:
+            # Missing names match nothing; anything else is read as text
+            names = list(names)
+            text = np.fromiter(map(isinstance, names, repeat(str)), dtype=bool, count=len(names))
+            for i in np.flatnonzero(~text).tolist():
+                names[i] = "" if pd.isna(names[i]) else str(names[i])
+            return self._priorities(names)
+        buffer = joined.encode("utf-8") if self._ascii else joined.lower().encode("utf-8")
+        size = len(buffer) - len(self._padding) - 1
+        if size < PREFIX_BYTES:
+            return best
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        ends = np.flatnonzero(data[:size] == 0)
+        if len(ends) != len(names) - 1:
+            # A name contains the separator (keywords never do)
+            return self._priorities([n.replace(SEPARATOR, " ") for n in names])
+
+        # Positions starting with a keyword's first two bytes: the buffer
+        # read as 2-byte codes twice, from even and from odd offsets
+        candidates, pair_ids = [], []
+        for offset in (0, 1):
+            codes = np.frombuffer(buffer, dtype="<u2", offset=offset, count=(size - offset) // 2)
+            ids = self._pair_ids[codes]
+            hits = np.flatnonzero(ids)
+            candidates.append(hits * 2 + offset)
+            pair_ids.append(ids[hits])
+        candidates, pair_ids = np.concatenate(candidates), np.concatenate(pair_ids)
+        # ...then its first three
+        prefix_ids = self._prefix_ids[pair_ids, _LOWER[data[candidates + 2]]]
+        keep = np.flatnonzero(prefix_ids)
+        candidates, prefix_ids = candidates[keep], prefix_ids[keep]
+
+        for (keyword, priority), prefix_id in zip(self.keywords, self._keyword_prefix):
+            positions = candidates[prefix_ids == prefix_id]
+            for offset in range(PREFIX_BYTES, len(keyword)):
+                positions = positions[_LOWER[data[positions + offset]] == keyword[offset]]
+                if not len(positions):
+                    break
+            # A name's row is the number of separators before the match
+            np.minimum.at(best, np.searchsorted(ends, positions), priority)
+        return best
+
+    def _mostly_distinct(self, series):
+        """Whether a sample suggests at least half of ``series``' values are distinct"""
+        sample = series.iloc[::max(1, len(series) // DISTINCT_SAMPLE)][:DISTINCT_SAMPLE]
+        repeats = len(sample) - sample.nunique(dropna=False)
+        # n values drawn from u distinct ones repeat about n * n / (2 * u) times
+        return repeats * len(series) <= len(sample) ** 2
+
+    def classify(self, values):
+        """Facility type for each name in a column, as an object Series"""
+        series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype="object")
+        if len(series) > MEMO_SIZE and self._mostly_distinct(series):
+            codes, uniques = None, np.asarray(series.array, dtype=object)
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=False)
+            uniques = np.asarray(uniques, dtype=object)
+
+        if len(uniques) <= MEMO_SIZE:
+            priorities = np.fromiter(
+                map(self._memo.get, uniques, repeat(-1)), dtype=np.int64, count=len(uniques)
+            )
+        else:
+            # Most of a column this size cannot be in the memo anyway
+            priorities = np.full(len(uniques), -1, dtype=np.int64)
+        pending = np.flatnonzero(priorities < 0)
+        for start in range(0, len(pending), CHUNK_NAMES):
+            chunk = pending[start:start + CHUNK_NAMES]
+            names = uniques[chunk].tolist()
+            found = self._priorities(names)
+            priorities[chunk] = found
+            if len(names) <= MEMO_SIZE:
+                if len(self._memo) + len(names) > MEMO_SIZE:
+                    self._memo.clear()
+                self._memo.update(zip(names, found.tolist()))
+
+        if codes is not None:
+            priorities = priorities[codes]
+        return pd.Series(self._types[priorities], index=series.index, dtype="object")
+
+    def __call__(self, name):
+        if not name or not isinstance(name, str):
+            return self.default
+        try:
+            return self.types[self._memo[name]]
+        except KeyError:
+            return self.classify([name]).iloc[0]
+
+
+@lru_cache(maxsize=None)
+def default_classifier():
+    """The classifier for ``RULES_FILE``, loaded on first use"""
+    rules, default = load_rules()
+    return FacilityTypeClassifier(rules, default)
+
+
 def detect_facility_type(name) -> str:
-    if not name or not isinstance(name, str):
-        return "Unknown"
-
-    name = name.lower()
-
-    if "hospital" in name:
-        return "Hospital"
-    if "clinic" in name:
-        return "Clinic"
-    if any(k in name for k in ["pharmacy", "pharmaceutical", "pharma", "chemist", "drug store", "drugstore"]):
-        return "Pharmacy"
-    if "dental" in name:
-        return "Dental"
-    if "eye" in name or "optic" in name:
-        return "Eye Clinic"
-
-    return "Unknown"
\ No newline at end of file
+    """Facility type of one facility name"""
+    return default_classifier()(name)
+
+
+def detect_facility_types(values):
+    """``detect_facility_type`` over a column"""
+    return default_classifier().classify(values)
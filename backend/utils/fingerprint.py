@@ -0,0 +1,48 @@
+import hashlib
+
+import pandas as pd
+
+FINGERPRINT_COLUMNS = ["facility name", "physical address", "city"]
+
+
+def _normalize(series):
+    return (
+        series.fillna("")
+        .astype(str)
+        .str.lower()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def facility_fingerprint(name, address, city) -> str:
+    """Stable ID for one facility from its name, address and city"""
+    key = "|".join(
+        " ".join(str(v).lower().split()) if isinstance(v, str) else ""
+        for v in (name, address, city)
+    )
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint_frame(df):
+    """Vectorized ``facility_fingerprint`` over a normalized facilities frame.
+
+    Expects lower-case column names; missing columns count as empty, so a
+    row's ID only changes when its name, address or city actually changes.
+    Duplicate listings would share a fingerprint, so repeats get ``#1``,
+    ``#2``... in file order and every row's ID is unique.
+    """
+    parts = [
+        _normalize(df[col]) if col in df.columns else pd.Series("", index=df.index)
+        for col in FINGERPRINT_COLUMNS
+    ]
+    keys = parts[0] + "|" + parts[1] + "|" + parts[2]
+    ids = pd.Series(
+        [hashlib.sha1(k.encode("utf-8")).hexdigest()[:16] for k in keys],
+        index=df.index,
+        dtype="object",
+    )
+    repeat = ids.groupby(ids, sort=False).cumcount()
+    if repeat.any():
+        ids = ids.where(repeat == 0, ids + "#" + repeat.astype(str))
+    return ids
@@ -0,0 +1,64 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; accepts scalars or broadcastable arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def point_segment_distance_km(lat, lon, lat1, lon1, lat2, lon2):
+    """
+    Distance from points to the segment (lat1, lon1) -> (lat2, lon2).
+
+    The projection parameter ``t`` is found in a local equirectangular frame
+    (longitude scaled by cos of the segment's mean latitude), clamped to the
+    segment, and the distance to that closest point is measured with
+    haversine. Returns ``(distance_km, t)`` as arrays.
+    """
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+
+    cos_lat = np.cos(np.radians((lat1 + lat2) / 2))
+    dx = (lon2 - lon1) * cos_lat
+    dy = lat2 - lat1
+    seg_len2 = dx * dx + dy * dy
+
+    # Degenerate (zero-length) segments collapse to their start point
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = ((lon - lon1) * cos_lat * dx + (lat - lat1) * dy) / seg_len2
+    t = np.where(seg_len2 > 0, np.clip(t, 0.0, 1.0), 0.0)
+
+    closest_lat = lat1 + t * (lat2 - lat1)
+    closest_lon = lon1 + t * (lon2 - lon1)
+    return haversine_km(lat, lon, closest_lat, closest_lon), t
+
+
+def decode_polyline(encoded, precision=5):
+    """Decode a Google/OSRM encoded polyline into a list of (lat, lon)"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+
+    return points
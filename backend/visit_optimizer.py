@@ -0,0 +1,160 @@
+import time
+
+import numpy as np
+
+from backend.utils.geo import haversine_km
+
+# Ignore "improvements" smaller than float noise, so search always terminates
+MIN_GAIN_KM = 1e-9
+
+
+# =========================
+# DISTANCES
+# =========================
+def distance_matrix(lats, lons):
+    """Full pairwise haversine matrix (km) in one broadcast"""
+    lats = np.asarray(lats, dtype="float64")
+    lons = np.asarray(lons, dtype="float64")
+    return haversine_km(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+
+
+def path_length(dist, path):
+    path = np.asarray(path)
+    return float(dist[path[:-1], path[1:]].sum())
+
+
+# =========================
+# CONSTRUCTION
+# =========================
+def nearest_neighbour_path(dist, start, end):
+    """Greedy open path from ``start`` through every node, finishing at ``end``"""
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    visited[[start, end]] = True
+    path = [start]
+
+    for _ in range(n - 2):
+        row = np.where(visited, np.inf, dist[path[-1]])
+        nxt = int(np.argmin(row))
+        visited[nxt] = True
+        path.append(nxt)
+
+    if end != start:
+        path.append(end)
+    return np.array(path)
+
+
+# =========================
+# IMPROVEMENT
+# =========================
+def two_opt(dist, path, deadline):
+    """
+    Reverse sub-paths while that shortens the route (endpoints fixed).
+
+    For each i the gain of reversing ``path[i:k]`` for every k is computed
+    in one vector op and the best one is applied.
+    """
+    path = path.copy()
+    n = len(path)
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 2):
+            a, b = path[i - 1], path[i]
+            c = path[i + 1:n - 1]
+            d = path[i + 2:n]
+            gain = dist[a, b] + dist[c, d] - dist[a, c] - dist[b, d]
+            j = int(np.argmax(gain))
+            if gain[j] > MIN_GAIN_KM:
+                path[i:i + j + 2] = path[i:i + j + 2][::-1]
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+
+    return path
+
+
+def or_opt(dist, path, deadline, max_segment=3):
+    """
+    Move runs of 1..``max_segment`` stops to a better place in the route,
+    optionally reversed. All insertion points are scored in one vector op.
+    """
+    path = path.copy()
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length < len(path) and time.perf_counter() < deadline:
+                seg = path[i:i + length]
+                p, q = path[i - 1], path[i + length]
+                removed = dist[p, seg[0]] + dist[seg[-1], q] - dist[p, q]
+
+                rest = np.concatenate([path[:i], path[i + length:]])
+                a, b = rest[:-1], rest[1:]
+                forward = dist[a, seg[0]] + dist[seg[-1], b] - dist[a, b]
+                backward = dist[a, seg[-1]] + dist[seg[0], b] - dist[a, b]
+                best = np.minimum(forward, backward)
+                k = int(np.argmin(best))
+
+                if removed - best[k] > MIN_GAIN_KM:
+                    moved = seg if forward[k] <= backward[k] else seg[::-1]
+                    path = np.concatenate([rest[:k + 1], moved, rest[k + 1:]])
+                    improved = True
+                else:
+                    i += 1
+
+    return path
+
+
+# =========================
+# ENTRY POINT
+# =========================
+def optimize_visit_order(lats, lons, origin, destination=None, time_budget=0.5):
+    """
+    Order stops for a single rep's trip.
+
+    ``origin``/``destination`` are ``(lat, lon)``; without a destination the
+    route ends at whichever stop is last. Builds a nearest-neighbour path
+    on a vectorized distance matrix and improves it with 2-opt and Or-opt
+    until no move helps or ``time_budget`` seconds have passed.
+
+    Returns ``(order, legs_km)`` where ``order`` indexes the input stops and
+    ``legs_km[k]`` is the drive into stop ``order[k]``; the final leg to the
+    destination, if any, is the extra last element.
+    """
+    deadline = time.perf_counter() + time_budget
+    n = len(lats)
+    if n == 0:
+        return np.empty(0, dtype="int64"), np.empty(0)
+
+    # Node 0 is the origin, 1..n the stops, n + 1 the destination
+    node_lats = [origin[0], *lats]
+    node_lons = [origin[1], *lons]
+    if destination is not None:
+        node_lats.append(destination[0])
+        node_lons.append(destination[1])
+    dist = distance_matrix(node_lats, node_lons)
+
+    if destination is None:
+        # A free end behaves like a destination that is 0 km from every stop
+        # (kept finite and prohibitive for the origin so gains never go NaN)
+        big = dist.sum() + 1.0
+        dist = np.pad(dist, ((0, 1), (0, 1)))
+        dist[0, -1] = dist[-1, 0] = big
+
+    end = len(dist) - 1
+    path = nearest_neighbour_path(dist, 0, end)
+    while time.perf_counter() < deadline:
+        before = path_length(dist, path)
+        path = or_opt(dist, two_opt(dist, path, deadline), deadline)
+        if before - path_length(dist, path) <= MIN_GAIN_KM:
+            break
+
+    legs = dist[path[:-1], path[1:]]
+    order = path[1:-1] - 1
+    if destination is None:
+        legs = legs[:-1]
+    return order, legs
@@ -0,0 +1,98 @@
+"""
+Address normalization and city matching over data/facilities_raw.csv,
+batched module vs the old per-row functions.
+
+Run from the repo root:  python -m benchmarks.address_normalization
+"""
+import os
+import re
+import time
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from backend.utils import address
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "data", "facilities_raw.csv")
+
+CITIES = [
+    "Harare", "Bulawayo", "Chitungwiza", "Mutare", "Gweru", "Kwekwe", "Kadoma",
+    "Masvingo", "Chinhoyi", "Marondera", "Norton", "Chegutu", "Bindura", "Beitbridge",
+    "Redcliff", "Victoria Falls", "Hwange", "Chiredzi", "Kariba", "Karoi", "Chipinge",
+    "Zvishavane", "Rusape", "Shurugwi", "Gokwe", "Plumtree", "Gwanda", "Lupane",
+    "Murewa", "Ruwa", "Epworth", "Borrowdale", "Avondale", "Hatfield", "Highlands",
+    "Mbare", "Highfield", "Glen Norah", "Budiriro", "Warren Park", "Mufakose",
+    "Dzivarasekwa", "Kambuzuma", "Kuwadzana", "Marlborough", "Mount Pleasant",
+    "Greendale", "Eastlea", "Arcadia", "Belvedere", "Milton Park", "Alexandra Park",
+    "Newlands", "Hillside", "Burnside", "Matsheumhlope", "Nkulumane", "Pumula",
+    "Nketa", "Cowdray Park", "Luveve", "Entumbane", "Magwegwe", "Lobengula",
+    "Emakhandeni", "Tshabalala", "Njube", "Mpopoma", "Makokoba", "Barbourfields",
+    "Filabusi", "Glendale", "Concession", "Shamva", "Mazowe", "Domboshava",
+    "Hatcliffe", "Borrowdale Brooke", "Glen Lorne", "Chisipite", "Greystone Park"
+]
+
+
+# =========================
+# LEGACY (per row, kept for comparison)
+# =========================
+def legacy_normalize(addr):
+    if pd.isna(addr):
+        return ""
+    addr = str(addr)
+    lower = addr.lower()
+    for wrong, correct in address.STREET_CORRECTIONS.items():
+        if wrong in lower:
+            addr = re.sub(re.escape(wrong), correct, addr, flags=re.IGNORECASE)
+    addr = re.sub(r"(\d)([a-zA-Z])", r"\1 \2", addr)
+    addr = re.sub(r"([a-zA-Z])(\d)", r"\1 \2", addr)
+    for short, full in address.ABBREVIATIONS.items():
+        addr = re.sub(rf"\b{short}\b", full, addr, flags=re.IGNORECASE)
+    addr = re.sub(r"\b&\b", "and", addr, flags=re.IGNORECASE)
+    addr = re.sub(r"[^\w\s,]", " ", addr)
+    return re.sub(r"\s+", " ", addr).strip().title()
+
+
+def legacy_city(city):
+    if not city:
+        return None
+    city = str(city).strip()
+    for c in CITIES:
+        if c.lower() == city.lower():
+            return c
+    best, best_score = None, 0.0
+    for c in CITIES:
+        score = SequenceMatcher(None, city.lower(), c.lower()).ratio()
+        if score > best_score and score >= 0.7:
+            best, best_score = c, score
+    return best or city
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    df = pd.read_csv(RAW_FILE)
+    addresses, cities = df["Physical Address"], df["City"]
+    print(f"{len(df):,} rows, {addresses.nunique():,} distinct addresses, "
+          f"{cities.nunique()} distinct cities\n")
+
+    elapsed, legacy = timed(lambda: [legacy_normalize(a) for a in addresses])
+    print(f"addresses  legacy per-row: {elapsed * 1000:8.1f} ms")
+    elapsed, batched = timed(lambda: address.geocodable_addresses(addresses))
+    print(f"addresses  batched (cold): {elapsed * 1000:8.1f} ms")
+    elapsed, _ = timed(lambda: address.geocodable_addresses(addresses))
+    print(f"addresses  batched (warm): {elapsed * 1000:8.1f} ms")
+    changed = sum(a != b for a, b in zip(legacy, batched))
+    print(f"           {changed} outputs differ (old code re-corrected e.g. "
+          f"'Nelson Mandela' into 'Nelsonelson Mandela')\n")
+
+    elapsed, legacy = timed(lambda: [legacy_city(c) for c in cities])
+    print(f"cities     legacy per-row: {elapsed * 1000:8.1f} ms")
+    elapsed, (batched, _) = timed(lambda: address.match_places(cities, CITIES))
+    print(f"cities     batched:        {elapsed * 1000:8.1f} ms")
+    changed = sum(a != b for c, a, b in zip(cities, legacy, batched) if pd.notna(c))
+    print(f"           {changed} outputs differ")
@@ -0,0 +1,77 @@
+"""
+Corridor search latency on synthetic Zimbabwe-wide facility sets.
+
+Run from the repo root:  python -m benchmarks.corridor
+"""
+import time
+from math import radians, sin, cos, sqrt, atan2
+
+import numpy as np
+import pandas as pd
+
+from backend.route_engine import corridor_search, route_records
+from backend.spatial_index import GridIndex
+
+# Harare -> Mutare, the busiest rep route
+ROUTE = (-17.8252, 31.0335, -18.9758, 32.6504)
+CORRIDOR_KM = 10
+
+
+def synthetic_facilities(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "facility name": [f"Facility {i}" for i in range(n)],
+        "city": "Harare",
+        "physical address": "1 Test Road",
+        "facility_type": rng.choice(["Pharmacy", "Clinic", "Hospital"], n),
+        "latitude": rng.uniform(-22.4, -15.6, n),
+        "longitude": rng.uniform(25.2, 33.0, n),
+    })
+
+
+def legacy_corridor(df, origin_lat, origin_lon, dest_lat, dest_lon, corridor_km):
+    """The pre-vectorization per-row loop, kept for comparison"""
+    def haversine(lat1, lon1, lat2, lon2):
+        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+        a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+        return 6371 * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+    cos_lat = cos(radians((origin_lat + dest_lat) / 2))
+    dx = (dest_lon - origin_lon) * cos_lat
+    dy = dest_lat - origin_lat
+    out = []
+    for _, row in df.iterrows():
+        lat, lon = row["latitude"], row["longitude"]
+        t = ((lon - origin_lon) * cos_lat * dx + (lat - origin_lat) * dy) / (dx * dx + dy * dy)
+        t = max(0.0, min(1.0, t))
+        d = haversine(lat, lon, origin_lat + t * dy, origin_lon + t * (dest_lon - origin_lon))
+        if d <= corridor_km:
+            out.append((row["facility name"], haversine(origin_lat, origin_lon, lat, lon)))
+    return out
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    for n, repeat in [(5_000, 20), (500_000, 3)]:
+        df = synthetic_facilities(n)
+
+        start = time.perf_counter()
+        index = GridIndex.from_frame(df)
+        print(f"{n:>8,} facilities  index build: {(time.perf_counter() - start) * 1000:7.2f} ms")
+
+        elapsed, records = timed(
+            lambda: route_records(corridor_search(df, *ROUTE, CORRIDOR_KM, index=index)), repeat
+        )
+        print(f"{n:>8,} facilities  indexed:    {elapsed * 1000:8.2f} ms  ({len(records)} hits)")
+
+        if n <= 5_000:
+            elapsed, legacy = timed(lambda: legacy_corridor(df, *ROUTE, CORRIDOR_KM), 3)
+            print(f"{n:>8,} facilities  legacy loop: {elapsed * 1000:7.2f} ms  ({len(legacy)} hits)")
@@ -0,0 +1,58 @@
+"""
+Facility type classification of a large name column: the old per-row
+.apply(detect_facility_type) loop vs the column classifier.
+
+Run from the repo root:  python -m benchmarks.facility_types [--rows N]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import DEFAULT_SOURCES
+from backend.utils.facility_type import FacilityTypeClassifier, load_rules
+
+
+def per_row(rules, default):
+    """The rules applied one name at a time, as the old .apply did"""
+    def detect(name):
+        if not name or not isinstance(name, str):
+            return default
+        name = name.lower()
+        for facility_type, keywords in rules:
+            if any(k in name for k in keywords):
+                return facility_type
+        return default
+    return detect
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    names = pd.read_csv(next(p for p in DEFAULT_SOURCES if os.path.exists(p)))["Facility Name"]
+    tiled = pd.Series(np.resize(names.to_numpy(dtype=object), args.rows), dtype="object")
+    distinct = tiled + " #" + pd.Series(np.arange(args.rows)).astype(str)
+    rules, default = load_rules()
+
+    print(f"{args.rows:,} names, {len(rules)} rules")
+    for label, column in [("real names, repeated", tiled), ("all distinct", distinct)]:
+        loop_time, expected = timed(lambda: column.map(per_row(rules, default)))
+        cold_time, result = timed(lambda: FacilityTypeClassifier(rules, default).classify(column))
+        print(f"{label:<22} per-row {loop_time * 1000:7.0f} ms   "
+              f"column {cold_time * 1000:6.0f} ms   "
+              f"same: {bool((result.to_numpy() == expected.to_numpy(dtype=object)).all())}")
+
+    classifier = FacilityTypeClassifier(rules, default)
+    classifier.classify(names)
+    warm_time, _ = timed(lambda: classifier.classify(tiled))
+    print(f"{'memoized, repeated':<22} column {warm_time * 1000:6.0f} ms")
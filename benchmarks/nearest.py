@@ -0,0 +1,78 @@
+"""
+k-nearest facilities: brute-force haversine over every row vs the grid
+k-NN, overall and with a type filter (per-type sub-index), one point at a
+time and as one batch.
+
+Run from the repo root:  python -m benchmarks.nearest [--rows N] [--k K] [--points N]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import DEFAULT_SOURCES
+from backend.facility_store import normalize_facilities
+from backend.nearest import NearestFacilities
+from backend.utils.geo import haversine_km
+
+
+def brute_force(df, lat, lon, k, types=None):
+    mask = df["latitude"].notna().to_numpy().copy()
+    if types:
+        mask &= df["facility_type"].isin(types).to_numpy()
+    rows = np.flatnonzero(mask)
+    dist = haversine_km(lat, lon, df["latitude"].to_numpy()[rows], df["longitude"].to_numpy()[rows])
+    order = np.lexsort((rows, dist))[:k]
+    return rows[order], dist[order]
+
+
+def per_query_us(fn, points):
+    start = time.perf_counter()
+    for lat, lon in points:
+        fn(lat, lon)
+    return (time.perf_counter() - start) / len(points) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=None, help="tile the data up to N rows (jittered)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--points", type=int, default=2000)
+    args = parser.parse_args()
+
+    df = normalize_facilities(pd.read_csv(next(p for p in DEFAULT_SOURCES if os.path.exists(p))))
+    rng = np.random.default_rng(0)
+    if args.rows:
+        df = pd.concat([df] * (args.rows // len(df) + 1), ignore_index=True).iloc[:args.rows].copy()
+        df["latitude"] += rng.normal(0, 0.02, len(df))
+        df["longitude"] += rng.normal(0, 0.02, len(df))
+
+    start = time.perf_counter()
+    knn = NearestFacilities(df)
+    build = time.perf_counter() - start
+
+    # Query points near facilities (where reps are) plus some anywhere in the country
+    located = df[df["latitude"].notna()].sample(args.points // 2, random_state=0, replace=True)
+    points = np.vstack([
+        located[["latitude", "longitude"]].to_numpy() + rng.normal(0, 0.05, (len(located), 2)),
+        np.c_[rng.uniform(-22, -15.7, args.points - len(located)), rng.uniform(25.3, 33, args.points - len(located))],
+    ])
+
+    print(f"{len(df):,} rows, k={args.k}, {len(points):,} query points; "
+          f"index + {len(knn.by_type)} type sub-indexes built in {build * 1000:.0f} ms")
+    for types in (None, ["Pharmacy"], ["Hospital", "Eye Clinic"]):
+        label = ",".join(types) if types else "all types"
+        brute = per_query_us(lambda lat, lon: brute_force(df, lat, lon, args.k, types), points[:200])
+        single = per_query_us(lambda lat, lon: knn.nearest(lat, lon, args.k, types), points)
+        start = time.perf_counter()
+        positions, distances = knn.nearest(points[:, 0], points[:, 1], args.k, types)
+        batch = (time.perf_counter() - start) / len(points) * 1e6
+
+        same = all(
+            np.allclose(distances[i], brute_force(df, lat, lon, args.k, types)[1])
+            for i, (lat, lon) in enumerate(points[:200])
+        )
+        print(f"{label:<20} brute {brute:8.0f} us/query   grid {single:6.0f} us/query   "
+              f"batch {batch:5.0f} us/query   same: {same}")
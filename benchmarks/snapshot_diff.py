@@ -0,0 +1,69 @@
+"""
+Row-level snapshot diff on synthetic 100k-facility snapshots.
+
+Run from the repo root:  python -m benchmarks.snapshot_diff
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.snapshot_diff import diff_snapshots
+from backend.utils.fingerprint import fingerprint_frame
+
+ROWS = 100_000
+
+
+def synthetic_snapshot(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "facility name": [f"Facility {i}" for i in range(n)],
+        "physical address": [f"{i % 500} Test Road" for i in range(n)],
+        "city": rng.choice(["Harare", "Bulawayo", "Mutare", "Gweru"], n),
+        "latitude": rng.uniform(-22.4, -15.6, n),
+        "longitude": rng.uniform(25.2, 33.0, n),
+        "geocode_status": "Exact / Approximate",
+        "facility_type": rng.choice(["Pharmacy", "Clinic", "Hospital"], n),
+    })
+    df["facility_id"] = fingerprint_frame(df)
+    return df
+
+
+def next_snapshot(df, seed=1):
+    """Shuffled copy with 1% of rows removed, added, moved and edited"""
+    rng = np.random.default_rng(seed)
+    n = len(df)
+    changed = df.drop(index=rng.choice(n, n // 100, replace=False))
+
+    added = synthetic_snapshot(n // 100, seed)
+    added["facility name"] = "New " + added["facility name"]
+    added["facility_id"] = fingerprint_frame(added)
+    changed = pd.concat([changed, added], ignore_index=True)
+
+    moved = rng.choice(len(changed), n // 100, replace=False)
+    changed.loc[moved, "latitude"] += 0.01
+    jitter = rng.choice(len(changed), n // 100, replace=False)
+    changed.loc[jitter, "longitude"] += 1e-5
+    edited = rng.choice(len(changed), n // 100, replace=False)
+    changed.loc[edited, "facility_type"] = "Laboratory"
+    return changed.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    old = synthetic_snapshot(ROWS)
+    new = next_snapshot(old)
+
+    diff_snapshots(old, new)
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        diff = diff_snapshots(old, new)
+        times.append(time.perf_counter() - start)
+
+    print(f"{len(old):,} -> {len(new):,} rows: {diff['counts']}")
+    print(f"diff: best {min(times) * 1000:.0f} ms, median {np.median(times) * 1000:.0f} ms")
+
+    shuffled = old.sample(frac=1, random_state=0)
+    start = time.perf_counter()
+    diff_snapshots(old, shuffled)
+    print(f"reordered, unchanged: {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,63 @@
+"""
+Cold load of the facility data: CSV parse vs memory-mapped columnar snapshot.
+
+Run from the repo root:  python -m benchmarks.snapshot_load [--rows N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import DEFAULT_SOURCES, load_snapshot, write_snapshot
+from backend.facility_store import normalize_facilities
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def directory_size(path):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=None, help="tile the data up to N rows")
+    args = parser.parse_args()
+
+    source = next(p for p in DEFAULT_SOURCES if os.path.exists(p))
+    df = pd.read_csv(source)
+    if args.rows:
+        df = pd.concat([df] * (args.rows // len(df) + 1), ignore_index=True).iloc[:args.rows]
+        df["Facility Name"] = df["Facility Name"] + " #" + pd.Series(np.arange(len(df))).astype(str)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "facilities.csv")
+        df.to_csv(csv_path, index=False)
+        normalized = normalize_facilities(pd.read_csv(csv_path))
+        root = os.path.join(tmp, "snapshots")
+        version = write_snapshot(normalized, root, source=csv_path)
+
+        csv_time, _ = best_of(lambda: normalize_facilities(pd.read_csv(csv_path)))
+        npy_time, (mapped, _) = best_of(lambda: load_snapshot(root))
+
+        print(f"{len(df):,} rows from {os.path.basename(source)}")
+        print(f"CSV + normalize:   {csv_time * 1000:7.1f} ms   "
+              f"{os.path.getsize(csv_path) / 1e6:5.2f} MB on disk, "
+              f"{normalized.memory_usage(deep=True).sum() / 1e6:5.2f} MB in memory")
+        print(f"columnar (mmap):   {npy_time * 1000:7.1f} ms   "
+              f"{directory_size(os.path.join(root, version)) / 1e6:5.2f} MB on disk, "
+              f"{mapped.memory_usage(deep=True).sum() / 1e6:5.2f} MB in memory")
+
+        same = normalized.astype(object).where(normalized.notna(), None).equals(
+            mapped[normalized.columns].astype(object).where(mapped.notna(), None)
+        )
+        print(f"round trip identical: {same}")
@@ -0,0 +1,59 @@
+"""
+Stock plan for a trip: per-stop product_map lookups vs the per-snapshot
+ProductJoin (codes + type x product matrix + bincount).
+
+Run from the repo root:  python -m benchmarks.stock_plan [--rows N] [--stops N]
+"""
+import argparse
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import DEFAULT_SOURCES
+from backend.facility_store import normalize_facilities
+from backend.stock_plan import FALLBACK_TYPE, ProductJoin, load_product_map
+
+
+def per_stop(df, positions, product_map):
+    """One dict lookup and Counter update per stop"""
+    counts = Counter()
+    lines = []
+    for facility_type in df["facility_type"].iloc[positions]:
+        stop = product_map.get(facility_type, product_map.get(FALLBACK_TYPE, []))
+        lines.append(stop)
+        counts.update(stop)
+    return lines, dict(counts)
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--stops", type=int, default=20_000)
+    args = parser.parse_args()
+
+    df = normalize_facilities(pd.read_csv(next(p for p in DEFAULT_SOURCES if os.path.exists(p))))
+    df = pd.concat([df] * (args.rows // len(df) + 1), ignore_index=True).iloc[:args.rows]
+    positions = np.random.default_rng(0).choice(len(df), size=args.stops, replace=False)
+    product_map = load_product_map()
+
+    build_time, join = best_of(lambda: ProductJoin.from_frame(df, product_map), repeat=3)
+    loop_time, (loop_lines, loop_totals) = best_of(lambda: per_stop(df, positions, product_map))
+    join_time, (_, lines, totals, _) = best_of(lambda: join.plan(positions))
+
+    print(f"{args.rows:,} rows, {args.stops:,} stops")
+    print(f"join build (once per snapshot): {build_time * 1000:7.1f} ms")
+    print(f"per-stop lookups:               {loop_time * 1000:7.1f} ms")
+    print(f"ProductJoin.plan:               {join_time * 1000:7.1f} ms")
+    print(f"same result: {lines == loop_lines and totals == loop_totals}")
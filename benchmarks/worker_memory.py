@@ -0,0 +1,85 @@
+"""
+Private memory per forked worker: each worker loading its own CSV vs a
+columnar snapshot preloaded in the parent (what gunicorn.conf.py does).
+Linux only (reads /proc/self/smaps_rollup).
+
+Run from the repo root:  python -m benchmarks.worker_memory [--rows N] [--workers N]
+"""
+import argparse
+import gc
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import DEFAULT_SOURCES, ensure_snapshot
+from backend.facility_store import FacilityStore
+
+
+def private_mb():
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line)
+    kb = sum(int(fields[k].split()[0]) for k in ("Private_Clean", "Private_Dirty"))
+    return kb / 1024
+
+
+def serve(store):
+    """Touch the data the way requests do"""
+    snapshot = store.current()
+    index = snapshot.spatial_index
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(50):
+        index.radius(rng.uniform(-22, -16), rng.uniform(26, 32), 25)
+    snapshot.df["city"].value_counts()
+    snapshot.df[["facility name", "latitude"]].head(100).to_dict("records")
+
+
+def run(label, make_store, preload, workers):
+    store = make_store()
+    if preload:
+        store.current()
+        gc.freeze()
+
+    pipes = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        if os.fork() == 0:
+            os.close(read)
+            serve(store)
+            os.write(write, f"{private_mb():.1f}".encode())
+            os._exit(0)
+        os.close(write)
+        pipes.append(read)
+
+    sizes = []
+    for read in pipes:
+        sizes.append(float(os.read(read, 64).decode()))
+        os.close(read)
+        os.wait()
+    gc.unfreeze()
+    print(f"{label:<34} {np.mean(sizes):7.1f} MB private per worker")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    df = pd.read_csv(next(p for p in DEFAULT_SOURCES if os.path.exists(p)))
+    df = pd.concat([df] * (args.rows // len(df) + 1), ignore_index=True).iloc[:args.rows]
+    df["Facility Name"] = df["Facility Name"] + " #" + pd.Series(np.arange(len(df))).astype(str)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "facilities.csv")
+        df.to_csv(csv_path, index=False)
+        root = os.path.join(tmp, "snapshots")
+        ensure_snapshot(root, [csv_path])
+
+        print(f"{args.rows:,} rows, {args.workers} workers")
+        run("CSV, loaded in each worker", lambda: FacilityStore([csv_path]), False, args.workers)
+        run("CSV, preloaded", lambda: FacilityStore([csv_path]), True, args.workers)
+        run("columnar, loaded in each worker",
+            lambda: FacilityStore([csv_path], snapshot_dir=root), False, args.workers)
+        run("columnar, preloaded", lambda: FacilityStore([csv_path], snapshot_dir=root), True, args.workers)
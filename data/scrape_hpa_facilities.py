@@ -1,47 +1,15 @@
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
+"""
+Scrape the HPA facilities table over plain HTTP, without a browser.
 
-BASE_URL = "https://hpa.co.zw/registered-facilities/"
-HEADERS = {"Use-Agent": "Mozilla/5.0"}
+Same as ``python scraper/scraper.py --mode http``; any other scraper
+options (--out, --page-param, --workers, --rate) are passed through.
+"""
+import os
+import sys
 
-all_rows = []
-page = 1
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scraper"))
 
-while True:
-    url = f"{BASE_URL}?page={page}"
-    response = requests.get(url, headers=HEADERS)
+from scraper import main  # noqa: E402
 
-    if response.status_code !=200:
-        break
-
-    soup = BeautifulSoup(response.text, "html.parser")
-    table = soup.find("table")
-
-    if not table:
-        break
-
-    rows=table.find("tbody").find_all("tr")
-
-    if not rows:
-        break
-
-    for rows in rows:
-        cols = [c.get_text(strip=True) for c in row.find_all("td")]
-        all_rows.append(cols)
-
-        page += 1
-
-        columns = [
-            "Province",
-            "District",
-            "Facility Name",
-            "Facility Type",
-            "Registration Number",
-            "Status"
-            ]
-
-        df = pd.DataFrame(all_rows, columns=columns)
-        df.to_csv("hpa_facilities_live.csv", index=False)
-
-        print(f"Saved {len(df)} facilities")
\ No newline at end of file
+if __name__ == "__main__":
+    main(["--mode", "http", *sys.argv[1:]])
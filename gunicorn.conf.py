@@ -0,0 +1,23 @@
+"""
+Gunicorn settings (Procfile: gunicorn -c gunicorn.conf.py backend.app:app).
+
+The app is imported once in the master and the facility snapshot loaded
+there before any worker forks. Workers then share the master's pages:
+the memory-mapped columnar arrays and spatial index through the page
+cache, everything else copy-on-write. Adding workers adds little memory.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = True
+
+
+def when_ready(server):
+    from backend.app import preload_snapshot
+
+    snapshot = preload_snapshot()
+    server.log.info(f"Preloaded facility snapshot {snapshot.version[:8]} ({len(snapshot)} rows)")
+    # Keep the collector from touching (and so copying) preloaded objects in workers
+    gc.freeze()
@@ -4,7 +4,8 @@ from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import time
 import os
 import re
-import json
+
+from geocode_enhanced import carry_over
 
 # ==================================================
 # PATHS
@@ -12,7 +13,6 @@ import json
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 INPUT_FILE = os.path.join(BASE_DIR, "data", "facilities_raw.csv")
 OUTPUT_FILE = os.path.join(BASE_DIR, "data", "facilities_geocoded1.csv")
-CHECKPOINT_FILE = os.path.join(BASE_DIR, "data", "geocode_checkpoint.json")
 
 print(f"📥 Reading from: {INPUT_FILE}")
 print(f"💾 Saving to: {OUTPUT_FILE}")
@@ -25,19 +25,6 @@ geolocator = Nominatim(
     timeout=10
 )
 
-# ==================================================
-# CHECKPOINTING
-# ==================================================
-def load_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r") as f:
-            return json.load(f)
-    return {"last_index": -1}
-
-def save_checkpoint(index):
-    with open(CHECKPOINT_FILE, "w") as f:
-        json.dump({"last_index": index}, f)
-
 # ==================================================
 # ADDRESS NORMALIZATION
 # ==================================================
@@ -80,20 +67,22 @@ if "Longitude" not in df.columns:
     df["Longitude"] = None
 
 # ==================================================
-# RESUME FROM CHECKPOINT
+# RESUME: KEEP COORDINATES OF UNCHANGED FACILITIES
 # ==================================================
-checkpoint = load_checkpoint()
-start_index = checkpoint["last_index"] + 1
+# Matched by name/address/city fingerprint, so reordered rows on the HPA
+# site don't matter; only new or edited facilities are geocoded again.
+if os.path.exists(OUTPUT_FILE):
+    df, carried = carry_over(df, pd.read_csv(OUTPUT_FILE), columns=["Latitude", "Longitude"])
+    print(f"♻️  Carried over {carried} unchanged facilities")
 
-print(f"▶ Resuming from row {start_index} of {len(df)}")
+print(f"▶ {int(df['Latitude'].isna().sum())} of {len(df)} rows to geocode")
 
 # ==================================================
 # GEOCODING LOOP
 # ==================================================
-for index, row in df.iloc[start_index:].iterrows():
+for index, row in df.iterrows():
 
     if pd.notna(row["Latitude"]) and pd.notna(row["Longitude"]):
-        save_checkpoint(index)
         continue
 
     facility = row.get("Facility Name", "Unknown Facility")
@@ -132,7 +121,6 @@ for index, row in df.iloc[start_index:].iterrows():
         print(f"⚠ Skipped → {facility}")
 
     # SAVING PROGRESS AFTER EACH ROW
-    save_checkpoint(index)
     df.to_csv(OUTPUT_FILE, index=False)
 
     # Respect OpenStreetMap usage policy
@@ -143,7 +131,4 @@ for index, row in df.iloc[start_index:].iterrows():
 # ==================================================
 df.to_csv(OUTPUT_FILE, index=False)
 
-if os.path.exists(CHECKPOINT_FILE):
-    os.remove(CHECKPOINT_FILE)
-
 print("✅ GEOCODING COMPLETE")
\ No newline at end of file
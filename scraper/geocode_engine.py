@@ -0,0 +1,279 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# Rough Zimbabwe bounding box: (min_lat, max_lat, min_lon, max_lon)
+ZIMBABWE_BOUNDS = (-22.5, -15.0, 25.0, 34.0)
+
+STATUS_OK = "ok"
+STATUS_MISS = "miss"
+STATUS_OUT_OF_BOUNDS = "out_of_bounds"
+
+
+def cache_key(query):
+    return " ".join(str(query).lower().split())
+
+
+# ==================================================
+# RATE LIMITING
+# ==================================================
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` requests/second, bursts up to ``burst``"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ==================================================
+# PROVIDERS
+# ==================================================
+class ProviderError(Exception):
+    """A transient provider failure worth retrying"""
+
+
+class NominatimProvider:
+    """OpenStreetMap Nominatim via geopy (policy: at most 1 request/second)"""
+
+    name = "nominatim"
+    rate = 1.0
+
+    def __init__(self, user_agent="hpa_geographic_mapping (contact: admin@hpa.local)", timeout=15):
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocode(self, query):
+        from geopy.exc import GeocoderServiceError, GeocoderTimedOut
+
+        try:
+            location = self.geolocator.geocode(query, exactly_one=True)
+        except (GeocoderTimedOut, GeocoderServiceError) as e:
+            raise ProviderError(str(e)) from e
+        if not location:
+            return None
+        return location.latitude, location.longitude, location.address
+
+
+class StubProvider:
+    """Offline provider answering from a dict, for tests and dry runs"""
+
+    name = "stub"
+    rate = 1000.0
+
+    def __init__(self, answers=None, latency=0.0):
+        self.answers = {cache_key(q): v for q, v in (answers or {}).items()}
+        self.latency = latency
+        self.calls = []
+
+    def geocode(self, query):
+        self.calls.append(query)
+        if self.latency:
+            time.sleep(self.latency)
+        hit = self.answers.get(cache_key(query))
+        if hit is None:
+            return None
+        lat, lon = hit[:2]
+        return lat, lon, hit[2] if len(hit) > 2 else query
+
+
+# ==================================================
+# CACHE
+# ==================================================
+class GeocodeCache:
+    """
+    SQLite cache of geocode results keyed by normalized query.
+
+    Misses and out-of-bounds answers are stored too, so a query that
+    failed once is never sent again. Only the thread that created the
+    cache should use it; the engine funnels worker results through it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                query TEXT PRIMARY KEY,
+                lat REAL,
+                lon REAL,
+                display TEXT,
+                status TEXT NOT NULL,
+                provider TEXT,
+                updated_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS geocode_cache_status ON geocode_cache (status);
+        """)
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                "SELECT query, lat, lon, display, status FROM geocode_cache "
+                f"WHERE query IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for query, lat, lon, display, status in rows:
+                found[query] = {"lat": lat, "lon": lon, "display": display, "status": status}
+        return found
+
+    def put_many(self, results, provider=None):
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (key, r["lat"], r["lon"], r["display"], r["status"], provider, now)
+                    for key, r in results.items()
+                ],
+            )
+
+    def import_json(self, path):
+        """One-off import of the old geocode_cache.json (null entries are misses)"""
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+
+        results = {}
+        for query, value in legacy.items():
+            if value and value.get("lat") is not None:
+                lon = value.get("lon", value.get("lng"))
+                results[cache_key(query)] = {
+                    "lat": value["lat"], "lon": lon,
+                    "display": value.get("display"), "status": STATUS_OK,
+                }
+            else:
+                results[cache_key(query)] = {
+                    "lat": None, "lon": None, "display": None, "status": STATUS_MISS,
+                }
+
+        # Never overwrite anything the SQLite cache already knows
+        known = self.get_many(results)
+        fresh = {k: v for k, v in results.items() if k not in known}
+        self.put_many(fresh, provider="json-import")
+        return len(fresh)
+
+    def close(self):
+        self.conn.close()
+
+
+# ==================================================
+# ENGINE
+# ==================================================
+class GeocodeEngine:
+    """
+    Resolve many queries at the highest rate the provider allows.
+
+    Queries are normalized and de-duplicated, answered from the cache where
+    possible, and the rest are fanned out to a thread pool whose requests
+    all draw from one token bucket. Results (including misses) are written
+    to the cache in batches as they arrive.
+    """
+
+    def __init__(self, provider, cache, rate=None, burst=1, workers=4,
+                 max_retries=3, bounds=ZIMBABWE_BOUNDS, flush_every=50):
+        self.provider = provider
+        self.cache = cache
+        self.bucket = TokenBucket(rate or getattr(provider, "rate", 1.0), burst)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.bounds = bounds
+        self.flush_every = flush_every
+        self.stats = {"cache_hits": 0, "requests": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stat, n=1):
+        # Workers update the stats concurrently
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def _lookup(self, query):
+        for attempt in range(self.max_retries):
+            self.bucket.acquire()
+            self._count("requests")
+            try:
+                answer = self.provider.geocode(query)
+                break
+            except ProviderError as e:
+                self._count("errors")
+                wait = (attempt + 1) * 3
+                print(f"  ⏳ {e} - retry in {wait}s → {query}")
+                time.sleep(wait)
+        else:
+            # Still failing: leave it uncached so a later run retries it
+            return None
+
+        if answer is None:
+            return {"lat": None, "lon": None, "display": None, "status": STATUS_MISS}
+
+        lat, lon, display = answer
+        min_lat, max_lat, min_lon, max_lon = self.bounds
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return {"lat": lat, "lon": lon, "display": display, "status": STATUS_OUT_OF_BOUNDS}
+        return {"lat": lat, "lon": lon, "display": display, "status": STATUS_OK}
+
+    def resolve(self, queries, progress=None):
+        """
+        Map each distinct query to its result dict (``lat``, ``lon``,
+        ``display``, ``status``). Queries that kept failing are left out.
+        ``progress(done, total)`` is called as network lookups complete.
+        """
+        keys = {cache_key(q): q for q in queries if q and str(q).strip()}
+        results = self.cache.get_many(keys)
+        self._count("cache_hits", len(results))
+
+        todo = [k for k in keys if k not in results]
+        if not todo:
+            return results
+
+        pending = {}
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        futures = {}
+        try:
+            futures = {pool.submit(self._lookup, keys[k]): k for k in todo}
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if result is not None:
+                    results[futures[future]] = pending[futures[future]] = result
+                if len(pending) >= self.flush_every:
+                    self.cache.put_many(pending, self.provider.name)
+                    pending = {}
+                if progress:
+                    progress(done, len(todo))
+        finally:
+            # On an error (or Ctrl-C) drop the queued lookups rather than
+            # working through them at the provider's rate, but keep every
+            # answer already paid for
+            pool.shutdown(wait=True, cancel_futures=True)
+            for future, key in futures.items():
+                if key in results or future.cancelled() or future.exception() is not None:
+                    continue
+                if future.result() is not None:
+                    pending[key] = future.result()
+            self.cache.put_many(pending, self.provider.name)
+        return results
@@ -1,60 +1,33 @@
 import pandas as pd
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
+import argparse
 import os
 import re
-import json
+import sys
 from difflib import SequenceMatcher
 from functools import lru_cache
 
+from gazetteer import PRECISION_LEVELS, PRECISION_RANK, Gazetteer, precise_enough
+from geocode_engine import (
+    STATUS_OK, GeocodeCache, GeocodeEngine, NominatimProvider, StubProvider, cache_key
+)
+
 # ==================================================
 # PATHS
 # ==================================================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 INPUT_FILE = os.path.join(BASE_DIR, "data", "facilities_raw.csv")
 OUTPUT_FILE = os.path.join(BASE_DIR, "data", "facilities_geocoded.csv")
-CHECKPOINT_FILE = os.path.join(BASE_DIR, "data", "geocode_checkpoint.json")
-CACHE_FILE = os.path.join(BASE_DIR, "data", "geocode_cache.json")
+LEGACY_CACHE_FILE = os.path.join(BASE_DIR, "data", "geocode_cache.json")
+CACHE_FILE = os.path.join(BASE_DIR, "data", "geocode_cache.sqlite")
 
-print(f"📥 Reading from: {INPUT_FILE}")
-print(f"💾 Saving to: {OUTPUT_FILE}")
-
-# ==================================================
-# GEOCODER
-# ==================================================
-geolocator = Nominatim(
-    user_agent="hpa_geographic_mapping (contact: admin@hpa.local)",
-    timeout=15
+# Facility fingerprints are shared with the backend
+sys.path.insert(0, BASE_DIR)
+from backend.utils.address import (  # noqa: E402
+    correct_street_spelling, geocodable_address, geocodable_addresses, match_places
 )
+from backend.utils.fingerprint import fingerprint_frame  # noqa: E402
 
-# ==================================================
-# CACHE MANAGEMENT
-# ==================================================
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
-
-geocode_cache = load_cache()
-
-# ==================================================
-# CHECKPOINTING
-# ==================================================
-def load_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r") as f:
-            return json.load(f)
-    return {"last_index": -1}
-
-def save_checkpoint(index):
-    with open(CHECKPOINT_FILE, "w") as f:
-        json.dump({"last_index": index}, f)
+GEOCODE_COLUMNS = ["Latitude", "Longitude", "Geocode_Query", "Geocode_Precision"]
 
 # ==================================================
 # ZIMBABWE LOCATION DATABASE FOR FUZZY MATCHING
@@ -86,276 +59,274 @@ COMMON_STREETS = [
 # ==================================================
 # FUZZY MATCHING FUNCTIONS
 # ==================================================
+# Thin wrappers over backend.utils.address, which works on whole columns
 def similarity_ratio(a, b):
     """Calculate similarity between two strings"""
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
+@lru_cache(maxsize=None)
 def find_best_city_match(city_input):
     """Find the best matching city from known Zimbabwe cities"""
     if not city_input:
         return None
-    
-    city_input = str(city_input).strip()
-    
-    # Exact match first
-    for city in ZIMBABWE_CITIES:
-        if city.lower() == city_input.lower():
-            return city
-    
-    # Fuzzy match
-    best_match = None
-    best_score = 0.0
-    
-    for city in ZIMBABWE_CITIES:
-        score = similarity_ratio(city_input, city)
-        if score > best_score and score >= 0.7:  # 70% threshold
-            best_score = score
-            best_match = city
-    
-    if best_match:
-        print(f"  🔄 Fuzzy city match: '{city_input}' → '{best_match}' ({best_score:.0%})")
-    
-    return best_match or city_input
+    return match_cities([city_input])[0]
+
+def match_cities(values):
+    """``find_best_city_match`` over a column, reporting fuzzy corrections once"""
+    matched, corrections = match_places(values, ZIMBABWE_CITIES, threshold=70)
+    for city_input, city in corrections.items():
+        print(f"  🔄 Fuzzy city match: '{city_input}' → '{city}'")
+    return matched
 
 def find_best_street_match(address):
     """Find and correct common street name misspellings"""
     if not address:
         return address
-    
-    address_lower = address.lower()
-    
-    # Common misspellings and corrections
-    corrections = {
-        "n.mandela": "Nelson Mandela",
-        "n mandela": "Nelson Mandela",
-        "n. mandela": "Nelson Mandela",
-        "nmandela": "Nelson Mandela",
-        "r mugabe": "Robert Mugabe",
-        "r.mugabe": "Robert Mugabe",
-        "rmugabe": "Robert Mugabe",
-        "s machel": "Samora Machel",
-        "j tongogara": "Josiah Tongogara",
-        "h chitepo": "Herbert Chitepo",
-        "j moyo": "Jason Moyo",
-        "l takawira": "Leopold Takawira",
-        "fife ave": "Fife Avenue",
-        "borrowdale rd": "Borrowdale Road",
-        "enterprise rd": "Enterprise Road",
-        "chiremba rd": "Chiremba Road"
-    }
-    
-    result = address
-    for wrong, correct in corrections.items():
-        if wrong in address_lower:
-            result = re.sub(re.escape(wrong), correct, result, flags=re.IGNORECASE)
-    
-    return result
+    return correct_street_spelling(address)
 
 # ==================================================
 # ADDRESS NORMALIZATION (ENHANCED)
 # ==================================================
 def normalize_address(address):
-    if pd.isna(address):
-        return ""
-
-    address = str(address)
-    
-    # Fix common street name misspellings first
-    address = find_best_street_match(address)
-    
-    # Add spaces between numbers and letters
-    address = re.sub(r"(\d)([a-zA-Z])", r"\1 \2", address)
-    address = re.sub(r"([a-zA-Z])(\d)", r"\1 \2", address)
-    
-    # Standard abbreviation replacements
-    replacements = {
-        r"\bave\b": "Avenue",
-        r"\brd\b": "Road",
-        r"\bst\b": "Street",
-        r"\bcnr\b": "Corner",
-        r"\b&\b": "and",
-        r"\bblvd\b": "Boulevard",
-        r"\bdr\b": "Drive",
-        r"\bcres\b": "Crescent",
-        r"\bct\b": "Court",
-        r"\bext\b": "Extension"
-    }
-
-    for pattern, replacement in replacements.items():
-        address = re.sub(pattern, replacement, address, flags=re.IGNORECASE)
-
-    # Clean up punctuation and extra spaces
-    address = re.sub(r"[^\w\s,]", " ", address)
-    address = re.sub(r"\s+", " ", address).strip()
-    
-    return address.title()
+    return geocodable_address(address)
 
 # ==================================================
-# GEOCODING WITH MULTIPLE STRATEGIES
+# QUERY STRATEGIES
 # ==================================================
-def geocode_with_fallback(facility_name, address, city, max_retries=3):
+def build_queries(facility_name, address, city):
     """
-    Try multiple geocoding strategies with fuzzy matching
-    Returns (latitude, longitude, matched_query) or (None, None, None)
+    ``(precision, query)`` variations for one facility, most specific first.
+    Callers try them in order and keep the first that geocodes.
     """
-    global geocode_cache
-    
     # Normalize inputs
     clean_address = normalize_address(address)
-    matched_city = find_best_city_match(city)
-    
-    # Build query variations (most specific to least specific)
+    matched_city = find_best_city_match(city if pd.notna(city) else "")
+
     queries = []
-    
+
     # Strategy 1: Full address with city and country
     if clean_address:
-        queries.append(f"{clean_address}, {matched_city}, Zimbabwe")
-    
+        queries.append(("address", f"{clean_address}, {matched_city}, Zimbabwe"))
+
     # Strategy 2: Address without building numbers
     if clean_address:
         simplified = re.sub(r"^\d+\s*", "", clean_address)
         simplified = re.sub(r"\d+\s*", "", simplified)
         if simplified and simplified != clean_address:
-            queries.append(f"{simplified}, {matched_city}, Zimbabwe")
-    
+            queries.append(("street", f"{simplified}, {matched_city}, Zimbabwe"))
+
     # Strategy 3: Just street name and city
     if clean_address:
         # Extract potential street name
         street_match = re.search(r"([A-Za-z\s]+(?:Avenue|Road|Street|Drive|Way|Crescent))", clean_address, re.IGNORECASE)
         if street_match:
-            queries.append(f"{street_match.group(1)}, {matched_city}, Zimbabwe")
-    
+            queries.append(("street", f"{street_match.group(1)}, {matched_city}, Zimbabwe"))
+
     # Strategy 4: Facility name with city (for well-known places)
-    if facility_name:
-        queries.append(f"{facility_name}, {matched_city}, Zimbabwe")
-    
+    if facility_name and pd.notna(facility_name):
+        queries.append(("place", f"{facility_name}, {matched_city}, Zimbabwe"))
+
     # Strategy 5: Just city and country (fallback to city center)
-    queries.append(f"{matched_city}, Zimbabwe")
-    
+    queries.append(("city", f"{matched_city}, Zimbabwe"))
+
     # Remove duplicates while preserving order
     seen = set()
     unique_queries = []
-    for q in queries:
-        if q.lower() not in seen:
-            seen.add(q.lower())
-            unique_queries.append(q)
-    
-    # Try each query
-    for query in unique_queries:
-        # Check cache first
-        cache_key = query.lower().strip()
-        if cache_key in geocode_cache:
-            cached = geocode_cache[cache_key]
-            if cached.get("lat") and cached.get("lon"):
-                print(f"  📦 Cache hit: {query}")
-                return cached["lat"], cached["lon"], query
-        
-        # Try geocoding
-        for attempt in range(max_retries):
-            try:
-                location = geolocator.geocode(query, exactly_one=True)
-                
-                if location:
-                    # Validate the result is in Zimbabwe (rough bounds check)
-                    if -22.5 <= location.latitude <= -15.0 and 25.0 <= location.longitude <= 34.0:
-                        # Cache the result
-                        geocode_cache[cache_key] = {
-                            "lat": location.latitude,
-                            "lon": location.longitude,
-                            "display": location.address
-                        }
-                        save_cache(geocode_cache)
-                        return location.latitude, location.longitude, query
-                    else:
-                        print(f"  ⚠️ Result outside Zimbabwe bounds: {location.address}")
-                
-                break  # No result, try next query
-                
-            except GeocoderTimedOut:
-                wait = (attempt + 1) * 3
-                print(f"  ⏳ Timeout, retry in {wait}s...")
-                time.sleep(wait)
-                
-            except GeocoderServiceError as e:
-                print(f"  ❌ Service error: {e}")
-                time.sleep(5)
-                break
-        
-        # Rate limiting
-        time.sleep(1)
-    
-    return None, None, None
+    for precision, q in queries:
+        if cache_key(q) not in seen:
+            seen.add(cache_key(q))
+            unique_queries.append((precision, q))
+    return unique_queries
+
 
 # ==================================================
-# LOAD DATA
+# INCREMENTAL RUNS
 # ==================================================
-df = pd.read_csv(INPUT_FILE)
+def facility_ids(df):
+    """Fingerprint of each row's name, address and city (see backend.utils.fingerprint)"""
+    return fingerprint_frame(df.rename(columns=str.lower))
 
-if "Latitude" not in df.columns:
-    df["Latitude"] = None
-if "Longitude" not in df.columns:
-    df["Longitude"] = None
-if "Geocode_Query" not in df.columns:
-    df["Geocode_Query"] = None
 
-# ==================================================
-# RESUME FROM CHECKPOINT
-# ==================================================
-checkpoint = load_checkpoint()
-start_index = checkpoint["last_index"] + 1
+def carry_over(df, previous, columns=GEOCODE_COLUMNS):
+    """
+    Copy geocode ``columns`` from a previous output onto ``df`` for every
+    facility whose fingerprint is unchanged, whatever its row position.
+
+    New or edited facilities, and ones that failed last time, are left
+    blank for the geocoder. Returns ``(df, carried_count)``. Column names
+    in ``previous`` are matched case-insensitively.
+    """
+    canonical = {c.lower(): c for c in GEOCODE_COLUMNS}
+    previous = previous.rename(columns=lambda c: canonical.get(c.strip().lower(), c))
+    columns = [c for c in columns if c in previous.columns]
+    known = previous[previous["Latitude"].notna() & previous["Longitude"].notna()]
+    known = known.assign(_fid=facility_ids(known)).drop_duplicates("_fid").set_index("_fid")
+
+    ids = facility_ids(df)
+    hit = ids.isin(known.index)
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None
+        df[column] = df[column].astype("float64" if column in ("Latitude", "Longitude") else "object")
+        df.loc[hit, column] = known.loc[ids[hit], column].to_numpy()
+    return df, int(hit.sum())
 
-print(f"▶ Resuming from row {start_index} of {len(df)}")
-print(f"📦 Cache contains {len(geocode_cache)} entries")
 
 # ==================================================
-# GEOCODING LOOP
+# GEOCODING IN ROUNDS
 # ==================================================
-success_count = 0
-fail_count = 0
-
-for index, row in df.iloc[start_index:].iterrows():
-    # Skip if already geocoded
-    if pd.notna(row["Latitude"]) and pd.notna(row["Longitude"]):
-        save_checkpoint(index)
-        continue
-
-    facility = row.get("Facility Name", "Unknown Facility")
-    city = row.get("City", "")
-    raw_address = row.get("Physical Address", "")
-
-    print(f"\n[{index + 1}/{len(df)}] {facility}")
-    
-    lat, lon, matched_query = geocode_with_fallback(facility, raw_address, city)
-    
-    if lat and lon:
+def _report_progress(done, total):
+    if done % max(1, total // 20) == 0 or done == total:
+        print(f"  [{done}/{total}] looked up")
+
+
+def geocode_frame(df, engine=None, output_file=None, gazetteer=None, min_precision="city"):
+    """
+    Fill Latitude/Longitude/Geocode_Query/Geocode_Precision for rows that
+    lack coordinates.
+
+    With a gazetteer, rows it can place at ``min_precision`` or better are
+    filled offline and never reach the network. The rest go to the engine
+    in rounds: round r sends every still-unresolved row's r-th query
+    strategy in one batch, so identical queries across rows go out once and
+    the provider is kept busy. Strategies no more precise than the
+    gazetteer's own answer are skipped, and that answer is kept when the
+    remote lookups fail. The CSV is written once per round rather than once
+    per row; the SQLite cache holds every answer, so an interrupted run
+    picks up where it stopped.
+    """
+    for column in GEOCODE_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    df["Geocode_Query"] = df["Geocode_Query"].astype("object")
+    df["Geocode_Precision"] = df["Geocode_Precision"].astype("object")
+
+    def fill(index, lat, lon, query, precision):
         df.at[index, "Latitude"] = lat
         df.at[index, "Longitude"] = lon
-        df.at[index, "Geocode_Query"] = matched_query
-        print(f"  ✔ Geocoded: ({lat:.6f}, {lon:.6f})")
-        success_count += 1
-    else:
-        print(f"  ⚠ Could not geocode")
-        fail_count += 1
-
-    # Save progress after each row
-    save_checkpoint(index)
-    df.to_csv(OUTPUT_FILE, index=False)
-    
-    # Rate limiting for Nominatim
-    time.sleep(1.5)
+        df.at[index, "Geocode_Query"] = query
+        df.at[index, "Geocode_Precision"] = precision
+
+    todo = df.index[df["Latitude"].isna() | df["Longitude"].isna()]
+    names = df["Facility Name"] if "Facility Name" in df.columns else pd.Series(None, index=df.index)
+    addresses = df["Physical Address"] if "Physical Address" in df.columns else pd.Series("", index=df.index)
+    cities = df["City"] if "City" in df.columns else pd.Series("", index=df.index)
+    clean = geocodable_addresses(addresses)
+    print(f"▶ {len(todo)} of {len(df)} rows need geocoding")
+
+    # Offline pass
+    fallback = {}
+    pending = []
+    for index in todo:
+        city = cities[index] if pd.notna(cities[index]) else ""
+        hit = gazetteer.locate(clean[index], city) if gazetteer else None
+        if hit and precise_enough(hit["precision"], min_precision):
+            fill(index, hit["lat"], hit["lon"], f"gazetteer: {hit['name']}", hit["precision"])
+        else:
+            if hit:
+                fallback[index] = hit
+            pending.append(index)
+    if gazetteer:
+        print(f"📖 Gazetteer placed {len(todo) - len(pending)} rows offline")
+
+    # Remote rounds, only for strategies that beat what we already have
+    queries = {}
+    for index in pending:
+        floor = PRECISION_RANK[fallback[index]["precision"]] if index in fallback else len(PRECISION_RANK)
+        queries[index] = [
+            (precision, query)
+            for precision, query in build_queries(names[index], addresses[index], cities[index])
+            if PRECISION_RANK[precision] < floor
+        ]
+
+    round_no = 0
+    while pending and engine is not None:
+        asked = {index: queries[index][round_no] for index in pending if round_no < len(queries[index])}
+        if not asked:
+            break
+
+        distinct = {cache_key(query) for _, query in asked.values()}
+        print(f"\n🔎 Round {round_no + 1}: {len(asked)} rows, {len(distinct)} distinct queries")
+        results = engine.resolve([query for _, query in asked.values()], progress=_report_progress)
+
+        resolved = set()
+        for index, (precision, query) in asked.items():
+            result = results.get(cache_key(query))
+            if result and result["status"] == STATUS_OK:
+                fill(index, result["lat"], result["lon"], query, precision)
+                resolved.add(index)
+        print(f"  ✔ {len(resolved)} rows geocoded this round")
+
+        pending = [index for index in pending if index not in resolved]
+        round_no += 1
+
+        if output_file:
+            df.to_csv(output_file, index=False)
+
+    # Whatever the network could not improve keeps its gazetteer position
+    for index in pending:
+        if index in fallback:
+            hit = fallback[index]
+            fill(index, hit["lat"], hit["lon"], f"gazetteer: {hit['name']}", hit["precision"])
+    pending = [index for index in pending if index not in fallback]
+
+    return df, len(todo) - len(pending), len(pending)
+
 
 # ==================================================
-# FINAL SAVE AND CLEANUP
+# MAIN
 # ==================================================
-df.to_csv(OUTPUT_FILE, index=False)
-
-if os.path.exists(CHECKPOINT_FILE):
-    os.remove(CHECKPOINT_FILE)
-
-print(f"\n{'='*50}")
-print(f"✅ GEOCODING COMPLETE")
-print(f"   Success: {success_count}")
-print(f"   Failed:  {fail_count}")
-print(f"   Total:   {len(df)}")
-print(f"   Cache:   {len(geocode_cache)} entries")
-print(f"{'='*50}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geocode facilities with fallback strategies")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--provider", choices=["nominatim", "stub"], default="nominatim")
+    parser.add_argument("--rate", type=float, default=None, help="requests/second (default: provider policy)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--offline", action="store_true", help="gazetteer only, no network")
+    parser.add_argument("--no-gazetteer", action="store_true", help="skip the offline gazetteer")
+    parser.add_argument(
+        "--min-precision", choices=PRECISION_LEVELS, default="city",
+        help="gazetteer answers at least this precise skip the network",
+    )
+    args = parser.parse_args(argv)
+
+    print(f"📥 Reading from: {args.input}")
+    print(f"💾 Saving to: {args.output}")
+
+    cache = GeocodeCache(args.cache)
+    imported = cache.import_json(LEGACY_CACHE_FILE)
+    if imported:
+        print(f"📦 Imported {imported} entries from {LEGACY_CACHE_FILE}")
+    print(f"📦 Cache contains {len(cache)} entries")
+
+    engine = None
+    if not args.offline:
+        provider = NominatimProvider() if args.provider == "nominatim" else StubProvider()
+        engine = GeocodeEngine(provider, cache, rate=args.rate, workers=args.workers)
+    gazetteer = None if args.no_gazetteer else Gazetteer.load()
+
+    df = pd.read_csv(args.input)
+    if os.path.exists(args.output):
+        df, carried = carry_over(df, pd.read_csv(args.output))
+        print(f"♻️  Carried over coordinates for {carried} unchanged facilities")
+    df, success_count, fail_count = geocode_frame(
+        df, engine, args.output, gazetteer=gazetteer, min_precision=args.min_precision
+    )
+    df.to_csv(args.output, index=False)
+
+    print(f"\n{'='*50}")
+    print(f"✅ GEOCODING COMPLETE")
+    print(f"   Success:  {success_count}")
+    print(f"   Failed:   {fail_count}")
+    print(f"   Total:    {len(df)}")
+    if engine:
+        print(f"   Requests: {engine.stats['requests']} ({engine.stats['cache_hits']} cache hits)")
+    print(f"   Cache:    {len(cache)} entries")
+    print(f"{'='*50}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+No-browser scraping of the HPA TablePress table.
+
+TablePress renders the whole table into the page and DataTables only pages
+it client-side, so a single GET gets every row. Pages of a server-side
+paginated source (``page_param``) are fetched concurrently, rate-limited.
+
+The page is parsed with lxml when it is installed, and with the standard
+library's ``HTMLParser`` otherwise; both give the same rows.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+from geocode_engine import TokenBucket
+
+TABLE_ID = "tablepress-1"
+
+# DataTables' default page length; virtual pages match the browser's pages
+PAGE_LENGTH = 10
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+}
+
+# Stands in for <br> in raw cell text: a (private use) character that
+# whitespace collapsing leaves alone
+_BR = "\ue000"
+
+
+class ScrapeError(Exception):
+    """The page could not be fetched or held no facilities table"""
+
+
+# ==================================================
+# PARSER
+# ==================================================
+class TablePressParser(HTMLParser):
+    """
+    Streaming parser that keeps only the body rows of one table.
+
+    Cell text follows the browser's innerText closely enough for our
+    columns: whitespace runs collapse to a space and <br> becomes a newline.
+    """
+
+    def __init__(self, table_id=TABLE_ID):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        self.found = False
+        self.depth = 0
+        self.in_body = False
+        self.row = None
+        self.cell = None
+        self.rows = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self.depth:
+                self.depth += 1
+            elif dict(attrs).get("id") == self.table_id:
+                self.found = True
+                self.depth = 1
+        elif self.depth != 1:
+            return
+        elif tag == "tbody":
+            self.in_body = True
+        elif tag == "tr" and self.in_body:
+            self.row = []
+        elif tag in ("td", "th") and self.row is not None:
+            self.cell = []
+        elif tag == "br" and self.cell is not None:
+            self.cell.append(_BR)
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self.depth:
+            self.depth -= 1
+        elif self.depth != 1:
+            return
+        elif tag == "tbody":
+            self.in_body = False
+        elif tag in ("td", "th") and self.cell is not None:
+            self.row.append(_cell_text("".join(self.cell)))
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            self.rows.append(self.row)
+            self.row = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+
+def _cell_text(text):
+    # Whitespace runs collapse to a space; only a <br> starts a new line
+    return "\n".join(" ".join(line.split()) for line in text.split(_BR)).strip()
+
+
+def _html_parser_rows(html, table_id):
+    """Cell texts of each body row with ``TablePressParser``, or None if there is no table"""
+    parser = TablePressParser(table_id)
+    parser.feed(html)
+    parser.close()
+    return parser.rows if parser.found else None
+
+
+def _lxml_rows(html, table_id):
+    """``_html_parser_rows`` with lxml's C parser; raises ImportError without lxml"""
+    from lxml import html as lxml_html
+
+    tables = lxml_html.fromstring(html).xpath("//table[@id=$id]", id=table_id)
+    if not tables:
+        return None
+    for br in tables[0].iter("br"):
+        br.tail = _BR + (br.tail or "")
+    return [
+        [_cell_text(cell.text_content()) for cell in tr.iterchildren("td", "th")]
+        for tbody in tables[0].iterchildren("tbody")
+        for tr in tbody.iterchildren("tr")
+    ]
+
+
+def parse_table(html, table_id=TABLE_ID):
+    """Facility rows (``Facility Name``/``Physical Address``/``City``) from page HTML"""
+    try:
+        rows = _lxml_rows(html, table_id)
+    except ImportError:
+        rows = _html_parser_rows(html, table_id)
+    if rows is None:
+        raise ScrapeError(f"table#{table_id} not found")
+    return [
+        {"Facility Name": cells[0], "Physical Address": cells[1], "City": cells[2]}
+        for cells in (row + [""] * (3 - len(row)) for row in rows)
+        if any(cells)
+    ]
+
+
+# ==================================================
+# FETCHING
+# ==================================================
+def make_session(pool_size=4):
+    """A requests session with a keep-alive pool sized for ``pool_size`` workers"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch(session, url, params=None, timeout=60):
+    try:
+        response = session.get(url, params=params, timeout=timeout)
+    except Exception as e:
+        raise ScrapeError(f"{url}: {e}") from e
+    if response.status_code != 200:
+        raise ScrapeError(f"{url}: HTTP {response.status_code}")
+    return response.text
+
+
+def http_pages(url, start_page=1, page_param=None, workers=4, rate=1.0, session=None):
+    """
+    Page source for ``scraper.scrape_to_csv`` that never starts a browser.
+
+    The first page is fetched before returning, so an unreachable site or
+    a page without the table raises ``ScrapeError`` here (callers fall back
+    to the browser). Without ``page_param`` the full table from that one
+    response is cut into ``PAGE_LENGTH`` virtual pages. With it, pages
+    ``?<page_param>=N`` are fetched ``workers`` at a time but never more
+    than ``rate`` requests/second, until one comes back empty.
+    """
+    session = session or make_session(workers)
+    first_page = start_page if page_param else 1
+    first = parse_table(fetch(session, url, {page_param: first_page} if page_param else None))
+
+    if not page_param:
+        return _virtual_pages(first, start_page)
+    return _remote_pages(session, url, page_param, first_page, first, workers, rate)
+
+
+def _virtual_pages(rows, start_page):
+    total = len(rows)
+    for page_number in range(start_page, (total + PAGE_LENGTH - 1) // PAGE_LENGTH + 1):
+        start = (page_number - 1) * PAGE_LENGTH
+        yield page_number, rows[start:start + PAGE_LENGTH], total
+
+
+def _remote_pages(session, url, page_param, first_page, first, workers, rate):
+    bucket = TokenBucket(rate, burst=workers)
+
+    def get(page_number):
+        bucket.acquire()
+        return parse_table(fetch(session, url, {page_param: page_number}))
+
+    if not first:
+        return
+    yield first_page, first, None
+
+    page_number = first_page + 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # One wave of pages at a time, yielded in order
+            wave = list(range(page_number, page_number + workers))
+            for number, rows in zip(wave, pool.map(get, wave)):
+                if not rows:
+                    return
+                yield number, rows, None
+            page_number += workers
@@ -1,11 +1,27 @@
-from playwright.sync_api import sync_playwright
 import pandas as pd
+import argparse
+import hashlib
+import json
 import os
+import re
 import time
 import random
 
+from http_scraper import ScrapeError, http_pages
+
 TARGET_URL = "https://hpa.co.zw/registered-facilities/"
-os.makedirs("data", exist_ok=True)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_FILE = os.path.join(BASE_DIR, "data", "facilities_raw1.csv")
+# Page cursor of an interrupted run
+STATE_FILE = os.path.join(BASE_DIR, "data", "scrape_state.json")
+# Page hashes of the last complete scrape
+MANIFEST_FILE = os.path.join(BASE_DIR, "data", "scrape_manifest.json")
+
+COLUMNS = ["Facility Name", "Physical Address", "City"]
+
+# Rows buffered before an append to the output
+BATCH_SIZE = 200
 
 # Stealth user agents
 USER_AGENTS = [
@@ -16,10 +32,25 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.101 Safari/537.36"
 ]
 
-def scrape_all_facilities():
-    facilities = []
-    seen = set()
-    page_number = 1
+
+# ==================================================
+# PAGE SOURCE: HEADLESS BROWSER
+# ==================================================
+def _total_entries(info_text):
+    """5744 from DataTables' "Showing 1 to 10 of 5,744 entries" """
+    numbers = re.findall(r"\d[\d,]*", info_text or "")
+    return int(numbers[-1].replace(",", "")) if numbers else None
+
+
+def browser_pages(url=TARGET_URL, start_page=1, delay=(3, 7)):
+    """
+    Yield ``(page_number, rows, total_entries)`` for each table page,
+    starting at ``start_page``. ``rows`` are ``COLUMNS`` dicts.
+
+    Costs a Chromium process; ``http_pages`` is tried first and this is
+    the fallback.
+    """
+    from playwright.sync_api import sync_playwright
 
     with sync_playwright() as p:
         # Launch browser with stealth options
@@ -53,58 +84,204 @@ def scrape_all_facilities():
         )
         page = context.new_page()
 
-        page.goto(TARGET_URL, wait_until="domcontentloaded", timeout=120000)
-        # Random delay after loading
-        time.sleep(random.uniform(2, 5))
-        page.wait_for_selector("table#tablepress-1", timeout=120000)
+        try:
+            page.goto(url, wait_until="domcontentloaded", timeout=120000)
+            # Random delay after loading
+            time.sleep(random.uniform(2, 5))
+            page.wait_for_selector("table#tablepress-1", timeout=120000)
 
-        while True:
-            print(f"📄 Scraping page {page_number}...")
+            page_number = 1
+            if start_page > 1:
+                # Jump straight to the resume point through the DataTables API
+                page.evaluate(
+                    "p => jQuery('#tablepress-1').DataTable().page(p).draw('page')",
+                    start_page - 1,
+                )
+                page.wait_for_selector("table#tablepress-1 tbody tr")
+                page_number = start_page
 
-            # ⚡ Extract ALL rows at once (FAST)
-            rows = page.locator("table#tablepress-1 tbody tr").evaluate_all("""
-                rows => rows.map(row => {
-                    const cells = row.querySelectorAll("td");
-                    return {
-                        name: cells[0]?.innerText.trim(),
-                        address: cells[1]?.innerText.trim(),
-                        city: cells[2]?.innerText.trim()
-                    };
-                })
-            """)
+            while True:
+                # ⚡ Extract ALL rows at once (FAST)
+                rows = page.locator("table#tablepress-1 tbody tr").evaluate_all("""
+                    rows => rows.map(row => {
+                        const cells = row.querySelectorAll("td");
+                        return {
+                            name: cells[0]?.innerText.trim(),
+                            address: cells[1]?.innerText.trim(),
+                            city: cells[2]?.innerText.trim()
+                        };
+                    })
+                """)
+                info = page.locator("#tablepress-1_info")
+                total = _total_entries(info.inner_text()) if info.count() else None
 
-            for r in rows:
-                key = f"{r['name']}|{r['address']}|{r['city']}"
-                if key in seen:
-                    continue
+                yield page_number, [
+                    {"Facility Name": r["name"], "Physical Address": r["address"], "City": r["city"]}
+                    for r in rows
+                ], total
 
-                seen.add(key)
-                facilities.append({
-                    "Facility Name": r["name"],
-                    "Physical Address": r["address"],
-                    "City": r["city"]
-                })
+                # 👉 Click Next if enabled
+                next_btn = page.locator("#tablepress-1_next")
 
-            # 👉 Click Next if enabled
-            next_btn = page.locator("#tablepress-1_next")
+                if "disabled" in (next_btn.get_attribute("class") or ""):
+                    break
 
-            if "disabled" in (next_btn.get_attribute("class") or ""):
-                break
+                next_btn.click()
+                # Random delay between page clicks
+                time.sleep(random.uniform(*delay))
+                page.wait_for_selector("table#tablepress-1 tbody tr")
+                page_number += 1
+        finally:
+            browser.close()
 
-            next_btn.click()
-            # Random delay between page clicks
-            time.sleep(random.uniform(3, 7))
-            page.wait_for_selector("table#tablepress-1 tbody tr")
-            page_number += 1
 
-        browser.close()
+# ==================================================
+# STREAMING
+# ==================================================
+def row_key(row):
+    return "|".join(row.get(col) or "" for col in COLUMNS)
 
-    return facilities
 
+def page_hash(rows):
+    return hashlib.sha1("\n".join(row_key(r) for r in rows).encode("utf-8")).hexdigest()
+
+
+def stream_facilities(pages, seen=None):
+    """Yield each unique facility row from a page source as it arrives"""
+    seen = set() if seen is None else seen
+    for _, rows, _ in pages:
+        for row in rows:
+            key = row_key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield row
+
+
+def _load_json(path, default):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return default
+
+
+def _save_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
 
-if __name__ == "__main__":
-    data = scrape_all_facilities()
-    df = pd.DataFrame(data)
-    df.to_csv("data/facilities_raw1.csv", index=False)
 
-    print(f"✅ Scraped {len(df)} unique facilities")
\ No newline at end of file
+def scrape_to_csv(page_source, out_file=OUTPUT_FILE, state_file=STATE_FILE,
+                  manifest_file=MANIFEST_FILE, batch_size=BATCH_SIZE):
+    """
+    Stream a scrape into ``out_file``.
+
+    ``page_source(start_page)`` returns a page iterator (see
+    ``browser_pages``). Rows are appended to ``<out_file>.partial`` every
+    ``batch_size`` rows, and the page cursor is saved with each append, so
+    an interrupted run resumes after the last written page. The finished
+    file replaces ``out_file`` in one rename.
+
+    Every page is read and hashed: a change can be on any page, so no
+    prefix of the table proves it unchanged. If the total entry count and
+    every page hash match the last complete scrape, ``out_file`` is left
+    untouched (so nothing downstream sees a rewrite). Returns
+    ``{"status", "rows", "pages"}`` with status ``complete`` or
+    ``unchanged``.
+    """
+    partial = f"{out_file}.partial"
+    state = _load_json(state_file, None)
+    if state and os.path.exists(partial):
+        seen = {row_key(r) for r in pd.read_csv(partial, dtype=str, keep_default_na=False).to_dict("records")}
+        print(f"▶ Resuming after page {state['page']} ({len(seen)} rows already saved)")
+    else:
+        state = {"page": 0, "hashes": [], "total": None}
+        seen = set()
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    previous = _load_json(manifest_file, {"pages": [], "total": None})
+
+    buffer = []
+
+    def flush(last_page):
+        if buffer:
+            pd.DataFrame(buffer, columns=COLUMNS).to_csv(
+                partial, mode="a", header=not os.path.exists(partial), index=False
+            )
+            buffer.clear()
+        state["page"] = last_page
+        _save_json(state_file, state)
+
+    pages = page_source(state["page"] + 1)
+    try:
+        for page_number, rows, total in pages:
+            print(f"📄 Scraped page {page_number} ({len(rows)} rows)")
+            state["hashes"].append(page_hash(rows))
+            state["total"] = total
+
+            buffer.extend(stream_facilities([(page_number, rows, total)], seen))
+            if len(buffer) >= batch_size:
+                flush(page_number)
+    finally:
+        pages.close()
+
+    flush(len(state["hashes"]))
+    unchanged = (
+        os.path.exists(out_file)
+        and state["hashes"] == previous["pages"]
+        and state["total"] == previous["total"]
+    )
+    if unchanged:
+        print(f"⏹ All {len(state['hashes'])} pages match the last snapshot - nothing changed")
+        if os.path.exists(partial):
+            os.remove(partial)
+    elif os.path.exists(partial):
+        os.replace(partial, out_file)
+    _save_json(manifest_file, {"pages": state["hashes"], "total": state["total"], "rows": len(seen)})
+    os.remove(state_file)
+    return {"status": "unchanged" if unchanged else "complete",
+            "rows": len(seen), "pages": len(state["hashes"])}
+
+
+# ==================================================
+# MAIN
+# ==================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the HPA registered facilities table")
+    parser.add_argument("--url", default=TARGET_URL, help="e.g. a locally served copy of the page")
+    parser.add_argument("--out", default=OUTPUT_FILE)
+    parser.add_argument("--state", default=STATE_FILE, help="page cursor kept while a scrape runs")
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help="page hashes of the last scrape")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--mode", choices=["auto", "http", "browser"], default="auto",
+                        help="auto tries plain HTTP and falls back to the browser")
+    parser.add_argument("--page-param", default=None,
+                        help="query parameter for server-side pages (HTTP mode)")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent page fetches (HTTP mode)")
+    parser.add_argument("--rate", type=float, default=1.0, help="page requests/second (HTTP mode)")
+    parser.add_argument("--delay", type=float, nargs=2, default=(3, 7), metavar=("MIN", "MAX"),
+                        help="seconds to wait between pages (browser mode)")
+    args = parser.parse_args(argv)
+
+    def page_source(start_page):
+        if args.mode != "browser":
+            try:
+                return http_pages(args.url, start_page, args.page_param, args.workers, args.rate)
+            except (ScrapeError, ImportError) as e:
+                if args.mode == "http":
+                    raise
+                print(f"⚠️ HTTP scrape failed ({e}); falling back to the browser")
+        return browser_pages(args.url, start_page, tuple(args.delay))
+
+    result = scrape_to_csv(page_source, out_file=args.out, state_file=args.state,
+                           manifest_file=args.manifest, batch_size=args.batch_size)
+    if result["status"] == "unchanged":
+        print(f"✅ HPA table unchanged; kept {args.out}")
+    else:
+        print(f"✅ Scraped {result['rows']} unique facilities from {result['pages']} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The scraper scripts import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "scraper"))
+
+FIXTURES_DIR = os.path.join(TESTS_DIR, "fixtures")
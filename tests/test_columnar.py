@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import columnar
+from backend.facility_store import normalize_facilities
+from backend.spatial_index import GridIndex
+
+RAW = pd.DataFrame({
+    "Facility Name": ["Avenues Pharmacy", "City Clinic", "Mbare Clinic", "Zoë's Chemist"],
+    "Physical Address": ["1 Main St", "2 Side Rd", None, "4 Hill Rd"],
+    "City": ["Harare", "Bulawayo", "Harare", None],
+    "Latitude": [-17.83, -20.15, None, -17.75],
+    "Longitude": [31.05, 28.58, None, 31.09],
+})
+
+
+def values(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "facilities.csv"
+    RAW.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "snapshots")
+
+
+def test_round_trip(root):
+    df = normalize_facilities(RAW.copy())
+    version = columnar.write_snapshot(df, root)
+
+    loaded, manifest = columnar.load_snapshot(root)
+    assert manifest["version"] == version == columnar.current_version(root)
+    kinds = {c["name"]: c["kind"] for c in manifest["columns"]}
+    assert (kinds["latitude"], kinds["city"], kinds["facility name"]) == ("numeric", "category", "string")
+
+    assert list(loaded.columns) == list(df.columns)
+    for name in df.columns:
+        assert values(loaded[name]) == values(df[name]), name
+    # Numeric columns come back memory-mapped, not copied
+    assert mapped(loaded["latitude"].to_numpy())
+    assert not mapped(columnar.load_snapshot(root, mmap=False)[0]["latitude"].to_numpy())
+
+
+def test_spatial_index_matches_a_fresh_one(root):
+    df = normalize_facilities(RAW.copy())
+    columnar.write_snapshot(df, root)
+    loaded, manifest = columnar.load_snapshot(root)
+
+    index = columnar.load_spatial_index(root, manifest, loaded)
+    fresh = GridIndex.from_frame(df)
+    box = (-18.0, 31.0, -17.7, 31.1)
+    assert sorted(index.bbox(*box).tolist()) == sorted(fresh.bbox(*box).tolist()) == [0, 3]
+
+
+def test_same_data_keeps_its_version(root):
+    df = normalize_facilities(RAW.copy())
+    first = columnar.write_snapshot(df, root)
+    assert columnar.write_snapshot(df, root) == first
+
+    second = columnar.write_snapshot(normalize_facilities(RAW.iloc[:2].copy()), root)
+    assert second != first
+    assert columnar.current_version(root) == second
+    assert os.path.isdir(os.path.join(root, first))
+
+
+def test_rewritten_source_is_stale(root, source):
+    version = columnar.ensure_snapshot(root, [source])
+    assert not columnar.is_stale(columnar.read_manifest(root))
+    assert columnar.ensure_snapshot(root, [source]) == version
+
+    RAW.iloc[:2].to_csv(source, index=False)
+    assert columnar.is_stale(columnar.read_manifest(root))
+    rebuilt = columnar.ensure_snapshot(root, [source])
+    assert rebuilt != version
+    assert len(columnar.load_snapshot(root)[0]) == 2
+
+
+def test_no_sources_means_no_snapshot(root, tmp_path):
+    assert columnar.ensure_snapshot(root, [str(tmp_path / "missing.csv")]) is None
+    assert columnar.read_manifest(root) is None
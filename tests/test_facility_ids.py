@@ -0,0 +1,40 @@
+import pandas as pd
+
+from backend.facility_store import FacilitySnapshot, normalize_facilities
+from backend.utils.fingerprint import facility_fingerprint
+
+
+def facilities(rows):
+    return normalize_facilities(pd.DataFrame(rows, columns=["Facility Name", "Physical Address", "City"]))
+
+
+def test_duplicate_listings_get_unique_ids():
+    df = facilities([
+        ["Avenues Pharmacy", "1 Main St", "Harare"],
+        ["Avenues Pharmacy", "1 Main St", "Harare"],
+        ["City Clinic", "2 Side Rd", "Bulawayo"],
+        ["Avenues Pharmacy", "1 Main St", "Harare"],
+    ])
+    base = facility_fingerprint("Avenues Pharmacy", "1 Main St", "Harare")
+    assert df["facility_id"].tolist()[:2] == [base, base + "#1"]
+    assert df["facility_id"].iloc[3] == base + "#2"
+    assert df["facility_id"].is_unique
+
+
+def test_ids_without_duplicates_are_plain_fingerprints():
+    df = facilities([["City Clinic", "2 Side Rd", "Bulawayo"]])
+    assert df["facility_id"].iloc[0] == facility_fingerprint("City Clinic", "2 Side Rd", "Bulawayo")
+
+
+def test_positions_tolerates_repeated_ids():
+    # A CSV that brings its own facility_id column may repeat one
+    snapshot = FacilitySnapshot(pd.DataFrame({"facility_id": ["a", "b", "a", "c"]}))
+    positions = snapshot.positions(["a", "c", "zzz", "b", "a"])
+    assert positions.tolist() == [0, 3, -1, 1, 0]
+
+
+def test_positions_on_empty_snapshot():
+    snapshot = FacilitySnapshot(pd.DataFrame())
+    assert snapshot.positions(["a"]).tolist() == [-1]
+    assert len(snapshot.positions([])) == 0
+    assert snapshot.positions([]).dtype.kind == "i"
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.utils.facility_type import MEMO_SIZE, FacilityTypeClassifier
+
+RULES = [
+    ("Veterinary", ["veterinary", "vet "]),
+    ("Hospital", ["hospital"]),
+    ("Pharmacy", ["pharmacy", "chemist"]),
+    ("Clinic", ["clinic", "surgery"]),
+]
+
+
+def per_row(name):
+    """The rules applied the plain way, one name at a time"""
+    if not isinstance(name, str):
+        return "Unknown"
+    name = name.lower()
+    return next((t for t, keywords in RULES if any(k in name for k in keywords)), "Unknown")
+
+
+NAMES = [
+    "Avenues PHARMACY", "Parirenyatwa Hospital Pharmacy", "City Clinic", "The Vet Surgery",
+    "Borrowdale Veterinary Clinic", "Chemist & Clinic", "Dental Practice", "hospital",
+    "Café Pharmacy", "ÉCOLE CLINIC", "Ph", "", "x\x00 pharmacy", None, np.nan, 42,
+]
+
+
+def test_classify_matches_plain_rules():
+    classifier = FacilityTypeClassifier(RULES)
+    assert classifier.classify(NAMES).tolist() == [per_row(n) for n in NAMES]
+
+
+def test_single_names_and_memo():
+    classifier = FacilityTypeClassifier(RULES)
+    assert [classifier(n) for n in NAMES] == [per_row(n) for n in NAMES]
+    # Second time round from the memo
+    assert [classifier(n) for n in NAMES] == [per_row(n) for n in NAMES]
+
+
+def test_mostly_distinct_column_is_classified_in_place():
+    classifier = FacilityTypeClassifier(RULES)
+    rows = MEMO_SIZE * 2
+    names = pd.Series(np.resize(np.array(NAMES, dtype=object), rows), dtype="object")
+    names = names.where(names.isna(), names.astype(str) + " #" + pd.Series(np.arange(rows)).astype(str))
+
+    assert classifier._mostly_distinct(names)
+    assert classifier.classify(names).tolist() == names.map(per_row).tolist()
+
+
+def test_repeated_column_is_deduplicated():
+    classifier = FacilityTypeClassifier(RULES)
+    names = pd.Series(np.resize(np.array(NAMES[:10], dtype=object), MEMO_SIZE * 2), dtype="object")
+    assert not classifier._mostly_distinct(names)
+
+
+def test_non_ascii_keywords():
+    classifier = FacilityTypeClassifier([("Clinic", ["clínica"])])
+    assert classifier.classify(["CLÍNICA Central", "Clinica Central"]).tolist() == ["Clinic", "Unknown"]
+
+
+def test_short_keywords_are_rejected():
+    with pytest.raises(ValueError):
+        FacilityTypeClassifier([("Eye Clinic", ["ey"])])
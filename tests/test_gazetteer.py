@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from gazetteer import Gazetteer, precise_enough
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer.load(os.path.join(FIXTURES_DIR, "gazetteer.csv"))
+
+
+def test_load_reads_every_entry(gazetteer):
+    assert len(gazetteer) == 7
+
+
+def test_match_city_exact_and_misspelt(gazetteer):
+    names = [e["name"] for e in gazetteer.entries]
+    assert names[gazetteer.match_city(" HARARE ")] == "Harare"
+    assert names[gazetteer.match_city("Bulawyo")] == "Bulawayo"
+    # Suburbs stand in for a city, streets never do
+    assert names[gazetteer.match_city("Avondale")] == "Avondale"
+    assert gazetteer.match_city("Samora Machel Avenue") is None
+    assert gazetteer.match_city("Mutare") is None
+    assert gazetteer.match_city("") is None
+
+
+def test_locate_prefers_the_most_precise_place_in_the_address(gazetteer):
+    street = gazetteer.locate("Shop 4, 112 Samora Machel Avenue, Avondale", "Harare")
+    assert street == {"lat": -17.827, "lon": 31.05, "precision": "street", "name": "Samora Machel Avenue"}
+
+    suburb = gazetteer.locate("12 King George Rd, Avondale", "Harare")
+    assert (suburb["precision"], suburb["name"]) == ("suburb", "Avondale")
+
+    city = gazetteer.locate("Stand 5", "harare")
+    assert (city["precision"], city["name"]) == ("city", "Harare")
+
+
+def test_locate_only_uses_places_in_the_matched_city(gazetteer):
+    # Hillside is a Bulawayo suburb
+    hit = gazetteer.locate("3 Hillside Rd", "Harare")
+    assert (hit["precision"], hit["name"]) == ("city", "Harare")
+
+    hit = gazetteer.locate("3 Hillside Rd", "Bulawayo")
+    assert (hit["precision"], hit["name"]) == ("suburb", "Hillside")
+
+
+def test_locate_without_a_known_city(gazetteer):
+    assert gazetteer.locate("Samora Machel Avenue", "") is None
+    assert gazetteer.locate("Samora Machel Avenue", "Mutare") is None
+
+
+def test_precise_enough():
+    assert precise_enough("street", "suburb")
+    assert precise_enough("suburb", "suburb")
+    assert not precise_enough("city", "suburb")
@@ -0,0 +1,118 @@
+import pytest
+
+import geocode_engine
+from geocode_engine import (
+    STATUS_MISS, STATUS_OK, STATUS_OUT_OF_BOUNDS, GeocodeCache, GeocodeEngine, ProviderError, StubProvider,
+)
+
+ANSWERS = {
+    "Harare": (-17.83, 31.05, "Harare, Zimbabwe"),
+    "Bulawayo": (-20.15, 28.58),
+    "London": (51.51, -0.13, "London, United Kingdom"),
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+class FlakyProvider(StubProvider):
+    """Fails the first ``failures`` calls for every query"""
+
+    def __init__(self, answers, failures):
+        super().__init__(answers)
+        self.failures = failures
+
+    def geocode(self, query):
+        if self.calls.count(query) < self.failures:
+            self.calls.append(query)
+            raise ProviderError("timed out")
+        return super().geocode(query)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(geocode_engine.time, "sleep", lambda seconds: None)
+
+
+def test_queries_are_deduplicated_and_cached(cache):
+    provider = StubProvider(ANSWERS)
+    results = GeocodeEngine(provider, cache).resolve(["Harare", " harare ", "HARARE", "", None, "Bulawayo"])
+
+    assert sorted(q.lower() for q in provider.calls) == ["bulawayo", "harare"]
+    assert results["harare"] == {"lat": -17.83, "lon": 31.05, "display": "Harare, Zimbabwe", "status": STATUS_OK}
+    assert results["bulawayo"]["display"] == "Bulawayo"
+
+    # A second run answers everything from the cache
+    again = StubProvider(ANSWERS)
+    engine = GeocodeEngine(again, cache)
+    assert engine.resolve(["harare", "Bulawayo"]) == results
+    assert again.calls == []
+    assert engine.stats["cache_hits"] == 2
+
+
+def test_misses_and_out_of_bounds_answers_are_cached(cache):
+    results = GeocodeEngine(StubProvider(ANSWERS), cache).resolve(["Nowhere", "London"])
+
+    assert results["nowhere"]["status"] == STATUS_MISS
+    assert results["london"]["status"] == STATUS_OUT_OF_BOUNDS
+    assert results["london"]["lat"] == 51.51
+
+    provider = StubProvider(ANSWERS)
+    assert GeocodeEngine(provider, cache).resolve(["Nowhere", "London"]) == results
+    assert provider.calls == []
+
+
+def test_transient_errors_are_retried(cache, no_backoff):
+    provider = FlakyProvider(ANSWERS, failures=2)
+    engine = GeocodeEngine(provider, cache, max_retries=3)
+
+    assert engine.resolve(["Harare"])["harare"]["status"] == STATUS_OK
+    assert engine.stats["requests"] == 3
+    assert engine.stats["errors"] == 2
+
+
+def test_queries_that_keep_failing_are_left_uncached(cache, no_backoff):
+    engine = GeocodeEngine(FlakyProvider(ANSWERS, failures=3), cache, max_retries=3)
+
+    assert engine.resolve(["Harare"]) == {}
+    assert len(cache) == 0
+
+
+def test_results_are_flushed_in_batches(cache):
+    queries = [f"clinic {i}" for i in range(7)]
+    sizes = []
+    engine = GeocodeEngine(StubProvider(), cache, workers=1, flush_every=3)
+
+    engine.resolve(queries, progress=lambda done, total: sizes.append(len(cache)))
+
+    assert sizes == [0, 0, 3, 3, 3, 6, 6]
+    assert len(cache) == 7
+
+
+def test_an_error_cancels_queued_lookups_and_keeps_answers(cache):
+    queries = [f"clinic {i}" for i in range(50)]
+    provider = StubProvider(latency=0.01)
+
+    def progress(done, total):
+        if done == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        GeocodeEngine(provider, cache, workers=2, flush_every=100).resolve(queries, progress=progress)
+
+    # Only the lookups already running finished, and none of them were lost
+    assert len(provider.calls) < 10
+    assert len(cache) == len(provider.calls)
+
+
+def test_stats_count_every_request_across_workers(cache):
+    engine = GeocodeEngine(StubProvider(), cache, rate=100_000, burst=100, workers=8)
+
+    engine.resolve([f"clinic {i}" for i in range(2000)])
+
+    assert engine.stats["requests"] == 2000
+    assert len(cache) == 2000
@@ -0,0 +1,72 @@
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from backend.history_store import HistoryStore
+
+
+def log_once(path, version, barrier):
+    """What each worker's change check does: log ``version`` unless it is already logged"""
+    store = HistoryStore(path)
+    barrier.wait()
+    with store.exclusive() as conn:
+        if store.get_meta("logged_version", conn=conn) == version:
+            return
+        time.sleep(0.05)  # widen the window between the check and the append
+        store.append_change({"timestamp": "2026-01-01T00:00:00", "message": version}, conn)
+        store.set_meta("logged_version", version, conn)
+
+
+def test_exclusive_logs_a_change_once_across_processes(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    HistoryStore(path)
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(4)
+    workers = [context.Process(target=log_once, args=(path, "v1", barrier)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    assert [e["message"] for e in HistoryStore(path).changes()] == ["v1"]
+
+
+def test_exclusive_rolls_back_on_error(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    try:
+        with store.exclusive() as conn:
+            store.set_meta("logged_version", "v1", conn)
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert store.get_meta("logged_version") is None
+
+
+def test_every_connection_is_closed(tmp_path, monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        opened.append(connect(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(sqlite3, "connect", tracking_connect)
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    store.append_change({"timestamp": "2026-01-01T00:00:00", "message": "v1", "facility_types": ["Clinic"]})
+    store.append_summary({"total_facilities": 1, "by_city": {"Harare": 1}}, "2026-01-01T00:00:00")
+    store.changes()
+    store.summaries(points=10, cities=True)
+    store.set_meta("logged_version", "v1")
+    store.get_meta("logged_version")
+    with store.exclusive():
+        pass
+    store.import_legacy(str(tmp_path / "none.json"), str(tmp_path / "none.json"))
+
+    assert len(opened) == 9
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
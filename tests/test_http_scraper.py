@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from http_scraper import ScrapeError, _html_parser_rows, _lxml_rows, parse_table
+
+with open(os.path.join(FIXTURES_DIR, "tablepress.html"), encoding="utf-8") as f:
+    HTML = f.read()
+
+
+@pytest.fixture(params=["lxml", "html.parser"])
+def parser(request, monkeypatch):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    else:
+        # As if lxml were not installed
+        monkeypatch.setitem(sys.modules, "lxml", None)
+    return request.param
+
+
+def test_parse_table_reads_body_rows(parser):
+    rows = parse_table(HTML)
+
+    # The header row, the layout table and the blank row are skipped
+    assert len(rows) == 23
+    assert rows[0] == {
+        "Facility Name": "Avenues Pharmacy",
+        "Physical Address": "Shop 6 Beverly Court\n100 N. Mandela Avenue",
+        "City": "Harare",
+    }
+    assert rows[3]["Facility Name"] == "Eye & Ear Centre"
+    assert rows[4]["Physical Address"] == "41 Fifth Street"
+    assert rows[6]["Physical Address"] == "22 Herbert Chitepo Street"
+
+
+def test_parse_table_without_the_table(parser):
+    with pytest.raises(ScrapeError):
+        parse_table(HTML, table_id="tablepress-2")
+
+
+def test_lxml_and_html_parser_agree():
+    pytest.importorskip("lxml")
+    assert _lxml_rows(HTML, "tablepress-1") == _html_parser_rows(HTML, "tablepress-1")
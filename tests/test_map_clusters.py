@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+import backend.app as app_module
+from backend.facility_store import FacilitySnapshot
+from backend.map_clusters import MAX_CLUSTER_ZOOM
+
+FACILITIES = pd.DataFrame({
+    "facility_id": ["a", "b", "c"],
+    "facility name": ["A", "B", "C"],
+    "city": ["Harare", "Harare", "Bulawayo"],
+    "facility_type": ["Pharmacy", "Clinic", "Pharmacy"],
+    "latitude": [-17.8301, -17.8302, -20.15],
+    "longitude": [31.0501, 31.0502, 28.58],
+})
+
+BBOX = "25,-23,34,-15"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = FacilitySnapshot(FACILITIES.copy())
+    monkeypatch.setattr(app_module.facility_store, "current", lambda: snapshot)
+    monkeypatch.setattr(app_module.change_monitor, "start", lambda: None)
+    return app_module.app.test_client()
+
+
+def test_low_zoom_clusters_nearby_facilities(client):
+    body = client.get(f"/api/map/clusters?bbox={BBOX}&zoom=5").get_json()
+
+    assert body["clusters"] == [
+        {"lat": pytest.approx(-17.83015), "lon": pytest.approx(31.05015), "count": 2,
+         "types": {"Pharmacy": 1, "Clinic": 1}},
+    ]
+    assert [f["facility_id"] for f in body["facilities"]] == ["c"]
+
+
+def test_zoom_is_clamped_to_the_hierarchy(client):
+    body = client.get(f"/api/map/clusters?bbox={BBOX}&zoom=99").get_json()
+    assert body["zoom"] == MAX_CLUSTER_ZOOM + 1
+    assert body["clusters"] == []
+    assert sorted(f["facility_id"] for f in body["facilities"]) == ["a", "b", "c"]
+
+    assert client.get(f"/api/map/clusters?bbox={BBOX}&zoom=-3").get_json()["zoom"] == 0
+
+
+@pytest.mark.parametrize("zoom", ["inf", "-inf", "1e400", "nan"])
+def test_non_finite_zoom_is_a_400(client, zoom):
+    assert client.get(f"/api/map/clusters?bbox={BBOX}&zoom={zoom}").status_code == 400
+
+
+@pytest.mark.parametrize("query", ["bbox=25,-23,34&zoom=5", "bbox=25,nan,34,-15&zoom=5"])
+def test_bad_queries_are_400s(client, query):
+    assert client.get(f"/api/map/clusters?{query}").status_code == 400
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+import backend.app as app_module
+from backend.facility_store import FacilitySnapshot
+from backend.nearest import NearestFacilities
+
+FACILITIES = pd.DataFrame({
+    "facility_id": ["a", "b", "c", "d"],
+    "facility name": ["Avenues Pharmacy", "City Clinic", "Parirenyatwa Hospital", "Ungeocoded Optician"],
+    "city": ["Harare", "Harare", "Harare", "Harare"],
+    "facility_type": ["Pharmacy", "Clinic", "Hospital", "Optician"],
+    "latitude": [-17.81, -17.83, -17.80, None],
+    "longitude": [31.05, 31.04, 31.04, None],
+})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = FacilitySnapshot(FACILITIES.copy())
+    monkeypatch.setattr(app_module.facility_store, "current", lambda: snapshot)
+    # Requests start the change monitor, which would check the real data files
+    monkeypatch.setattr(app_module.change_monitor, "start", lambda: None)
+    return app_module.app.test_client()
+
+
+def test_match_types_ignores_case_and_repeats():
+    knn = NearestFacilities(FACILITIES)
+    assert knn.match_types(["pharmacy", " HOSPITAL ", "Pharmacy", "Spa", "optician"]) == (
+        ["Pharmacy", "Hospital"], ["Spa", "optician"]
+    )
+
+
+def test_nearest_types_any_case(client):
+    response = client.get("/api/facilities/nearest?lat=-17.82&lon=31.05&k=5&types=pharmacy,CLINIC")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["types"] == ["Pharmacy", "Clinic"]
+    assert body["unknown_types"] == []
+    assert sorted(f["facility_id"] for f in body["facilities"]) == ["a", "b"]
+
+
+def test_nearest_partly_unknown_types(client):
+    response = client.post("/api/facilities/nearest", json={
+        "points": [[-17.82, 31.05]], "k": 5, "types": ["hospital", "Spa"],
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["unknown_types"] == ["Spa"]
+    assert [f["facility_id"] for f in body["results"][0]["facilities"]] == ["c"]
+
+
+def test_nearest_only_unknown_types_is_a_400(client):
+    response = client.get("/api/facilities/nearest?lat=-17.82&lon=31.05&types=Spa")
+
+    assert response.status_code == 400
+    assert response.get_json()["valid_types"] == ["Clinic", "Hospital", "Pharmacy"]
+
+
+@pytest.mark.parametrize("body", [[1, 2], "points", 3])
+def test_nearest_non_object_body_is_a_400(client, body):
+    assert client.post("/api/facilities/nearest", json=body).status_code == 400
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+import backend.app as app_module
+import geocode_enhanced
+from backend.facility_store import FacilityStore
+
+RAW = pd.DataFrame({
+    "Facility Name": ["Avenues Pharmacy", "City Clinic"],
+    "Physical Address": ["1 Main St", "2 Side Rd"],
+    "City": ["Harare", "Bulawayo"],
+})
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    """run_refresh against files in tmp_path, geocoding offline from the last output only"""
+    raw, geocoded = tmp_path / "facilities_raw.csv", tmp_path / "facilities_geocoded.csv"
+    snapshots = tmp_path / "snapshots"
+    RAW.to_csv(raw, index=False)
+
+    def run_script(args, cwd, stage, progress, patterns=()):
+        if stage == "geocode":
+            geocode_enhanced.main([
+                "--input", str(raw), "--output", str(geocoded),
+                "--cache", str(tmp_path / "cache.sqlite"), "--offline", "--no-gazetteer",
+            ])
+
+    monkeypatch.setattr(geocode_enhanced, "LEGACY_CACHE_FILE", str(tmp_path / "none.json"))
+    monkeypatch.setattr(app_module, "run_script", run_script)
+    monkeypatch.setattr(app_module, "GEOCODED_FILE", str(geocoded))
+    monkeypatch.setattr(app_module, "SNAPSHOT_DIR", str(snapshots))
+    monkeypatch.setattr(app_module, "TILES_FILE", str(tmp_path / "tiles.mbtiles"))
+    monkeypatch.setattr(app_module, "facility_store", FacilityStore([str(geocoded)], str(snapshots)))
+    monkeypatch.setattr(app_module.change_monitor, "check_now", lambda: None)
+    monkeypatch.setattr(app_module, "send_email_alert", lambda *args, **kwargs: None)
+    return geocoded
+
+
+def test_two_refreshes_in_a_row_keep_coordinates(pipeline):
+    # What an earlier geocoder run left behind
+    RAW.assign(Latitude=[-17.83, -20.15], Longitude=[31.05, 28.58]).to_csv(pipeline, index=False)
+
+    for _ in range(2):
+        result = app_module.run_refresh(lambda *args, **kwargs: None)
+        assert result["total_facilities"] == 2
+
+    geocoded = pd.read_csv(pipeline)
+    assert {"Facility Name", "Latitude", "Longitude"} <= set(geocoded.columns)
+    assert geocoded["Latitude"].tolist() == [-17.83, -20.15]
+    served = app_module.facility_store.current().df
+    assert served["latitude"].tolist() == [-17.83, -20.15]
+
+
+def test_carry_over_reads_normalized_headers():
+    # Earlier refreshes rewrote the geocoder's CSV with lower-case headers
+    previous = RAW.assign(Latitude=[-17.83, -20.15], Longitude=[31.05, 28.58])
+    previous.columns = previous.columns.str.lower()
+
+    df, carried = geocode_enhanced.carry_over(RAW.copy(), previous)
+    assert carried == 2
+    assert df["Longitude"].tolist() == [31.05, 28.58]
@@ -0,0 +1,118 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import http_scraper
+import scraper
+from conftest import FIXTURES_DIR
+from http_scraper import PAGE_LENGTH, http_pages, parse_table
+
+URL = "http://127.0.0.1:8000/registered-facilities/"
+
+with open(os.path.join(FIXTURES_DIR, "tablepress.html"), encoding="utf-8") as f:
+    HTML = f.read()
+ROWS = parse_table(HTML)
+UNIQUE = list({scraper.row_key(r): r for r in ROWS}.values())
+
+
+class FixtureSession:
+    """Serves the TablePress fixture at ``URL``, like a locally served copy of the page"""
+
+    def __init__(self, html=HTML):
+        self.html = html
+        self.urls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.urls.append(url)
+        return SimpleNamespace(status_code=200 if url == URL else 404, text=self.html)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {
+        "out_file": str(tmp_path / "facilities_raw.csv"),
+        "state_file": str(tmp_path / "scrape_state.json"),
+        "manifest_file": str(tmp_path / "scrape_manifest.json"),
+    }
+
+
+def fixture_pages(html=HTML):
+    return lambda start_page: http_pages(URL, start_page, session=FixtureSession(html))
+
+
+def interrupted(page_source, after_page):
+    """A page source that dies (as a killed run would) after yielding ``after_page``"""
+    def source(start_page):
+        for page in page_source(start_page):
+            yield page
+            if page[0] == after_page:
+                raise KeyboardInterrupt
+    return source
+
+
+def scraped(out_file):
+    return pd.read_csv(out_file, dtype=str, keep_default_na=False).to_dict("records")
+
+
+def test_scrape_streams_unique_rows_and_renames_into_place(paths):
+    result = scraper.scrape_to_csv(fixture_pages(), batch_size=5, **paths)
+
+    assert result == {"status": "complete", "rows": len(UNIQUE), "pages": 3}
+    assert scraped(paths["out_file"]) == UNIQUE
+    assert not os.path.exists(paths["out_file"] + ".partial")
+    assert not os.path.exists(paths["state_file"])
+
+
+def test_interrupted_scrape_resumes_after_last_written_page(paths):
+    with open(paths["out_file"], "w", encoding="utf-8") as f:
+        f.write("previous scrape\n")
+
+    with pytest.raises(KeyboardInterrupt):
+        scraper.scrape_to_csv(interrupted(fixture_pages(), after_page=2), batch_size=5, **paths)
+
+    # Rows reached the partial file page by page; the output is untouched until the end
+    with open(paths["out_file"], encoding="utf-8") as f:
+        assert f.read() == "previous scrape\n"
+    with open(paths["state_file"], encoding="utf-8") as f:
+        assert json.load(f)["page"] == 2
+    assert scraped(paths["out_file"] + ".partial") == UNIQUE[:2 * PAGE_LENGTH]
+
+    starts = []
+
+    def source(start_page):
+        starts.append(start_page)
+        return fixture_pages()(start_page)
+
+    result = scraper.scrape_to_csv(source, batch_size=5, **paths)
+    assert starts == [3]
+    assert result["status"] == "complete"
+    assert scraped(paths["out_file"]) == UNIQUE
+
+
+def test_change_past_the_first_pages_is_picked_up(paths, monkeypatch):
+    monkeypatch.setattr(http_scraper, "PAGE_LENGTH", 4)
+    scraper.scrape_to_csv(fixture_pages(), **paths)
+    assert scraper.scrape_to_csv(fixture_pages(), **paths)["status"] == "unchanged"
+
+    # An edit on the last page only
+    edited = HTML.replace("Rusape Laboratory Services", "Rusape Pathology Laboratory")
+    result = scraper.scrape_to_csv(fixture_pages(edited), **paths)
+
+    assert result["status"] == "complete"
+    assert scraped(paths["out_file"])[-1]["Facility Name"] == "Rusape Pathology Laboratory"
+
+
+def test_url_option_is_scraped(paths, monkeypatch):
+    session = FixtureSession()
+    monkeypatch.setattr(scraper, "http_pages", lambda url, *args: http_pages(url, *args, session=session))
+
+    scraper.main([
+        "--url", URL, "--mode", "http", "--out", paths["out_file"],
+        "--state", paths["state_file"], "--manifest", paths["manifest_file"],
+    ])
+
+    assert session.urls == [URL]
+    assert scraped(paths["out_file"]) == UNIQUE
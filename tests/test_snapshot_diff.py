@@ -0,0 +1,72 @@
+import pandas as pd
+
+from backend.facility_store import normalize_facilities
+from backend.snapshot_diff import describe_diff, diff_snapshots, has_changes, load_baseline, save_baseline
+
+OLD = pd.DataFrame({
+    "Facility Name": ["Avenues Pharmacy", "City Clinic", "Mbare Clinic"],
+    "Physical Address": ["1 Main St", "2 Side Rd", "3 Market Sq"],
+    "City": ["Harare", "Bulawayo", "Harare"],
+    "Phone": ["0242 1", "029 2", "0242 3"],
+    "Latitude": [-17.83, -20.15, None],
+    "Longitude": [31.05, 28.58, None],
+})
+
+
+def frame(df):
+    return normalize_facilities(df.copy())
+
+
+def test_reordered_rows_are_not_a_change():
+    diff = diff_snapshots(frame(OLD), frame(OLD.iloc[::-1]))
+    assert not has_changes(diff)
+    assert diff["counts"]["before"] == diff["counts"]["after"] == 3
+
+
+def test_added_removed_moved_and_edited_rows():
+    new = OLD.drop(index=1)
+    new.loc[0, "Latitude"] = -17.90  # ~7.8 km away
+    new.loc[2, ["Latitude", "Longitude"]] = [-17.86, 31.03]  # newly geocoded
+    new.loc[3] = ["Borrowdale Pharmacy", "4 Hill Rd", "Harare", "0242 4", -17.75, 31.09]
+
+    diff = diff_snapshots(frame(OLD), frame(new))
+
+    assert diff["counts"] == {"before": 3, "after": 3, "added": 1, "removed": 1, "moved": 1, "edited": 1}
+    assert [r["facility_name"] for r in diff["added"]] == ["Borrowdale Pharmacy"]
+    assert [r["facility_name"] for r in diff["removed"]] == ["City Clinic"]
+    assert diff["moved"][0]["facility_name"] == "Avenues Pharmacy"
+    assert diff["moved"][0]["to"] == [-17.9, 31.05]
+    assert diff["moved"][0]["distance_m"] > 7000
+    assert diff["edited"] == [{
+        "facility_id": diff["edited"][0]["facility_id"],
+        "facility_name": "Mbare Clinic",
+        "changes": {"latitude": [None, -17.86], "longitude": [None, 31.03]},
+    }]
+    assert "Added: 1, removed: 1, moved: 1, edited: 1" in describe_diff(diff)
+
+
+def test_value_edits_and_jitter():
+    new = OLD.copy()
+    new.loc[1, "Phone"] = "029 9"
+    new.loc[0, "Latitude"] += 0.0002  # ~22 m of geocoder jitter
+
+    diff = diff_snapshots(frame(OLD), frame(new))
+
+    assert diff["counts"]["moved"] == 0
+    assert diff["counts"]["edited"] == 1
+    assert diff["edited"][0]["changes"] == {"phone": ["029 2", "029 9"]}
+
+
+def test_row_limit_keeps_exact_counts():
+    new = pd.concat([OLD, OLD.assign(**{"Facility Name": OLD["Facility Name"] + " II"})], ignore_index=True)
+    diff = diff_snapshots(frame(OLD), frame(new), limit=1)
+    assert diff["counts"]["added"] == 3
+    assert len(diff["added"]) == 1
+
+
+def test_baseline_round_trip(tmp_path):
+    path = str(tmp_path / "baseline.csv.gz")
+    assert load_baseline(path) is None
+
+    save_baseline(frame(OLD), path)
+    assert not has_changes(diff_snapshots(frame(OLD), load_baseline(path)))
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+import backend.app as app_module
+from backend.facility_store import FacilitySnapshot
+from backend.stock_plan import FALLBACK_TYPE, ProductJoin, load_product_map
+from backend.utils.facility_type import load_rules
+
+FACILITIES = pd.DataFrame({
+    "facility_id": ["a", "b", "c"],
+    "facility name": ["Avenues Pharmacy", "City Optical", "Spa"],
+    "city": ["Harare", "Harare", "Harare"],
+    "facility_type": ["Pharmacy", "Optician", "Day Spa"],
+    "latitude": [-17.81, -17.83, -17.80],
+    "longitude": [31.05, 31.04, 31.04],
+})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = FacilitySnapshot(FACILITIES.copy())
+    monkeypatch.setattr(app_module.facility_store, "current", lambda: snapshot)
+    monkeypatch.setattr(app_module.change_monitor, "start", lambda: None)
+    return app_module.app.test_client()
+
+
+def test_every_classified_type_has_product_lines():
+    rules, default = load_rules()
+    product_map = load_product_map()
+    assert {default, *(facility_type for facility_type, _ in rules)} <= set(product_map)
+
+
+def test_plan_counts_stops_per_product_line():
+    join = ProductJoin(["Clinic", None, "Clinic", "Spa"], {
+        "Clinic": ["IV Fluids", "Injectables"], FALLBACK_TYPE: ["OTC"],
+    })
+    stop_types, stop_lines, totals, by_type = join.plan([0, 1, 2, 3])
+
+    assert stop_types == ["Clinic", "Unknown", "Clinic", "Spa"]
+    assert stop_lines[3] == ["OTC"]
+    assert totals == {"IV Fluids": 2, "Injectables": 2, "OTC": 2}
+    assert by_type == {"Clinic": 2, "Spa": 1, "Unknown": 1}
+    assert join.unmapped == ["Spa"]
+
+
+def test_stock_plan_for_listed_stops(client):
+    response = client.post("/api/route/stock-plan", json={"facility_ids": ["b", "c", "zzz"]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["stops"][0]["products"][:2] == ["Eye Drops", "Antibiotic Eye Ointments"]
+    assert body["unmapped_types"] == ["Day Spa"]
+    assert body["missing_ids"] == ["zzz"]
+
+
+@pytest.mark.parametrize("body", [
+    {"facility_ids": "abc"},
+    {"facility_ids": [["a"]]},
+    {"facility_ids": ["a", 1]},
+    [1, 2],
+])
+def test_stock_plan_rejects_bad_facility_ids(client, body):
+    assert client.post("/api/route/stock-plan", json=body).status_code == 400
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backend.app as app_module
+from backend import territory_planner
+from backend.facility_store import FacilitySnapshot
+
+FACILITIES = pd.DataFrame({
+    "facility_id": ["a", "b", "c", "d", "e", "f"],
+    "facility name": ["A", "B", "C", "D", "E", "F"],
+    "city": ["Harare", "Harare", "Harare", "Bulawayo", "Bulawayo", "Bulawayo"],
+    "facility_type": ["Pharmacy", "Clinic", "Pharmacy", "Pharmacy", "Clinic", "Hospital"],
+    "latitude": [-17.81, -17.83, -17.80, -20.15, -20.16, -20.14],
+    "longitude": [31.05, 31.04, 31.06, 28.58, 28.59, 28.57],
+})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = FacilitySnapshot(FACILITIES.copy())
+    monkeypatch.setattr(app_module.facility_store, "current", lambda: snapshot)
+    monkeypatch.setattr(app_module.change_monitor, "start", lambda: None)
+    return app_module.app.test_client()
+
+
+def test_balanced_kmeans_sizes_differ_by_at_most_one():
+    rng = np.random.default_rng(0)
+    # A dense city and a sparse one, so plain k-means would be lopsided
+    lats = np.concatenate([rng.normal(-17.8, 0.02, 90), rng.normal(-20.1, 0.2, 13)])
+    lons = np.concatenate([rng.normal(31.0, 0.02, 90), rng.normal(28.6, 0.2, 13)])
+
+    counts = np.bincount(territory_planner.balanced_kmeans(lats, lons, 4), minlength=4)
+
+    assert counts.sum() == 103
+    assert counts.max() - counts.min() <= 1
+
+
+def test_balanced_kmeans_keeps_separate_cities_apart():
+    labels = territory_planner.balanced_kmeans(FACILITIES["latitude"], FACILITIES["longitude"], 2)
+    assert len(set(labels[:3])) == len(set(labels[3:])) == 1
+    assert labels[0] != labels[3]
+
+
+def test_plan_territory_respects_the_daily_cap():
+    rng = np.random.default_rng(1)
+    lats, lons = rng.uniform(-17.9, -17.7, 23), rng.uniform(30.9, 31.1, 23)
+
+    base, days = territory_planner.plan_territory(lats, lons, daily_cap=5, time_budget=0.05)
+
+    assert base == pytest.approx((lats.mean(), lons.mean()))
+    assert len(days) == 5
+    assert all(len(stops) <= 5 for stops, _ in days)
+    assert sorted(np.concatenate([stops for stops, _ in days]).tolist()) == list(range(23))
+    assert all(km > 0 for _, km in days)
+
+
+def test_territories_endpoint_splits_by_city(client):
+    response = client.post("/api/planning/territories", json={"reps": 2, "daily_cap": 2, "time_budget_ms": 10})
+
+    assert response.status_code == 200
+    plan = response.get_json()
+    assert (plan["reps"], plan["total_facilities"]) == (2, 6)
+    cities = [{s["city"] for day in t["days"] for s in day["stops"]} for t in plan["territories"]]
+    assert sorted(map(sorted, cities)) == [["Bulawayo"], ["Harare"]]
+    assert all(len(day["stops"]) <= 2 for t in plan["territories"] for day in t["days"])
+
+
+def test_more_reps_than_facilities(client):
+    plan = client.post("/api/planning/territories", json={"reps": 50, "cities": ["bulawayo"]}).get_json()
+    assert plan["reps"] == 3
+    assert all(t["facility_count"] == 1 for t in plan["territories"])
+
+
+@pytest.mark.parametrize("body", [
+    {"reps": "x"},
+    {"reps": 3, "daily_cap": "y"},
+    {"reps": 3, "daily_cap": None},
+    {"reps": [3]},
+    {"reps": 3, "time_budget_ms": "abc"},
+    {"reps": 3, "time_budget_ms": -1},
+    {"reps": 0},
+    {"reps": 3, "daily_cap": 0},
+])
+def test_territories_rejects_bad_parameters(client, body):
+    assert client.post("/api/planning/territories", json=body).status_code == 400
+
+
+def test_territories_rejects_a_non_object_body(client):
+    assert client.post("/api/planning/territories", json=[1, 2]).status_code == 400
+
+
+@pytest.mark.parametrize("argv", [
+    ["--reps", "0"],
+    ["--reps", "2", "--daily-cap", "0"],
+    ["--reps", "2", "--time-budget-ms", "-5"],
+])
+def test_cli_rejects_non_positive_values(argv):
+    with pytest.raises(SystemExit) as exit_info:
+        territory_planner.main(argv)
+    assert exit_info.value.code == 2
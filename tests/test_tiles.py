@@ -0,0 +1,18 @@
+import pandas as pd
+
+from backend.tile_builder import MAX_ZOOM, MIN_ZOOM, build_tiles, tile_in_range, tile_xy
+
+
+def test_tile_range_follows_built_zooms(tmp_path):
+    path = str(tmp_path / "tiles.mbtiles")
+    assert tile_in_range(path, MIN_ZOOM, 0, 0) and not tile_in_range(path, MAX_ZOOM + 1, 0, 0)
+
+    df = pd.DataFrame({"facility_id": ["a"], "facility name": ["Clinic"], "city": ["Harare"],
+                       "facility_type": ["Clinic"], "latitude": [-17.83], "longitude": [31.05]})
+    build_tiles(df, path, min_zoom=8, max_zoom=9)
+    x, y = (int(v[0]) for v in tile_xy(df["latitude"], df["longitude"], 9))
+    assert tile_in_range(path, 9, x, y)
+    assert not tile_in_range(path, 7, 0, 0)
+    assert not tile_in_range(path, 10, x, y)
+    assert not tile_in_range(path, 9, 2 ** 9, y)
+    assert not tile_in_range(path, 9, x, 2 ** 9)
@@ -0,0 +1,103 @@
+from itertools import permutations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backend.app as app_module
+from backend.facility_store import FacilitySnapshot
+from backend.visit_optimizer import distance_matrix, optimize_visit_order
+
+FACILITIES = pd.DataFrame({
+    "facility_id": ["a", "b", "c"],
+    "facility name": ["A", "B", "C"],
+    "city": ["Harare", "Harare", "Harare"],
+    "facility_type": ["Pharmacy", "Clinic", "Pharmacy"],
+    "latitude": [-17.80, -17.80, -17.80],
+    "longitude": [31.10, 31.00, 31.20],
+})
+
+ORIGIN = {"origin_lat": -17.80, "origin_lon": 30.90}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = FacilitySnapshot(FACILITIES.copy())
+    monkeypatch.setattr(app_module.facility_store, "current", lambda: snapshot)
+    monkeypatch.setattr(app_module.change_monitor, "start", lambda: None)
+    return app_module.app.test_client()
+
+
+def test_no_stops():
+    order, legs = optimize_visit_order([], [], (-17.8, 31.0))
+    assert len(order) == len(legs) == 0
+
+
+def test_stops_along_a_road_are_visited_in_order():
+    lons = np.array([31.3, 31.1, 31.4, 31.2])
+    order, legs = optimize_visit_order(np.full(4, -17.8), lons, (-17.8, 31.0))
+
+    assert order.tolist() == [1, 3, 0, 2]
+    assert legs.sum() == pytest.approx(distance_matrix([-17.8, -17.8], [31.0, 31.4])[0, 1])
+
+
+def test_destination_adds_a_final_leg():
+    order, legs = optimize_visit_order([-17.8, -17.8], [31.2, 31.1], (-17.8, 31.0), (-17.8, 31.0))
+
+    assert order.tolist() == [1, 0]
+    assert len(legs) == 3
+    # Back from the furthest stop
+    assert legs[-1] == pytest.approx(legs[0] + legs[1])
+
+
+def test_matches_the_best_order_on_a_small_trip():
+    rng = np.random.default_rng(7)
+    lats, lons = rng.uniform(-18.0, -17.6, 7), rng.uniform(30.8, 31.3, 7)
+    origin = destination = (-17.8, 31.05)
+    dist = distance_matrix([origin[0], *lats, destination[0]], [origin[1], *lons, destination[1]])
+
+    def length(order):
+        path = [0, *(i + 1 for i in order), 8]
+        return dist[path[:-1], path[1:]].sum()
+
+    order, legs = optimize_visit_order(lats, lons, origin, destination, time_budget=1)
+
+    assert sorted(order.tolist()) == list(range(7))
+    assert legs.sum() == pytest.approx(length(order))
+    assert legs.sum() == pytest.approx(min(length(p) for p in permutations(range(7))))
+
+
+def test_optimize_orders_the_stops(client):
+    response = client.post("/api/route/optimize", json={
+        **ORIGIN, "facility_ids": ["c", "a", "b", "zzz"], "time_budget_ms": "50",
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [s["facility_id"] for s in body["stops"]] == ["b", "a", "c"]
+    assert body["missing_ids"] == ["zzz"]
+
+
+@pytest.mark.parametrize("body", [
+    {**ORIGIN, "facility_ids": ["a"], "time_budget_ms": "abc"},
+    {**ORIGIN, "facility_ids": ["a"], "time_budget_ms": -1},
+    {**ORIGIN, "facility_ids": ["a"], "time_budget_ms": [5]},
+    {**ORIGIN, "facility_ids": "abc"},
+    {**ORIGIN, "facility_ids": [["a"]]},
+    {"origin_lat": "north", "origin_lon": 30.9, "facility_ids": ["a"]},
+])
+def test_optimize_rejects_bad_parameters(client, body):
+    assert client.post("/api/route/optimize", json=body).status_code == 400
+
+
+def test_optimize_rejects_nan_time_budget(client):
+    # JSON has no NaN literal, but Python's parser (and so Flask's) accepts one
+    response = client.post(
+        "/api/route/optimize", content_type="application/json",
+        data='{"origin_lat": -17.8, "origin_lon": 30.9, "facility_ids": ["a"], "time_budget_ms": NaN}',
+    )
+    assert response.status_code == 400
+
+
+def test_optimize_rejects_a_non_object_body(client):
+    assert client.post("/api/route/optimize", json=[1, 2]).status_code == 400